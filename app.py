@@ -1,16 +1,29 @@
 #!/usr/bin/env python3
 import os
+import asyncio
+import hashlib
 import logging
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from config import GEMINI_API_KEY, LOG_LEVEL, DEBUG_MODE
-from src.ai_model import initialize_model
-from src.markdown_parser import parse_markdown_spec
-from src.diagram_generator import generate_diagrams, generate_sequence_diagram_for_use_case
-from src.code_generator import generate_code
+from config import (GEMINI_API_KEY, LLM_BACKEND, LOG_LEVEL, DEBUG_MODE, WEB_WORKERS, SHARED_STATE_BACKEND,
+                    STATIC_MAX_AGE_SECONDS, PARSE_STREAM_QUEUE_SIZE)
+from src.ai_model import is_model_available, is_model_initialized, get_client, get_single_flight
+from src.markdown_parser import parse_markdown_spec_async, aiter_spec_items
+from src.diagram_generator import (generate_diagrams_async, generate_sequence_diagram_for_use_case_async,
+                                   generate_sequence_diagrams_async, select_use_cases)
+from src.code_generator import generate_code_async, generate_code_stream_async
+from src.llm_cache import get_cache
+from src.prompt_loader import get_prompt_registry
+from src.metrics import render_metrics, watch_fallbacks
+from src.tracing import TraceMiddleware, span
+from src.compression import CompressionMiddleware
+from src.responses import FastJSONResponse, UploadStreamingResponse
+from src.http_cache import get_asset_registry, make_etag, etag_matches, build_fingerprint
+from models.spec import dumps, loads
+from services.job_queue import submit_job, get_job_async
+from services.spec_store import get_spec_store, make_spec_id
 
 # Configure logging
 logging.basicConfig(
@@ -19,15 +32,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize AI model
-if GEMINI_API_KEY:
-    initialize_model()
-    logger.info("Gemini API initialized")
+# The AI model is initialized lazily on the first request that needs it
+if is_model_available():
+    logger.info(f"Using the {LLM_BACKEND} model backend")
 else:
     logger.warning("No Gemini API key found. Running in basic mode without AI features.")
 
+# Load every prompt template into memory once; edited files are reloaded on the fly
+get_prompt_registry()
+
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -38,33 +53,134 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Compress responses for clients that accept gzip or brotli
+app.add_middleware(CompressionMiddleware)
+
+# Record a trace of requests sent with X-Trace or ?trace=
+app.add_middleware(TraceMiddleware)
+
+# Load the index page and static files into memory once
+get_asset_registry()
+
+def asset_response(asset, request, cache_control):
+    """Send an in-memory file, or 304 Not Modified if the client's copy has the same ETag."""
+    headers = {'ETag': asset.etag, 'Cache-Control': cache_control}
+    if etag_matches(request.headers.get('if-none-match'), asset.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=asset.body, media_type=asset.media_type, headers=headers)
 
 @app.get("/", response_class=HTMLResponse)
-async def index():
-    """Render the main application page."""
-    with open("templates/index.html", "r", encoding="utf-8") as file:
-        return HTMLResponse(content=file.read())
+async def index(request: Request):
+    """Render the main application page, revalidated on every load."""
+    asset = get_asset_registry().index()
+    if asset is None:
+        raise HTTPException(status_code=500, detail="The index page could not be loaded")
+    return asset_response(asset, request, 'no-cache')
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def static_file(path: str, request: Request):
+    """
+    Serve a static file from memory.
+    
+    URLs carrying the file's current version (?v=, as linked from the index
+    page) may be cached for a year; any other URL is revalidated with its ETag.
+    """
+    asset = get_asset_registry().get(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if request.query_params.get('v') == asset.version:
+        cache_control = f'public, max-age={STATIC_MAX_AGE_SECONDS}, immutable'
+    else:
+        cache_control = 'no-cache'
+    return asset_response(asset, request, cache_control)
+
+def generation_etag(request, *keys):
+    """
+    ETag of a generation response.
+    
+    Combines the endpoint, what produces the output (the model and prompt
+    versions, or the basic generators) and the keys identifying the input, so
+    a client resending an unchanged spec can get a 304 without any parsing or
+    generation.
+    """
+    return make_etag(request.url.path, build_fingerprint(), *keys)
+
+def not_modified(etag):
+    """An empty 304 response for an unchanged generation result."""
+    return Response(status_code=304, headers={'ETag': etag})
+
+async def resolve_spec(body):
+    """
+    Return the (parsed_spec, diagrams) a request refers to.
+    
+    A `spec_id` from /api/generate-diagrams loads both from the spec store;
+    otherwise they are read from the body, taking parsed_spec out of diagrams
+    when only the diagrams object was sent. Raises a 404 for an unknown or
+    expired spec_id, so the client knows to upload the markdown again. The spec
+    store is read in a worker thread.
+    """
+    spec_id = body.get('spec_id')
+    if spec_id:
+        stored = await asyncio.to_thread(get_spec_store().get, spec_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail=f"Specification {spec_id} not found; generate its diagrams again")
+        return stored['parsed_spec'], stored['diagrams']
+    
+    parsed_spec = body.get('parsed_spec') or {}
+    diagrams = body.get('diagrams') or {}
+    if not parsed_spec and 'parsed_spec' in diagrams:
+        parsed_spec = diagrams.pop('parsed_spec')
+    return parsed_spec, diagrams
+
+async def read_json(request):
+    """Read the JSON request body, recorded as the request_decode span when traced."""
+    with span('request_decode'):
+        return loads(await request.body())
+
+def json_response(content):
+    """Serialize a JSON response, recorded as the serialization span when traced."""
+    with span('serialization'):
+        return FastJSONResponse(content)
 
 @app.post("/api/generate-diagrams")
 async def api_generate_diagrams(request: Request):
-    """API endpoint to generate diagrams from markdown specification."""
+    """
+    API endpoint to generate diagrams from markdown specification.
+    
+    The result is saved in the spec store, and its `spec_id` can be sent to the
+    other endpoints instead of the markdown, parsed_spec and diagrams.
+    """
     try:
-        body = await request.json()
+        body = await read_json(request)
         markdown_content = body.get('markdown', '')
+        include_sequence = bool(body.get('include_sequence', False))
+        spec_id = make_spec_id(markdown_content, include_sequence)
         
-        # Parse the markdown specification
-        parsed_spec = parse_markdown_spec(markdown_content)
-        logger.debug("Parsed specification: %s", parsed_spec)
-
-        # Generate diagrams
-        diagrams = generate_diagrams(parsed_spec)
+        # The client already has this result; refresh the stored spec its spec_id refers to
+        etag = generation_etag(request, spec_id, str(include_sequence))
+        if etag_matches(request.headers.get('if-none-match'), etag) and await asyncio.to_thread(get_spec_store().touch, spec_id):
+            return not_modified(etag)
+        
+        with watch_fallbacks() as fallbacks:
+            # Parse the markdown specification
+            parsed_spec = await parse_markdown_spec_async(markdown_content)
+            logger.debug("Parsed specification: %s", parsed_spec)
+            
+            # Generate diagrams
+            diagrams = await generate_diagrams_async(parsed_spec, include_sequence=include_sequence)
+        
+        # Keep the result server-side so later requests can refer to it by ID
+        await asyncio.to_thread(get_spec_store().put, spec_id, parsed_spec, diagrams)
         
         # Include the parsed specification in the response
         diagrams['parsed_spec'] = parsed_spec
+        diagrams['spec_id'] = spec_id
         
-        return diagrams
+        response = json_response(diagrams)
+        # Results that fell back to the basic generators should be regenerated next time
+        if 'errors' not in diagrams and not fallbacks:
+            response.headers['ETag'] = etag
+        return response
     except Exception as e:
         logger.error(f"Error generating diagrams: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
@@ -73,52 +189,266 @@ async def api_generate_diagrams(request: Request):
 async def api_generate_sequence_diagram(request: Request):
     """API endpoint to generate a sequence diagram for a specific use case."""
     try:
-        body = await request.json()
+        etag = generation_etag(request, hashlib.sha256(await request.body()).hexdigest())
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return not_modified(etag)
+        
+        body = await read_json(request)
         use_case_id = body.get('use_case_id')
         use_case_data = body.get('use_case_data')
         markdown_content = body.get('markdown', '')
         
         logger.info(f"Generating sequence diagram for use case {use_case_id}")
         
-        # Parse the markdown if not already done
-        parsed_spec = body.get('parsed_spec') or parse_markdown_spec(markdown_content)
+        with watch_fallbacks() as fallbacks:
+            # Load the stored spec, or parse the markdown if not already done
+            parsed_spec, _ = await resolve_spec(body)
+            parsed_spec = parsed_spec or await parse_markdown_spec_async(markdown_content)
+            if use_case_data is None:
+                use_case_data = select_use_cases(parsed_spec, [use_case_id])[use_case_id]
+            
+            # Generate sequence diagram
+            mermaid_code = await generate_sequence_diagram_for_use_case_async(use_case_id, use_case_data, parsed_spec)
         
-        # Generate sequence diagram
-        mermaid_code = generate_sequence_diagram_for_use_case(use_case_id, use_case_data, parsed_spec)
-        
-        return {"mermaid": mermaid_code}
+        response = json_response({"mermaid": mermaid_code})
+        if not fallbacks:
+            response.headers['ETag'] = etag
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating sequence diagram: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/generate-sequence-diagrams")
+async def api_generate_sequence_diagrams(request: Request):
+    """
+    API endpoint to generate sequence diagrams for several use cases in one request.
+    
+    Accepts `use_case_ids` as a list of IDs or "all". The spec is parsed at most
+    once, and each diagram is streamed back as an NDJSON line as soon as it is ready.
+    """
+    try:
+        body = await read_json(request)
+        use_case_ids = body.get('use_case_ids', 'all')
+        markdown_content = body.get('markdown', '')
+        
+        if use_case_ids == 'all':
+            use_case_ids = None
+        elif not isinstance(use_case_ids, list):
+            raise ValueError("use_case_ids must be a list of IDs or \"all\"")
+        
+        # Load the stored spec, or parse the markdown if not already done
+        parsed_spec, _ = await resolve_spec(body)
+        parsed_spec = parsed_spec or await parse_markdown_spec_async(markdown_content)
+        
+        # Validate the requested IDs before the response starts streaming
+        select_use_cases(parsed_spec, use_case_ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating sequence diagrams: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def stream():
+        async for use_case_id, mermaid_code, error in generate_sequence_diagrams_async(parsed_spec, use_case_ids):
+            line = {"use_case_id": use_case_id, "mermaid": mermaid_code}
+            if error:
+                line["error"] = error
+            yield dumps(line) + b"\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/api/parse-spec/stream")
+async def api_parse_spec_stream(request: Request):
+    """
+    API endpoint to parse a very large markdown specification upload.
+    
+    The request body is the raw markdown (not JSON). It is parsed with the basic
+    parser while it is still being received, and every title, description,
+    class, component, connection and use case is streamed back as an NDJSON
+    line {"type", "data"} as soon as it is complete, followed by a `done` line
+    with per-type counts (or an `error` line). Neither side holds the whole
+    document in memory.
+    
+    The upload is read by a task started here, which hands parsed items to the
+    response through a bounded queue, so a slow client also slows the reading.
+    """
+    items = asyncio.Queue(maxsize=PARSE_STREAM_QUEUE_SIZE)
+    done = object()
+    
+    async def read_upload():
+        try:
+            async for entry in aiter_spec_items(request.stream()):
+                await items.put(entry)
+            await items.put(done)
+        except Exception as e:
+            await items.put(e)
+    
+    reader = asyncio.ensure_future(read_upload())
+    
+    async def stream():
+        counts = {}
+        try:
+            while True:
+                entry = await items.get()
+                if entry is done:
+                    break
+                if isinstance(entry, Exception):
+                    raise entry
+                kind, item = entry
+                counts[kind] = counts.get(kind, 0) + 1
+                yield dumps({"type": kind, "data": item}) + b"\n"
+            yield dumps({"type": "done", "counts": counts}) + b"\n"
+        except Exception as e:
+            logger.error(f"Error parsing specification stream: {e}", exc_info=True)
+            yield dumps({"type": "error", "detail": str(e)}) + b"\n"
+        finally:
+            reader.cancel()
+    
+    return UploadStreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/api/generate-code")
 async def api_generate_code(request: Request):
     """API endpoint to generate Python code from parsed specification and diagrams."""
     try:
-        body = await request.json()
-        parsed_spec = body.get('parsed_spec', {})
-        diagrams = body.get('diagrams', {})
+        etag = generation_etag(request, hashlib.sha256(await request.body()).hexdigest())
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return not_modified(etag)
         
-        # If we have been given the diagrams object but not the parsed_spec,
-        # extract it from the diagrams
-        if not parsed_spec and 'parsed_spec' in diagrams:
-            parsed_spec = diagrams.pop('parsed_spec')
+        body = await read_json(request)
+        parsed_spec, diagrams = await resolve_spec(body)
         
-        code = generate_code(parsed_spec, diagrams)
-        return code
+        with watch_fallbacks() as fallbacks:
+            code = await generate_code_async(parsed_spec, diagrams)
+        response = json_response(code)
+        # Fallback code should be regenerated once the model is back
+        if not fallbacks:
+            response.headers['ETag'] = etag
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating code: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/generate-code/stream")
+async def api_generate_code_stream(request: Request):
+    """
+    Streaming variant of /api/generate-code using Server-Sent Events.
+    
+    Emits a `file` event with {"filename", "content"} as soon as each file is
+    complete, then a final `done` event (or `error` if generation failed).
+    """
+    try:
+        body = await read_json(request)
+        parsed_spec, diagrams = await resolve_spec(body)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating code: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def events():
+        count = 0
+        try:
+            async for filename, content in generate_code_stream_async(parsed_spec, diagrams):
+                count += 1
+                yield format_sse('file', {'filename': filename, 'content': content})
+            yield format_sse('done', {'files': count})
+        except Exception as e:
+            logger.error(f"Error streaming code: {e}", exc_info=True)
+            yield format_sse('error', {'detail': str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.post("/api/generate-diagrams/jobs", status_code=202)
+async def api_generate_diagrams_job(request: Request):
+    """
+    Job variant of /api/generate-diagrams for specifications too large to wait on.
+    
+    Returns {"job_id", "status"} immediately; poll /api/jobs/{job_id} for the result.
+    """
+    try:
+        body = await read_json(request)
+        job = await submit_job('diagrams', {
+            'markdown': body.get('markdown', ''),
+            'include_sequence': bool(body.get('include_sequence', False)),
+        })
+        return {'job_id': job['job_id'], 'status': job['status']}
+    except Exception as e:
+        logger.error(f"Error queueing diagram generation: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/generate-code/jobs", status_code=202)
+async def api_generate_code_job(request: Request):
+    """
+    Job variant of /api/generate-code for specifications too large to wait on.
+    
+    Returns {"job_id", "status"} immediately; poll /api/jobs/{job_id} for the
+    generated files.
+    """
+    try:
+        body = await read_json(request)
+        parsed_spec, diagrams = await resolve_spec(body)
+        
+        job = await submit_job('code', {'parsed_spec': parsed_spec, 'diagrams': diagrams})
+        return {'job_id': job['job_id'], 'status': job['status']}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queueing code generation: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/jobs/{job_id}")
+async def api_get_job(job_id: str):
+    """
+    API endpoint to check on a generation job.
+    
+    Returns the job's status (queued, running, succeeded or failed) and progress,
+    plus its result once it has succeeded or its error once it has failed.
+    """
+    job = await get_job_async(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return json_response(job)
+
+def format_sse(event, data):
+    """Format a single Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness check; cheap, and does not initialize the AI model."""
+    return {'status': 'ok', 'model_initialized': is_model_initialized()}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics for this worker: per-stage latency histograms, model
+    calls, retries, fallbacks, cache hits, response parse failures and token
+    usage per prompt template.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/config/status")
 async def api_config_status():
     """API endpoint to check configuration status."""
     try:
         return {
             'gemini_api': bool(GEMINI_API_KEY),
+            'llm_backend': LLM_BACKEND,
             'model': 'gemini-2.0-flash-lite',
             'debug_mode': DEBUG_MODE,
-            'log_level': LOG_LEVEL
+            'log_level': LOG_LEVEL,
+            'worker': {'pid': os.getpid(), 'workers': WEB_WORKERS, 'shared_state': SHARED_STATE_BACKEND},
+            'llm_cache': get_cache().stats(),
+            'llm_client': get_client().stats(),
+            'llm_coalescing': get_single_flight().stats(),
+            'prompts': get_prompt_registry().versions()
         }
     except Exception as e:
         logger.error(f"Error checking configuration: {e}", exc_info=True)
@@ -127,4 +457,8 @@ async def api_config_status():
 if __name__ == '__main__':
     import uvicorn
     port = int(os.environ.get('PORT', 5000))
-    uvicorn.run(app, host='0.0.0.0', port=port)
\ No newline at end of file
+    if WEB_WORKERS > 1:
+        # Workers are separate processes, so uvicorn needs the import string
+        uvicorn.run('app:app', host='0.0.0.0', port=port, workers=WEB_WORKERS)
+    else:
+        uvicorn.run(app, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-pass parse_with_regex against the previous regex-scan
+implementation on scaled-up specifications.
+
+Usage:
+    python -m benchmarks.bench_parser [--sizes 1 5 10] [--repeat 3]
+
+Sizes are in MB. Two inputs are generated for each size: static/example_spec.md
+repeated, and a synthetic spec in the Classes/Architecture/Use Cases format
+that the basic parser fully understands.
+"""
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from benchmarks.legacy_regex_parser import parse_with_regex_legacy
+from src.markdown_parser import parse_with_regex
+
+EXAMPLE_SPEC = Path(__file__).resolve().parent.parent / 'static' / 'example_spec.md'
+
+
+def synthetic_spec(n):
+    """Build a spec with n classes, n components and n use cases"""
+    lines = ['# Synthetic Project', '', '## Description', 'Generated for benchmarking.', '', '## Classes', '']
+    for i in range(n):
+        lines += [
+            f'### Class{i}', f'Class number {i}.', '',
+            '#### Attributes', '- id: int', f'- name: str = "c{i}" // Display name', '',
+            '#### Methods', '- save(force: bool, retries: int) -> bool // Persist it', '',
+        ]
+    lines += ['## Architecture', '']
+    for i in range(n):
+        lines += [
+            f'### Component{i}', f'Component number {i}.', '',
+            '#### Responsibilities', '- Handle requests', '- Store data', '',
+            '#### Interactions', f'- Component{(i + 1) % n} -> Forward: next hop', '',
+        ]
+    lines += ['## Use Cases', '']
+    for i in range(n):
+        lines += [
+            f'### Use Case {i}', f'Use case number {i}.', '',
+            '#### Actors', '- User', '',
+            '#### Flow', '1. User -> System: Start', '2. System -> Database: Save', '',
+            '#### Postconditions', '- Done', '',
+        ]
+    return '\n'.join(lines)
+
+
+def scale_to(text, size_mb):
+    """Repeat text until it reaches roughly size_mb megabytes"""
+    target = int(size_mb * 1024 * 1024)
+    return text * max(1, target // len(text))
+
+
+def best_time(func, markdown, repeat):
+    """Best wall-clock time of several runs in seconds, plus the number of items parsed"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        spec = func(markdown)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    items = len(spec['classes']) + len(spec['architecture']['components']) + len(spec['use_cases'])
+    return best, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 5, 10], help='Input sizes in MB')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    block = synthetic_spec(1)
+    per_block = len(block.encode('utf-8'))
+    inputs = [('example_spec.md', lambda size: scale_to(EXAMPLE_SPEC.read_text(encoding='utf-8'), size)),
+              ('synthetic', lambda size: synthetic_spec(max(1, int(size * 1024 * 1024 / per_block))))]
+
+    # Items counts the classes, components and use cases each parser found, since
+    # the legacy section patterns stop at the first ### heading and miss most of them
+    print(f"{'input':<16} {'size':>8} {'legacy (s)':>11} {'items':>7} {'single-pass (s)':>16} {'items':>7}")
+    for name, build in inputs:
+        for size in args.sizes:
+            markdown = build(size)
+            legacy, legacy_items = best_time(parse_with_regex_legacy, markdown, args.repeat)
+            current, current_items = best_time(parse_with_regex, markdown, args.repeat)
+            print(f"{name:<16} {len(markdown) / 1024 / 1024:>6.1f}MB {legacy:>11.3f} {legacy_items:>7} "
+                  f"{current:>16.3f} {current_items:>7}")
+
+
+if __name__ == '__main__':
+    main()
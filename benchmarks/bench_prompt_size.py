@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Compare estimated prompt input tokens of the compact, budgeted payloads against
+the previous approach of embedding the repr of the whole spec.
+
+Usage:
+    python -m benchmarks.bench_prompt_size [--items 5 50 500] [--budget 8000]
+"""
+import argparse
+import logging
+
+from benchmarks.bench_parser import synthetic_spec
+from src.markdown_parser import parse_with_regex
+from src.prompt_compaction import (estimate_tokens, to_compact_json, class_diagram_payload,
+                                   architecture_diagram_payload, sequence_diagram_payload,
+                                   code_generation_payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, nargs='+', default=[5, 50, 500],
+                        help='Classes, components and use cases in the synthetic spec')
+    parser.add_argument('--budget', type=int, default=8000, help='Token budget per prompt')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{'items':>6} {'prompt':<14} {'repr (tokens)':>14} {'compact (tokens)':>17} {'saved':>7}")
+    for n in args.items:
+        spec = parse_with_regex(synthetic_spec(n))
+        use_case = spec['use_cases'][0]
+        diagrams = {'class': 'classDiagram', 'architecture': 'flowchart TD'}
+        rows = (
+            ('class', str(spec), class_diagram_payload(spec, args.budget)),
+            ('architecture', str(spec), architecture_diagram_payload(spec, args.budget)),
+            ('sequence', str(use_case) + str(spec['classes']) + str(spec['architecture']['components']),
+             sequence_diagram_payload(use_case, spec, args.budget)),
+            ('code', str(spec) + str(diagrams), code_generation_payload(spec, diagrams, args.budget)),
+        )
+        for name, before, payload in rows:
+            old = estimate_tokens(before)
+            new = estimate_tokens(to_compact_json(payload))
+            print(f"{n:>6} {name:<14} {old:>14} {new:>17} {1 - new / old:>6.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Measure JSON serialization time and bytes on the wire for the largest API
+responses, before and after FastJSONResponse and response compression.
+
+Usage:
+    python -m benchmarks.bench_serialization [--sizes 10 100 1000 5000] [--repeat 5]
+
+For each synthetic spec size, the /api/generate-diagrams response (all
+diagrams, sequence diagrams included, plus parsed_spec) and the
+/api/generate-code response are built with the basic generators, then rendered
+with Starlette's JSONResponse and with FastJSONResponse (orjson when
+installed), and compressed with gzip and, if the brotli package is installed,
+brotli at the configured levels.
+"""
+import os
+
+# Measure the basic generators, whatever the local .env configures
+os.environ['LLM_BACKEND'] = 'gemini'
+os.environ['GEMINI_API_KEY'] = ''
+
+import time
+import logging
+import argparse
+
+from fastapi.responses import JSONResponse
+
+from benchmarks.bench_parser import synthetic_spec
+from src.markdown_parser import parse_with_regex
+from src.diagram_generator import generate_diagrams
+from src.code_generator import generate_basic_code
+from src.responses import FastJSONResponse
+from src.compression import compress, supported_encodings
+from models.spec import orjson
+
+
+def best_time(func, repeat):
+    """Fastest of repeat runs, in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def payloads(n):
+    """The generate-diagrams and generate-code response bodies for a spec with n items of each kind"""
+    spec = parse_with_regex(synthetic_spec(n))
+    diagrams = generate_diagrams(spec, include_sequence=True)
+    diagrams['parsed_spec'] = spec
+    diagrams['spec_id'] = '0' * 64
+    return {'generate-diagrams': diagrams, 'generate-code': generate_basic_code(spec)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000],
+                        help='Classes, components and use cases in each synthetic spec')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    encodings = supported_encodings()
+    print(f"FastJSONResponse uses {'orjson' if orjson is not None else 'the standard library'}; "
+          f"compression: {', '.join(encodings)}")
+    print(f"{'response':<18} {'size':>5} {'JSONResponse':>13} {'FastJSON':>9} {'speedup':>8} {'bytes':>10} "
+          + ''.join(f"{encoding + ' bytes':>11} {encoding + ' ms':>8} " for encoding in encodings))
+
+    for n in args.sizes:
+        for name, content in payloads(n).items():
+            before = best_time(lambda: JSONResponse(content), args.repeat)
+            after = best_time(lambda: FastJSONResponse(content), args.repeat)
+            body = FastJSONResponse(content).body
+            row = (f"{name:<18} {n:>5} {before * 1000:>11.2f}ms {after * 1000:>7.2f}ms {before / after:>7.1f}x "
+                   f"{len(body):>10}")
+            for encoding in encodings:
+                seconds = best_time(lambda: compress(body, encoding), args.repeat)
+                row += f" {len(compress(body, encoding)):>10} {seconds * 1000:>8.2f}"
+            print(row)
+
+
+if __name__ == '__main__':
+    main()
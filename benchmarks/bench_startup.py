@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Track cold-start cost of importing the application.
+
+Runs `python -X importtime -c "import app"` in fresh interpreters and reports
+wall-clock time, the cumulative import time of the module, the slowest
+imports, and whether the model SDK was pulled in at import time (it should
+only be loaded on the first request that needs it).
+
+Usage:
+    python -m benchmarks.bench_startup [--module app] [--runs 5] [--top 15] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SDK_MODULE = 'google.generativeai'
+
+
+def run_once(module):
+    """
+    Import module in a fresh interpreter with -X importtime.
+
+    Returns:
+        tuple: (wall-clock seconds, {imported module: cumulative microseconds})
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=REPO_ROOT, capture_output=True, text=True, env=dict(os.environ))
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        cumulative[name.strip()] = int(cumulative_us)
+    return elapsed, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help='Module to import')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start (median is reported)')
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    wall = statistics.median(elapsed for elapsed, _ in runs)
+    last = runs[-1][1]
+    module_us = statistics.median(imports.get(args.module, 0) for _, imports in runs)
+    slowest = sorted(last.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    print(f"Interpreter start + import {args.module}: {wall * 1000:.1f} ms (median of {args.runs})")
+    print(f"Cumulative import time of {args.module}: {module_us / 1000:.1f} ms")
+    print(f"{SDK_MODULE} imported at startup: {'yes' if SDK_MODULE in last else 'no'}")
+    print()
+    print(f"{'cumulative (ms)':>16}  module")
+    for name, us in slowest:
+        print(f"{us / 1000:>16.1f}  {name}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({
+                'module': args.module,
+                'runs': args.runs,
+                'wall_ms': round(wall * 1000, 1),
+                'import_ms': round(module_us / 1000, 1),
+                'sdk_imported': SDK_MODULE in last,
+                'slowest': [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for name, us in slowest],
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
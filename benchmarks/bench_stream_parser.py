@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory and time of parsing a large specification file in one go
+(read + parse_with_regex) against streaming it line by line through
+iter_spec_items.
+
+Usage:
+    python -m benchmarks.bench_stream_parser [--sizes 10 50]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_parser import synthetic_spec
+from src.markdown_parser import parse_with_regex, iter_spec_items
+
+
+def parse_whole(path):
+    """Read the whole file and parse it, returning the number of items"""
+    with open(path, 'r', encoding='utf-8') as file:
+        spec = parse_with_regex(file.read())
+    return len(spec['classes']) + len(spec['architecture']['components']) + len(spec['use_cases'])
+
+
+def parse_streaming(path):
+    """Stream the file through the parser, discarding items as they arrive"""
+    items = 0
+    with open(path, 'r', encoding='utf-8') as file:
+        for kind, _ in iter_spec_items(file):
+            if kind in ('class', 'component', 'use_case'):
+                items += 1
+    return items
+
+
+def measure(func, path):
+    """Wall-clock time in seconds, peak traced memory in MB and item count"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = func(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[10, 50], help='Input sizes in MB')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    per_block = len(synthetic_spec(1).encode('utf-8'))
+    print(f"{'size':>8} {'mode':<10} {'time (s)':>9} {'peak (MB)':>10} {'items':>8}")
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile('w', suffix='.md', encoding='utf-8', delete=False) as file:
+            file.write(synthetic_spec(max(1, int(size * 1024 * 1024 / per_block))))
+            path = file.name
+        try:
+            actual = os.path.getsize(path) / 1024 / 1024
+            for mode, func in (('whole', parse_whole), ('streaming', parse_streaming)):
+                elapsed, peak, items = measure(func, path)
+                print(f"{actual:>6.1f}MB {mode:<10} {elapsed:>9.3f} {peak:>10.2f} {items:>8}")
+        finally:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark suite for the parser, the diagram and code generators and
+the HTTP endpoints, with results saved as JSON for comparison between commits.
+
+Usage:
+    python -m benchmarks.bench_suite [--sizes 10 100 1000 10000] [--repeat 5]
+                                     [--endpoints] [--output FILE] [--compare BASELINE.json]
+
+Synthetic specs with n classes, components and use cases are generated for each
+size. The generators are measured on their basic (non-LLM) paths, since that is
+the code that scales with the spec; the model is disabled before the application
+modules are imported. --endpoints also starts the app with the deterministic stub
+model (LLM_BACKEND=stub) and measures request throughput and latency of
+/api/generate-diagrams and /api/generate-code.
+
+Results go to .benchmarks/<commit>.json by default. --compare prints the change
+of every median against a previous results file and exits with status 1 if any
+slowed down by more than --threshold.
+"""
+import os
+
+# Measure the basic generators, whatever the local .env configures
+os.environ['LLM_BACKEND'] = 'gemini'
+os.environ['GEMINI_API_KEY'] = ''
+
+import sys
+import json
+import time
+import socket
+import logging
+import platform
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_parser import synthetic_spec
+from src.markdown_parser import parse_with_regex
+from src.diagram_generator import (generate_diagrams, generate_class_diagram, generate_architecture_diagram,
+                                   generate_use_case_diagram, generate_sequence_diagram_for_use_case)
+from src.code_generator import generate_class_code, generate_basic_code
+from models.spec import Spec
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(func, repeat):
+    """Run func repeat times and summarize the wall-clock times in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times), 'rounds': repeat}
+
+
+def generator_benchmarks(n, repeat):
+    """Benchmark the parser and every generator on a spec with n items of each kind"""
+    markdown = synthetic_spec(n)
+    spec = parse_with_regex(markdown)
+    # The pipelines convert the dict once and hand the model to every basic generator
+    model = Spec.from_dict(spec)
+
+    cases = {
+        'parse_with_regex': lambda: parse_with_regex(markdown),
+        'Spec.from_dict': lambda: Spec.from_dict(spec),
+        'Spec.to_json': model.to_json,
+        'generate_class_diagram': lambda: generate_class_diagram(model),
+        'generate_architecture_diagram': lambda: generate_architecture_diagram(model),
+        'generate_use_case_diagram': lambda: generate_use_case_diagram(model),
+        'generate_sequence_diagram_for_use_case (all)': lambda: [
+            generate_sequence_diagram_for_use_case(use_case.id, use_case, model) for use_case in model.use_cases],
+        'generate_class_code (all)': lambda: [generate_class_code(cls) for cls in model.classes],
+        # End to end from the parsed dict, including the conversion
+        'generate_diagrams (with sequence)': lambda: generate_diagrams(spec, include_sequence=True),
+        'generate_basic_code': lambda: generate_basic_code(spec),
+    }
+    for name, func in cases.items():
+        yield {'name': name, 'size': n, 'bytes': len(markdown.encode('utf-8')), **measure(func, repeat)}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _post(url, body, timeout=120):
+    request = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def start_stub_app(latency):
+    """Start the app with the stub model in a subprocess and wait until it answers"""
+    port = _free_port()
+    env = dict(os.environ, LLM_BACKEND='stub', LLM_STUB_LATENCY_SECONDS=str(latency), LLM_RATE_LIMIT_RPM='0',
+               LLM_CACHE_ENABLED='false', LOG_LEVEL='WARNING', WEB_WORKERS='1')
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app:app', '--port', str(port),
+                                '--log-level', 'warning'], cwd=ROOT, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/healthz', timeout=1).close()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('The app did not start within 30 seconds')
+
+
+def throughput(func, requests, concurrency):
+    """Issue requests calls of func from concurrency threads; report req/s and latency percentiles"""
+    def timed(_):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'requests_per_second': requests / elapsed,
+        'median': statistics.median(latencies),
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def endpoint_benchmarks(sizes, requests, concurrency, latency):
+    """Benchmark the generation endpoints end to end against the stub model"""
+    process, base_url = start_stub_app(latency)
+    try:
+        for n in sizes:
+            markdown = synthetic_spec(n)
+            spec_id = _post(f'{base_url}/api/generate-diagrams', {'markdown': markdown})['spec_id']
+            cases = {
+                'POST /api/generate-diagrams': lambda: _post(f'{base_url}/api/generate-diagrams',
+                                                             {'markdown': markdown}),
+                'POST /api/generate-code': lambda: _post(f'{base_url}/api/generate-code', {'spec_id': spec_id}),
+            }
+            for name, func in cases.items():
+                yield {'name': name, 'size': n, **throughput(func, requests, concurrency)}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each median against the baseline; return True if any regressed"""
+    previous = {(row['name'], row['size']): row for row in baseline['results']}
+    regressed = False
+    print(f"\nAgainst {baseline['meta']['commit']}:")
+    print(f"{'benchmark':<46} {'size':>6} {'before':>10} {'after':>10} {'change':>8}")
+    for row in results:
+        before = previous.get((row['name'], row['size']))
+        if before is None:
+            continue
+        change = row['median'] / before['median'] - 1 if before['median'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressed = True
+            flag = '  REGRESSION'
+        print(f"{row['name']:<46} {row['size']:>6} {before['median']:>10.4f} {row['median']:>10.4f} "
+              f"{change:>+7.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                        help='Classes, components and use cases in each synthetic spec')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per generator benchmark')
+    parser.add_argument('--endpoints', action='store_true', help='Also benchmark the endpoints with the stub model')
+    parser.add_argument('--endpoint-sizes', type=int, nargs='+', default=[10, 100], help='Spec sizes for --endpoints')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per endpoint benchmark')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients per endpoint benchmark')
+    parser.add_argument('--stub-latency', type=float, default=0.05, help='Seconds the stub model takes per call')
+    parser.add_argument('--output', type=Path, help='Results file (default: .benchmarks/<commit>.json)')
+    parser.add_argument('--compare', type=Path, help='Previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Slowdown reported as a regression (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    results = []
+    print(f"{'benchmark':<46} {'size':>6} {'median (s)':>11} {'min (s)':>10}")
+    for n in args.sizes:
+        for row in generator_benchmarks(n, args.repeat):
+            results.append(row)
+            print(f"{row['name']:<46} {n:>6} {row['median']:>11.4f} {row['min']:>10.4f}")
+
+    if args.endpoints:
+        print(f"\n{'endpoint':<46} {'size':>6} {'req/s':>8} {'median (s)':>11} {'p95 (s)':>9}")
+        for row in endpoint_benchmarks(args.endpoint_sizes, args.requests, args.concurrency, args.stub_latency):
+            results.append(row)
+            print(f"{row['name']:<46} {row['size']:>6} {row['requests_per_second']:>8.1f} "
+                  f"{row['median']:>11.4f} {row['p95']:>9.4f}")
+
+    commit = git_commit()
+    report = {
+        'meta': {'commit': commit, 'timestamp': time.time(), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'results': results,
+    }
+    output = args.output or ROOT / '.benchmarks' / f'{commit}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
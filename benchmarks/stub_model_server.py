@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini REST API, answered by the deterministic stub
+backend. Point the app at it with LLM_BACKEND=http to load-test the full
+network path without an API key.
+
+Usage:
+    python -m benchmarks.stub_model_server [--port 8081] [--latency 0.5] [--responses canned.json]
+
+Serves POST /v1beta/models/{model}:generateContent and
+:streamGenerateContent?alt=sse.
+"""
+import argparse
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.model_backends import StubBackend, _load_stub_responses
+
+
+def make_handler(backend):
+    """Build a request handler class bound to backend"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            path, _, query = self.path.partition('?')
+            if not path.startswith('/v1beta/models/') or ':' not in path:
+                self.send_error(404)
+                return
+
+            method = path.rsplit(':', 1)[1]
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                prompt = ''.join(part.get('text', '') for content in body.get('contents', [])
+                                 for part in content.get('parts', []))
+            except (ValueError, AttributeError):
+                self.send_error(400)
+                return
+
+            if method == 'generateContent':
+                self._send_json(candidate(backend.generate_content(prompt).text))
+            elif method == 'streamGenerateContent':
+                self._send_events(chunk.text for chunk in backend.generate_content(prompt, stream=True))
+            else:
+                self.send_error(404)
+
+        def _send_json(self, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_events(self, chunks):
+            data = ''.join(f"data: {json.dumps(candidate(text))}\r\n\r\n" for text in chunks).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logging.debug(format, *args)
+
+    return Handler
+
+
+def candidate(text):
+    """Wrap text in a generateContent response body"""
+    return {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds before each response')
+    parser.add_argument('--responses', help='JSON file mapping prompt substrings to canned responses')
+    args = parser.parse_args()
+
+    backend = StubBackend('stub', latency=args.latency, responses=_load_stub_responses(args.responses))
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(backend))
+    print(f"Stub model server listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
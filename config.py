@@ -13,6 +13,82 @@ GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
 # Model Configuration
 GEMINI_MODEL = "gemini-2.0-flash-lite"  # Model to use for all generations
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')  # 'gemini', 'http' (local REST stand-in) or 'stub' (offline)
+LLM_HTTP_BASE_URL = os.environ.get('LLM_HTTP_BASE_URL', 'http://localhost:8081')  # Server used by the 'http' backend
+LLM_HTTP_API_KEY = os.environ.get('LLM_HTTP_API_KEY')  # Sent to LLM_HTTP_BASE_URL; never the Gemini key
+LLM_STUB_LATENCY_SECONDS = float(os.environ.get('LLM_STUB_LATENCY_SECONDS', '0.5'))  # Simulated latency of the 'stub' backend
+LLM_STUB_RESPONSES_PATH = os.environ.get('LLM_STUB_RESPONSES_PATH')  # JSON {prompt substring: response} for the 'stub' backend
+LLM_MODEL_ID = GEMINI_MODEL if LLM_BACKEND == 'gemini' else f"{LLM_BACKEND}:{GEMINI_MODEL}"  # Keys cached results per backend
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '8'))  # Max concurrent LLM calls per process
+
+# LLM Client Resilience Configuration
+LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get('LLM_CALL_TIMEOUT_SECONDS', '60'))  # Deadline for a single model call
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '3'))  # Retries for 429/5xx/timeouts after the first attempt
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.environ.get('LLM_RETRY_BASE_DELAY_SECONDS', '0.5'))  # Doubled on every retry, with jitter
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.environ.get('LLM_RETRY_MAX_DELAY_SECONDS', '8'))
+LLM_RATE_LIMIT_RPM = float(os.environ.get('LLM_RATE_LIMIT_RPM', '0'))  # Requests per minute allowed by the quota (0 disables)
+LLM_RATE_LIMIT_BURST = int(os.environ.get('LLM_RATE_LIMIT_BURST', '5'))  # Requests that may be sent back to back
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('LLM_CIRCUIT_FAILURE_THRESHOLD', '5'))  # Consecutive failures that open the circuit
+LLM_CIRCUIT_RESET_SECONDS = float(os.environ.get('LLM_CIRCUIT_RESET_SECONDS', '30'))  # Time before a trial call is let through
+LLM_COALESCE_REQUESTS = os.environ.get('LLM_COALESCE_REQUESTS', 'True').lower() == 'true'  # Share identical in-flight calls
+
+# Parser Configuration
+INCREMENTAL_PARSING = os.environ.get('INCREMENTAL_PARSING', 'False').lower() == 'true'  # Re-parse only changed sections
+INCREMENTAL_SECTION_CACHE_SIZE = int(os.environ.get('INCREMENTAL_SECTION_CACHE_SIZE', '2048'))  # Parsed sections kept in memory
+PARSE_STREAM_QUEUE_SIZE = int(os.environ.get('PARSE_STREAM_QUEUE_SIZE', '256'))  # Items parsed from an upload ahead of the response
+
+# Diagram Generation Configuration
+DIAGRAM_CONCURRENCY = int(os.environ.get('DIAGRAM_CONCURRENCY', '4'))  # Diagram jobs run at once per request
+DIAGRAM_JOB_TIMEOUT_SECONDS = float(os.environ.get('DIAGRAM_JOB_TIMEOUT_SECONDS', '60'))  # Before falling back to the basic generator
+
+# Code Generation Configuration
+CODE_GENERATION_MODE = os.environ.get('CODE_GENERATION_MODE', 'single')  # 'single' prompt or one job 'per_file'
+CODE_GENERATION_CONCURRENCY = int(os.environ.get('CODE_GENERATION_CONCURRENCY', '4'))  # Per-file jobs run at once
+CODE_JOB_RETRIES = int(os.environ.get('CODE_JOB_RETRIES', '1'))  # Extra attempts for a per-file job before falling back
+
+# Prompt Template Configuration
+PROMPTS_RELOAD_INTERVAL_SECONDS = float(os.environ.get('PROMPTS_RELOAD_INTERVAL_SECONDS', '2'))  # How often edited prompt files are picked up (0 disables)
+
+# Static File Configuration
+STATIC_RELOAD_INTERVAL_SECONDS = float(os.environ.get('STATIC_RELOAD_INTERVAL_SECONDS', '2'))  # How often edited static files and index.html are picked up (0 disables)
+STATIC_MAX_AGE_SECONDS = int(os.environ.get('STATIC_MAX_AGE_SECONDS', str(365 * 24 * 3600)))  # Browser cache lifetime of versioned (?v=) asset URLs
+
+# Prompt Compaction Configuration
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '8000'))  # Estimated tokens of spec data per prompt
+
+# LLM Result Cache Configuration
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'llm_cache.sqlite3'))
+LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '10000'))  # Disk entries kept before LRU eviction
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get('LLM_CACHE_MEMORY_ENTRIES', '256'))  # Entries kept in the in-memory LRU
+
+# Spec Store Configuration
+SPEC_STORE_PATH = os.environ.get('SPEC_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'specs.sqlite3'))
+SPEC_STORE_TTL_SECONDS = int(os.environ.get('SPEC_STORE_TTL_SECONDS', str(7 * 24 * 3600)))  # How long a spec ID stays valid
+
+# Background Job Configuration
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'jobs.sqlite3'))
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', '2'))  # Jobs run at once per worker
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', '900'))  # Without progress before a job is considered abandoned
+JOB_RESULT_TTL_SECONDS = int(os.environ.get('JOB_RESULT_TTL_SECONDS', str(7 * 24 * 3600)))  # How long finished jobs are kept
+
+# Request Tracing Configuration
+REQUEST_TRACING_ENABLED = os.environ.get('REQUEST_TRACING_ENABLED', 'False').lower() == 'true'  # Honour X-Trace / ?trace= on requests
+TRACE_DIR = os.environ.get('TRACE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'traces'))
+TRACE_MAX_FILES = int(os.environ.get('TRACE_MAX_FILES', '100'))  # Newest trace files kept in TRACE_DIR
+
+# Response Compression Configuration
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True').lower() == 'true'  # gzip/brotli by Accept-Encoding
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))  # Bytes; smaller bodies are sent as they are
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))  # 1-9
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))  # 0-11; above ~5 is too slow for dynamic responses
+
+# Deployment Configuration
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', '1'))  # Server processes (python app.py and gunicorn.conf.py)
+SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', 'sqlite' if WEB_WORKERS > 1 else 'memory')  # 'memory', 'sqlite' or 'redis'
+SHARED_STATE_PATH = os.environ.get('SHARED_STATE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'shared_state.sqlite3'))
+SHARED_STATE_REDIS_URL = os.environ.get('SHARED_STATE_REDIS_URL', 'redis://localhost:6379/0')
 
 # Logging Configuration
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
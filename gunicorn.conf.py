@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Gunicorn configuration for multi-worker deployments.
+
+Usage:
+    gunicorn app:app -c gunicorn.conf.py
+
+Workers share the LLM result cache and the rate-limit budget through
+SHARED_STATE_BACKEND (SQLite by default when WEB_WORKERS > 1).
+"""
+import os
+
+from config import WEB_WORKERS
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = WEB_WORKERS
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Long LLM calls; keep this above LLM_CALL_TIMEOUT_SECONDS times the retries
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = 30
+
+# Workers import the app themselves, so nothing (model, SQLite connections,
+# thread pools) is created before the fork
+preload_app = False
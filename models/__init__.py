@@ -1 +1,3 @@
-# Models package 
\ No newline at end of file
+# Models package
+from models.spec import (Spec, Class, Attribute, Method, Parameter, Component, Connection, UseCase, FlowStep,
+                         dumps, loads)
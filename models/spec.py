@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Typed, compact model of a parsed specification.
+
+The parsed spec travels between the browser, the cache and the server as a
+plain dict, and that dict stays the wire and storage format. Inside the
+generators, a spec that is read many times (every basic diagram, every
+sequence diagram, every scaffolded file) is converted once into these slotted
+objects: from_dict validates and coerces whatever the LLM or the regex parser
+produced, repeated names and types are interned, and the lookups the
+generators need (by class or component name, by use case ID, the distinct
+actors) are indexed instead of rescanned.
+
+JSON goes through orjson when it is installed and the standard library
+otherwise.
+"""
+import sys
+import json
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up
+    orjson = None
+
+_intern = sys.intern
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Serialize to compact UTF-8 JSON.
+
+    Args:
+        value: JSON-compatible data
+
+    Returns:
+        bytes: The encoded document
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Parse a JSON document.
+
+    Raises:
+        json.JSONDecodeError: If data is not valid JSON (orjson's error is a subclass)
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _text(value: Any, default: str = '') -> str:
+    """Coerce a scalar from model output to a string"""
+    if value.__class__ is str:
+        return value
+    return default if value is None else str(value)
+
+
+def _name(value: Any, default: str = '') -> str:
+    """Coerce and intern a name or type, which repeat across a spec"""
+    if value.__class__ is not str:
+        value = default if value is None else str(value)
+    return _intern(value)
+
+
+def _dicts(value: Any) -> List[Dict[str, Any]]:
+    """The dict entries of a list, dropping anything else the model produced"""
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, dict)]
+
+
+def _texts(value: Any) -> List[str]:
+    """A list of strings (responsibilities, conditions); a lone string becomes a one-item list"""
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list):
+        return []
+    return [item if item.__class__ is str else _text(item) for item in value if item is not None]
+
+
+def _names(value: Any) -> List[str]:
+    """A list of interned strings (actors)"""
+    return [_intern(item) for item in _texts(value)]
+
+
+class Parameter:
+    """A method parameter."""
+
+    __slots__ = ('name', 'type')
+
+    def __init__(self, name: str, type: str = 'Any'):
+        self.name = name
+        self.type = type
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Parameter':
+        name, type_ = data.get('name'), data.get('type')
+        # Inline fast path for the common case of well-formed strings
+        return cls(_intern(name) if name.__class__ is str else _name(name),
+                   _intern(type_) if type_.__class__ is str else _name(type_, 'Any'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'type': self.type}
+
+
+class Attribute:
+    """A class attribute."""
+
+    __slots__ = ('name', 'type', 'default', 'comment')
+
+    def __init__(self, name: str, type: str = 'str', default: Optional[str] = None, comment: Optional[str] = None):
+        self.name = name
+        self.type = type
+        self.default = default
+        self.comment = comment
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Attribute':
+        name, type_, default, comment = data.get('name'), data.get('type'), data.get('default'), data.get('comment')
+        return cls(_intern(name) if name.__class__ is str else _name(name),
+                   _intern(type_) if type_.__class__ is str else _name(type_, 'str'),
+                   default if default is None or default.__class__ is str else _text(default),
+                   comment if comment is None or comment.__class__ is str else _text(comment))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'type': self.type, 'default': self.default, 'comment': self.comment}
+
+
+class Method:
+    """A class method."""
+
+    __slots__ = ('name', 'parameters', 'return_type', 'comment')
+
+    def __init__(self, name: str, parameters: Optional[List[Parameter]] = None, return_type: str = 'None',
+                 comment: Optional[str] = None):
+        self.name = name
+        self.parameters = parameters or []
+        self.return_type = return_type
+        self.comment = comment
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Method':
+        name, return_type, comment = data.get('name'), data.get('return_type'), data.get('comment')
+        return cls(_intern(name) if name.__class__ is str else _name(name),
+                   [Parameter.from_dict(param) for param in _dicts(data.get('parameters'))],
+                   _intern(return_type) if return_type.__class__ is str else _name(return_type, 'None'),
+                   comment if comment is None or comment.__class__ is str else _text(comment))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'parameters': [param.to_dict() for param in self.parameters],
+                'return_type': self.return_type, 'comment': self.comment}
+
+
+class Class:
+    """A class of the domain model."""
+
+    __slots__ = ('name', 'attributes', 'methods')
+
+    def __init__(self, name: str, attributes: Optional[List[Attribute]] = None,
+                 methods: Optional[List[Method]] = None):
+        self.name = name
+        self.attributes = attributes or []
+        self.methods = methods or []
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Class':
+        return cls(_text(data.get('name')),
+                   [Attribute.from_dict(attr) for attr in _dicts(data.get('attributes'))],
+                   [Method.from_dict(method) for method in _dicts(data.get('methods'))])
+
+    @classmethod
+    def coerce(cls, value: Union['Class', Dict[str, Any]]) -> 'Class':
+        """Accept either a Class or its dict form"""
+        return value if isinstance(value, cls) else cls.from_dict(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'attributes': [attr.to_dict() for attr in self.attributes],
+                'methods': [method.to_dict() for method in self.methods]}
+
+
+class Component:
+    """An architecture component."""
+
+    __slots__ = ('name', 'description', 'responsibilities')
+
+    def __init__(self, name: str, description: str = '', responsibilities: Optional[List[str]] = None):
+        self.name = name
+        self.description = description
+        self.responsibilities = responsibilities or []
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Component':
+        return cls(_text(data.get('name')), _text(data.get('description')), _texts(data.get('responsibilities')))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'description': self.description, 'responsibilities': list(self.responsibilities)}
+
+
+class Connection:
+    """A directed connection between two components."""
+
+    __slots__ = ('source', 'target', 'description')
+
+    def __init__(self, source: str, target: str, description: str = ''):
+        self.source = source
+        self.target = target
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Connection':
+        return cls(_name(data.get('source')), _name(data.get('target')), _text(data.get('description')))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'source': self.source, 'target': self.target, 'description': self.description}
+
+
+class FlowStep:
+    """One step of a use case flow."""
+
+    __slots__ = ('step', 'actor', 'action', 'message')
+
+    def __init__(self, step: int, actor: str, action: str = '', message: str = ''):
+        self.step = step
+        self.actor = actor
+        self.action = action
+        self.message = message
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], position: int = 1) -> 'FlowStep':
+        step, actor, action, message = data.get('step'), data.get('actor'), data.get('action'), data.get('message')
+        if step.__class__ is not int:
+            try:
+                step = int(step)
+            except (TypeError, ValueError):
+                step = position
+        return cls(step, _intern(actor) if actor.__class__ is str else _name(actor),
+                   _intern(action) if action.__class__ is str else _name(action),
+                   message if message.__class__ is str else _text(message))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'step': self.step, 'actor': self.actor, 'action': self.action, 'message': self.message}
+
+
+class UseCase:
+    """A use case with its actors and flow."""
+
+    __slots__ = ('id', 'name', 'description', 'actors', 'preconditions', 'flow', 'postconditions')
+
+    def __init__(self, id: str, name: str, description: str = '', actors: Optional[List[str]] = None,
+                 preconditions: Optional[List[str]] = None, flow: Optional[List[FlowStep]] = None,
+                 postconditions: Optional[List[str]] = None):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.actors = actors or []
+        self.preconditions = preconditions or []
+        self.flow = flow or []
+        self.postconditions = postconditions or []
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], position: int = 1) -> 'UseCase':
+        """
+        Args:
+            data (dict): The use case as parsed
+            position (int): 1-based position in the spec, used for a missing ID
+        """
+        return cls(_text(data.get('id'), f"UC{position}"), _text(data.get('name')), _text(data.get('description')),
+                   _names(data.get('actors')), _texts(data.get('preconditions')),
+                   [FlowStep.from_dict(step, i + 1) for i, step in enumerate(_dicts(data.get('flow')))],
+                   _texts(data.get('postconditions')))
+
+    @classmethod
+    def coerce(cls, value: Union['UseCase', Dict[str, Any]]) -> 'UseCase':
+        """Accept either a UseCase or its dict form"""
+        return value if isinstance(value, cls) else cls.from_dict(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'id': self.id, 'name': self.name, 'description': self.description, 'actors': list(self.actors),
+                'preconditions': list(self.preconditions), 'flow': [step.to_dict() for step in self.flow],
+                'postconditions': list(self.postconditions)}
+
+
+class Spec:
+    """
+    A complete parsed specification.
+
+    Indexes are built on first use and assume the spec is not modified
+    afterwards.
+    """
+
+    __slots__ = ('title', 'description', 'classes', 'entities', 'components', 'connections', 'use_cases',
+                 '_classes_by_name', '_components_by_name', '_use_cases_by_id', '_actors', '_participant_ids')
+
+    def __init__(self, title: str = '', description: str = '', classes: Optional[List[Class]] = None,
+                 entities: Optional[List[Any]] = None, components: Optional[List[Component]] = None,
+                 connections: Optional[List[Connection]] = None, use_cases: Optional[List[UseCase]] = None):
+        self.title = title
+        self.description = description
+        self.classes = classes or []
+        self.entities = entities or []
+        self.components = components or []
+        self.connections = connections or []
+        self.use_cases = use_cases or []
+        self._classes_by_name = None
+        self._components_by_name = None
+        self._use_cases_by_id = None
+        self._actors = None
+        self._participant_ids = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Spec':
+        """
+        Validate a spec produced by the LLM or the regex parser.
+
+        Missing fields get the same defaults as the regex parser, scalars are
+        coerced to strings, entries that are not objects are dropped and use
+        cases without an ID are numbered by position.
+
+        Args:
+            data (dict): Parsed specification
+
+        Returns:
+            Spec: The validated specification
+
+        Raises:
+            ValueError: If data is not a JSON object
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected the specification to be an object, got {type(data).__name__}")
+        architecture = data.get('architecture')
+        if not isinstance(architecture, dict):
+            architecture = {}
+        entities = data.get('entities')
+        return cls(
+            _text(data.get('title')),
+            _text(data.get('description')),
+            [Class.from_dict(item) for item in _dicts(data.get('classes'))],
+            entities if isinstance(entities, list) else [],
+            [Component.from_dict(item) for item in _dicts(architecture.get('components'))],
+            [Connection.from_dict(item) for item in _dicts(architecture.get('connections'))],
+            [UseCase.from_dict(item, i + 1) for i, item in enumerate(_dicts(data.get('use_cases')))],
+        )
+
+    @classmethod
+    def coerce(cls, value: Union['Spec', Dict[str, Any]]) -> 'Spec':
+        """Accept either a Spec or its dict form"""
+        return value if isinstance(value, cls) else cls.from_dict(value)
+
+    @classmethod
+    def from_json(cls, data: Union[bytes, str]) -> 'Spec':
+        return cls.from_dict(loads(data))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The dict form used by the API, the caches and the prompts"""
+        return {
+            'title': self.title,
+            'description': self.description,
+            'classes': [item.to_dict() for item in self.classes],
+            'entities': list(self.entities),
+            'architecture': {
+                'components': [item.to_dict() for item in self.components],
+                'connections': [item.to_dict() for item in self.connections],
+            },
+            'use_cases': [item.to_dict() for item in self.use_cases],
+        }
+
+    def to_json(self) -> bytes:
+        return dumps(self.to_dict())
+
+    def class_by_name(self, name: str) -> Optional[Class]:
+        """The first class with this name, or None"""
+        if self._classes_by_name is None:
+            self._classes_by_name = _first_by(self.classes, 'name')
+        return self._classes_by_name.get(name)
+
+    def component_by_name(self, name: str) -> Optional[Component]:
+        """The first component with this name, or None"""
+        if self._components_by_name is None:
+            self._components_by_name = _first_by(self.components, 'name')
+        return self._components_by_name.get(name)
+
+    def use_case_by_id(self, use_case_id: str) -> Optional[UseCase]:
+        """The first use case with this ID, or None"""
+        if self._use_cases_by_id is None:
+            self._use_cases_by_id = _first_by(self.use_cases, 'id')
+        return self._use_cases_by_id.get(use_case_id)
+
+    @property
+    def actors(self) -> List[str]:
+        """Distinct actors over all use cases, in order of first appearance"""
+        if self._actors is None:
+            self._actors = list(dict.fromkeys(actor for use_case in self.use_cases for actor in use_case.actors))
+        return self._actors
+
+    @property
+    def participant_ids(self) -> List[str]:
+        """Component names as Mermaid identifiers (spaces replaced by underscores)"""
+        if self._participant_ids is None:
+            self._participant_ids = [component.name.replace(' ', '_') for component in self.components]
+        return self._participant_ids
+
+
+def _first_by(items: Iterable[Any], attribute: str) -> Dict[str, Any]:
+    """Index items by an attribute, keeping the first item for each value"""
+    index = {}
+    for item in items:
+        index.setdefault(getattr(item, attribute), item)
+    return index
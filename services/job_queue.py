@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Background jobs for long-running generation.
+
+Submitting a job returns its ID straight away while the work runs as an
+asyncio task in the server process, bounded by JOB_CONCURRENCY. Job state,
+progress and results are persisted in SQLite, so any worker can report on a
+job, results survive restarts and can be fetched any number of times, and
+resubmitting the same input returns the existing job instead of regenerating.
+The process holding a job heartbeats it from submission until it finishes,
+queued or running, so only jobs whose worker went away are reported as
+stale. Store access runs in worker threads to keep the event loop free.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.llm_cache import normalize_input
+from src.markdown_parser import parse_markdown_spec_async
+from src.diagram_generator import generate_diagrams_async
+from src.code_generator import generate_code_async
+from services.spec_store import get_spec_store, make_spec_id
+from config import JOBS_DB_PATH, JOB_CONCURRENCY, JOB_STALE_SECONDS, JOB_RESULT_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ('diagrams', 'code')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class JobStore:
+    """SQLite-backed record of jobs, shared by every server worker."""
+
+    def __init__(self, path: str, result_ttl_seconds: int):
+        self.path = Path(path)
+        self.result_ttl_seconds = result_ttl_seconds
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the store on first use, and again in a forked worker"""
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, input_hash TEXT NOT NULL, payload TEXT NOT NULL, "
+                "status TEXT NOT NULL, progress TEXT NOT NULL, result TEXT, error TEXT, "
+                "created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_input ON jobs (kind, input_hash)")
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def create(self, kind: str, input_hash: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a new queued job and drop jobs older than the retention period"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM jobs WHERE updated < ?", (now - self.result_ttl_seconds,))
+            conn.execute("INSERT INTO jobs (id, kind, input_hash, payload, status, progress, created, updated) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (job_id, kind, input_hash, json.dumps(payload), QUEUED, json.dumps({}), now, now))
+            conn.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str, include_payload: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Look up a job.
+
+        Args:
+            job_id (str): ID returned when the job was submitted
+            include_payload (bool): Also return the job's input
+
+        Returns:
+            dict: The job, or None if it does not exist
+        """
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row, include_payload) if row else None
+
+    def find(self, kind: str, input_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the most recent job for the same input, if any"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT * FROM jobs WHERE kind = ? AND input_hash = ? ORDER BY created DESC LIMIT 1",
+                (kind, input_hash)).fetchone()
+        return self._to_job(row) if row else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        """
+        Update a job's status, progress, result or error.
+
+        The updated timestamp doubles as a heartbeat for detecting jobs whose
+        worker went away; calling this without fields only beats it.
+        """
+        columns = {key: json.dumps(value) if key in ('progress', 'result') else value
+                   for key, value in fields.items()}
+        columns['updated'] = time.time()
+        assignments = ', '.join(f"{column} = ?" for column in columns)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+            conn.commit()
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row, include_payload: bool = False) -> Dict[str, Any]:
+        """Convert a row into the job dict returned by the API"""
+        job = {
+            'job_id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'progress': json.loads(row['progress']),
+            'created': row['created'],
+            'updated': row['updated'],
+        }
+        if row['result'] is not None:
+            job['result'] = json.loads(row['result'])
+        if row['error'] is not None:
+            job['error'] = row['error']
+        if include_payload:
+            job['payload'] = json.loads(row['payload'])
+        return job
+
+
+# Job store singleton
+_store_instance = None
+_store_lock = threading.Lock()
+
+# Running tasks are referenced here so they are not garbage collected
+_tasks = set()
+_semaphores = {}
+
+
+def get_job_store() -> JobStore:
+    """
+    Get the shared job store.
+
+    Returns:
+        JobStore: The process-wide store, configured from config.py
+    """
+    global _store_instance
+
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = JobStore(JOBS_DB_PATH, JOB_RESULT_TTL_SECONDS)
+    return _store_instance
+
+
+def is_stale(job: Dict[str, Any]) -> bool:
+    """True for a queued or running job whose worker has not heartbeaten it for JOB_STALE_SECONDS"""
+    return job['status'] in (QUEUED, RUNNING) and time.time() - job['updated'] > JOB_STALE_SECONDS
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return a job's status, progress and, once finished, its result or error.
+
+    A job whose worker stopped reporting (a restart mid-job) is reported as failed.
+    """
+    job = get_job_store().get(job_id)
+    if job and is_stale(job):
+        job['status'] = FAILED
+        job['error'] = 'The worker running this job stopped; submit it again to retry'
+    return job
+
+
+async def get_job_async(job_id: str) -> Optional[Dict[str, Any]]:
+    """Async variant of get_job; the store is read in a worker thread"""
+    return await asyncio.to_thread(get_job, job_id)
+
+
+async def submit_job(kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Queue a generation job and return immediately.
+
+    An identical earlier job that succeeded or is still making progress is
+    returned as is; a failed or stale one is run again.
+
+    Args:
+        kind (str): 'diagrams' ({markdown, include_sequence}) or 'code' ({parsed_spec, diagrams})
+        payload (dict): The job's input
+
+    Returns:
+        dict: The job, including its job_id
+
+    Raises:
+        ValueError: If kind is unknown
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind {kind!r}; expected one of {', '.join(JOB_KINDS)}")
+
+    store = get_job_store()
+    input_hash = hashlib.sha256(normalize_input(payload).encode('utf-8')).hexdigest()
+    existing = await asyncio.to_thread(store.find, kind, input_hash)
+    if existing and existing['status'] != FAILED and not is_stale(existing):
+        logger.info(f"Reusing {existing['status']} {kind} job {existing['job_id']}")
+        return existing
+
+    job = await asyncio.to_thread(store.create, kind, input_hash, payload)
+    task = asyncio.get_running_loop().create_task(_run_job(job['job_id'], kind, payload))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    logger.info(f"Queued {kind} job {job['job_id']}")
+    return job
+
+
+async def _run_job(job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+    """Run one job, recording progress, its result or its error in the store"""
+    store = get_job_store()
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(JOB_CONCURRENCY)
+
+    async def update(**fields):
+        await asyncio.to_thread(store.update, job_id, **fields)
+
+    # Queued jobs waiting for the semaphore are alive too
+    heartbeat = loop.create_task(_heartbeat(update))
+    try:
+        async with semaphore:
+            await update(status=RUNNING)
+            runner = _run_diagrams_job if kind == 'diagrams' else _run_code_job
+            try:
+                result = await runner(payload, lambda **progress: update(progress=progress))
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+                await update(status=FAILED, error=str(e))
+                return
+            await update(status=SUCCEEDED, result=result)
+            logger.info(f"Job {job_id} succeeded")
+    finally:
+        heartbeat.cancel()
+
+
+async def _heartbeat(update: Callable[..., Awaitable[None]]) -> None:
+    """Refresh a job's updated timestamp well within JOB_STALE_SECONDS until cancelled"""
+    interval = max(1.0, JOB_STALE_SECONDS / 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await update()
+        except sqlite3.Error as e:
+            logger.error(f"Error recording job heartbeat: {e}")
+
+
+async def _run_diagrams_job(payload: Dict[str, Any], report: Callable[..., Awaitable[None]]) -> Dict[str, Any]:
+    """Parse the markdown and generate its diagrams, like /api/generate-diagrams"""
+    await report(stage='parsing')
+    parsed_spec = await parse_markdown_spec_async(payload.get('markdown', ''))
+
+    await report(stage='diagrams')
+    diagrams = await generate_diagrams_async(parsed_spec, include_sequence=bool(payload.get('include_sequence')))
+
+    spec_id = make_spec_id(payload.get('markdown', ''), bool(payload.get('include_sequence')))
+    await asyncio.to_thread(get_spec_store().put, spec_id, parsed_spec, diagrams)
+    diagrams['parsed_spec'] = parsed_spec
+    diagrams['spec_id'] = spec_id
+    return diagrams
+
+
+async def _run_code_job(payload: Dict[str, Any], report: Callable[..., Awaitable[None]]) -> Dict[str, str]:
+    """Generate code like /api/generate-code, with its retries and fallbacks"""
+    await report(stage='generating')
+    return await generate_code_async(payload.get('parsed_spec', {}), payload.get('diagrams', {}))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Server-side store of parsed specifications and their diagrams.
+
+/api/generate-diagrams saves its result under a spec ID (the hash of the
+markdown and of whether sequence diagrams were included), so later requests can send that ID instead of re-uploading the
+markdown, the parsed spec and every diagram. Entries live in SQLite, so every
+server worker sees them and they survive restarts until they expire.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from models.spec import dumps, loads
+from config import SPEC_STORE_PATH, SPEC_STORE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def make_spec_id(markdown: str, include_sequence: bool = False) -> str:
+    """
+    Compute the spec ID for a markdown specification.
+
+    The two variants of /api/generate-diagrams store different diagrams, so
+    each gets its own ID.
+
+    Args:
+        markdown (str): The specification as uploaded
+        include_sequence (bool): Whether the stored diagrams include sequence diagrams
+
+    Returns:
+        str: Hex SHA-256 of the markdown and the variant
+    """
+    variant = 'sequence' if include_sequence else 'basic'
+    return hashlib.sha256(f"{variant}\0{markdown}".encode('utf-8')).hexdigest()
+
+
+class SpecStore:
+    """SQLite-backed map of spec ID to parsed spec and diagrams."""
+
+    def __init__(self, path: str, ttl_seconds: int):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the store on first use, and again in a forked worker"""
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS specs ("
+                "id TEXT PRIMARY KEY, parsed_spec TEXT NOT NULL, diagrams TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def put(self, spec_id: str, parsed_spec: Dict[str, Any], diagrams: Dict[str, Any]) -> None:
+        """
+        Save a parsed spec and its diagrams, replacing any earlier entry.
+
+        Args:
+            spec_id (str): ID from make_spec_id
+            parsed_spec (dict): The parsed specification
+            diagrams (dict): The generated diagrams, without parsed_spec
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM specs WHERE updated < ?", (now - self.ttl_seconds,))
+            conn.execute("INSERT OR REPLACE INTO specs (id, parsed_spec, diagrams, updated) VALUES (?, ?, ?, ?)",
+                         (spec_id, dumps(parsed_spec).decode('utf-8'), dumps(diagrams).decode('utf-8'), now))
+            conn.commit()
+
+    def get(self, spec_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a stored spec.
+
+        Args:
+            spec_id (str): ID returned by /api/generate-diagrams
+
+        Returns:
+            dict: {'parsed_spec', 'diagrams'}, or None if unknown or expired
+        """
+        with self._lock:
+            row = self._connect().execute("SELECT parsed_spec, diagrams, updated FROM specs WHERE id = ?",
+                                          (spec_id,)).fetchone()
+        if row is None or time.time() - row[2] > self.ttl_seconds:
+            return None
+        return {'parsed_spec': loads(row[0]), 'diagrams': loads(row[1])}
+
+    def touch(self, spec_id: str) -> bool:
+        """
+        Restart a stored spec's expiry without loading it.
+
+        Args:
+            spec_id (str): ID from make_spec_id
+
+        Returns:
+            bool: True if the spec was stored and not yet expired
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute("UPDATE specs SET updated = ? WHERE id = ? AND updated >= ?",
+                                  (now, spec_id, now - self.ttl_seconds))
+            conn.commit()
+        return cursor.rowcount > 0
+
+
+# Spec store singleton
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_spec_store() -> SpecStore:
+    """
+    Get the shared spec store.
+
+    Returns:
+        SpecStore: The process-wide store, configured from config.py
+    """
+    global _store_instance
+
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = SpecStore(SPEC_STORE_PATH, SPEC_STORE_TTL_SECONDS)
+    return _store_instance
@@ -2,74 +2,275 @@
 """
 Centralized module for managing AI model instances.
 This ensures we use a single model instance across the application.
+
+The backend (and the SDK behind it) is created lazily on first use, exactly
+once, so importing this module stays cheap.
 """
+import asyncio
+import hashlib
 import logging
-import google.generativeai as genai
-from config import GEMINI_API_KEY, GEMINI_MODEL
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (GEMINI_API_KEY, LLM_BACKEND, LLM_MODEL_ID, LLM_MAX_CONCURRENCY, LLM_CALL_TIMEOUT_SECONDS,
+                    LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY_SECONDS, LLM_RETRY_MAX_DELAY_SECONDS, LLM_RATE_LIMIT_RPM,
+                    LLM_RATE_LIMIT_BURST, LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS,
+                    LLM_COALESCE_REQUESTS)
+from src.llm_client import LLMClient, CircuitBreaker, CircuitOpenError, LLMCallTimeout
+from src.shared_state import create_rate_limiter
+from src.single_flight import SingleFlight
+from src.model_backends import create_backend
+from src.metrics import observe_stage, record_tokens
 
 logger = logging.getLogger(__name__)
 
 # Initialize model singleton
 _model_instance = None
+_model_initialized = False
+_model_lock = threading.Lock()
+
+# Bounded pool used to run blocking SDK calls off the event loop
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="gemini")
 
 def initialize_model():
-    """Initialize the Gemini model if API key is available."""
-    global _model_instance
+    """
+    Initialize the configured model backend (Gemini needs an API key).
     
-    if not GEMINI_API_KEY:
-        logger.warning("Gemini API key not found. AI features will be unavailable.")
-        return False
+    Only the first call does any work; concurrent and later calls wait for it
+    and report its outcome.
     
-    try:
-        # Configure Gemini API
-        genai.configure(api_key=GEMINI_API_KEY)
+    Returns:
+        bool: True if a model backend is ready
+    """
+    global _model_instance, _model_initialized
+    
+    with _model_lock:
+        if _model_initialized:
+            return _model_instance is not None
+        _model_initialized = True
         
-        # Create model instance
-        _model_instance = genai.GenerativeModel(GEMINI_MODEL)
+        if not is_model_available():
+            logger.warning("Gemini API key not found. AI features will be unavailable.")
+            return False
         
-        logger.info(f"Successfully initialized Gemini model: {GEMINI_MODEL}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to initialize Gemini model: {e}", exc_info=True)
-        return False
+        try:
+            # Create the backend selected by LLM_BACKEND
+            _model_instance = create_backend(LLM_BACKEND)
+            
+            logger.info(f"Successfully initialized {LLM_BACKEND} model backend: {_model_instance.model_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to initialize {LLM_BACKEND} model backend: {e}", exc_info=True)
+            return False
 
-def get_model():
+def is_model_available():
     """
-    Get the Gemini model instance.
+    Check whether AI generation is configured.
     
     Returns:
-        The initialized model instance or None if initialization failed.
+        bool: True for the local backends, or for Gemini when an API key is set
     """
-    global _model_instance
+    return LLM_BACKEND != 'gemini' or bool(GEMINI_API_KEY)
+
+def get_model():
+    """
+    Get the model backend instance.
     
-    # Initialize if not already done
-    if _model_instance is None:
+    Returns:
+        The initialized ModelBackend or None if initialization failed.
+    """
+    # Initialize on first use
+    if not _model_initialized:
         initialize_model()
     
     return _model_instance
 
-def generate_content(prompt):
+def is_model_initialized():
     """
-    Generate content using the Gemini model.
+    Check whether the model backend has been created, without creating it.
+    
+    Returns:
+        bool: True once initialization has run and succeeded
+    """
+    return _model_initialized and _model_instance is not None
+
+# Resilient client shared by every caller: deadlines, retries, rate limit, circuit breaker.
+# The rate limit budget is shared with the other workers when SHARED_STATE_BACKEND says so
+_client = LLMClient(
+    get_model,
+    _executor,
+    timeout=LLM_CALL_TIMEOUT_SECONDS,
+    max_retries=LLM_MAX_RETRIES,
+    base_delay=LLM_RETRY_BASE_DELAY_SECONDS,
+    max_delay=LLM_RETRY_MAX_DELAY_SECONDS,
+    rate_limiter=create_rate_limiter(LLM_RATE_LIMIT_RPM / 60, LLM_RATE_LIMIT_BURST),
+    breaker=CircuitBreaker(LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS),
+)
+
+# Concurrent identical prompts share one in-flight call
+_single_flight = SingleFlight()
+
+def get_client():
+    """
+    Get the resilient LLM client.
+    
+    Returns:
+        LLMClient: The shared client wrapping the model instance
+    """
+    return _client
+
+def get_single_flight():
+    """
+    Get the coalescing layer in front of the LLM client.
+    
+    Returns:
+        SingleFlight: The shared single-flight group
+    """
+    return _single_flight
+
+def _flight_key(prompt):
+    """Key identifying interchangeable calls: the model plus the exact prompt text"""
+    return hashlib.sha256(f"{LLM_MODEL_ID}\0{prompt}".encode('utf-8')).hexdigest()
+
+def generate_content(prompt, template=None):
+    """
+    Generate content using the configured model.
+    
+    Transient errors are retried with backoff, each attempt has a deadline,
+    and calls fail fast while the circuit breaker is open. Concurrent calls
+    with the same prompt share a single request.
     
     Args:
         prompt (str): The prompt to send to the model
+        template (str, optional): Prompt template it was rendered from, for token metrics
         
     Returns:
         The model response or None if generation failed
     """
-    model = get_model()
+    if get_model() is None:
+        logger.warning("Cannot generate content: Model not initialized")
+        return None
     
-    if model is None:
+    try:
+        with observe_stage('llm_call'):
+            if LLM_COALESCE_REQUESTS:
+                response = _single_flight.do(_flight_key(prompt), lambda: _client.generate(prompt))
+            else:
+                response = _client.generate(prompt)
+    except CircuitOpenError as e:
+        logger.warning(f"{e}")
+        return None
+    except Exception as e:
+        logger.error(f"Error generating content: {e}", exc_info=True)
+        return None
+    
+    record_tokens(template, prompt, response)
+    return response
+
+async def generate_content_async(prompt, template=None):
+    """
+    Generate content using the configured model without blocking the event loop.
+    
+    The blocking SDK call runs on a bounded thread pool, so at most
+    LLM_MAX_CONCURRENCY requests are in flight at once; backoff and rate
+    limit waits happen on the event loop. Concurrent calls with the same
+    prompt share a single request.
+    
+    Args:
+        prompt (str): The prompt to send to the model
+        template (str, optional): Prompt template it was rendered from, for token metrics
+        
+    Returns:
+        The model response or None if generation failed
+    """
+    if get_model() is None:
         logger.warning("Cannot generate content: Model not initialized")
         return None
     
     try:
-        response = model.generate_content(prompt)
-        return response
+        with observe_stage('llm_call'):
+            if LLM_COALESCE_REQUESTS:
+                response = await _single_flight.do_async(_flight_key(prompt), lambda: _client.generate_async(prompt))
+            else:
+                response = await _client.generate_async(prompt)
+    except CircuitOpenError as e:
+        logger.warning(f"{e}")
+        return None
     except Exception as e:
         logger.error(f"Error generating content: {e}", exc_info=True)
         return None
+    
+    record_tokens(template, prompt, response)
+    return response
+
+def stream_content(prompt, template=None):
+    """
+    Stream content from the configured model as it is generated.
+    
+    Unlike generate_content, errors are raised so the caller can decide how to
+    recover from a stream that breaks halfway.
+    
+    Args:
+        prompt (str): The prompt to send to the model
+        template (str, optional): Prompt template it was rendered from, for token metrics
+        
+    Yields:
+        str: Text chunks in the order the model produces them
+    """
+    if get_model() is None:
+        raise RuntimeError("Cannot stream content: Model not initialized")
+    
+    chunks = []
+    with observe_stage('llm_call'):
+        for text in _client.stream(prompt):
+            chunks.append(text)
+            yield text
+    record_tokens(template, prompt, response_text=''.join(chunks))
 
-# Initialize the model when the module is imported
-initialize_model() 
\ No newline at end of file
+async def stream_content_async(prompt, template=None):
+    """
+    Async variant of stream_content.
+    
+    The blocking SDK iterator is consumed on the shared thread pool and each
+    chunk is handed to the event loop as soon as it arrives. Waiting more than
+    LLM_CALL_TIMEOUT_SECONDS for the next chunk raises LLMCallTimeout.
+    
+    Args:
+        prompt (str): The prompt to send to the model
+        template (str, optional): Prompt template it was rendered from, for token metrics
+        
+    Yields:
+        str: Text chunks in the order the model produces them
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+    
+    def produce():
+        try:
+            for text in stream_content(prompt, template):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, text)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+    
+    producer = loop.run_in_executor(_executor, produce)
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), LLM_CALL_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise LLMCallTimeout(f"No model output for {LLM_CALL_TIMEOUT_SECONDS}s while streaming")
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Let the worker thread stop early if the consumer went away
+        stop.set()
+    await producer
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Running the async implementations from blocking code.
+
+The sync entry points (generate_diagrams, generate_code in per-file mode) are
+thin wrappers around their async variants. asyncio.run refuses to start when
+the calling thread already has an event loop running, so in that case the
+coroutine gets its own loop on a worker thread instead.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine
+
+
+def run_sync(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Run a coroutine to completion and return its result.
+
+    Args:
+        coro: The coroutine to run
+
+    Returns:
+        Whatever the coroutine returns
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # Called from inside a running loop: block this thread (as any sync call
+    # would) while the coroutine runs on a private loop elsewhere
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="run-sync") as pool:
+        return pool.submit(context.run, asyncio.run, coro).result()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Command-line batch conversion of markdown specifications.
+
+Usage:
+    python -m src.cli build specs/ -o out/ [--jobs 4] [--concurrency 8] [--force]
+
+Every *.md file under the input directory is parsed, and its class,
+architecture, use case and sequence diagrams and its code scaffolding are
+written to out/<relative path without .md>/. Without an AI model the work is
+pure CPU and is spread over a process pool; with a model, specs are built
+concurrently on one event loop, bounded by --concurrency (the LLM client still
+applies its own rate limit). Specs whose content hash matches the previous
+build are skipped, and out/build-report.json summarizes the run.
+"""
+import re
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from src.markdown_parser import parse_markdown_spec, parse_markdown_spec_async
+from src.diagram_generator import generate_diagrams, generate_diagrams_async
+from src.code_generator import generate_code, generate_code_async
+from src.http_cache import build_fingerprint, content_hash
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'build-manifest.json'
+REPORT_FILE = 'build-report.json'
+DIAGRAM_FILES = ('class', 'architecture', 'use_case')
+UNSAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def find_specs(input_dir: Path, pattern: str = '*.md') -> List[Path]:
+    """Return every spec file under input_dir, sorted for a stable build order"""
+    return sorted(path for path in input_dir.rglob(pattern) if path.is_file())
+
+
+def build_spec(markdown: str) -> Dict[str, Any]:
+    """
+    Build one spec with the synchronous pipeline (used in the process pool).
+
+    Returns:
+        dict: {'parsed_spec', 'diagrams', 'code'}
+    """
+    parsed_spec = parse_markdown_spec(markdown)
+    diagrams = generate_diagrams(parsed_spec, include_sequence=True)
+    code = generate_code(parsed_spec, diagrams)
+    return {'parsed_spec': parsed_spec, 'diagrams': diagrams, 'code': code}
+
+
+async def build_spec_async(markdown: str) -> Dict[str, Any]:
+    """Async variant of build_spec"""
+    parsed_spec = await parse_markdown_spec_async(markdown)
+    diagrams = await generate_diagrams_async(parsed_spec, include_sequence=True)
+    code = await generate_code_async(parsed_spec, diagrams)
+    return {'parsed_spec': parsed_spec, 'diagrams': diagrams, 'code': code}
+
+
+def _safe_path(root: Path, name: str) -> Path:
+    """Resolve a generated file name under root, refusing names that escape it"""
+    path = (root / name).resolve()
+    if root.resolve() not in path.parents:
+        raise ValueError(f"Refusing to write {name!r} outside {root}")
+    return path
+
+
+def write_outputs(target: Path, result: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Write a built spec to its output directory.
+
+    Args:
+        target (Path): out/<relative spec path without .md>
+        result (dict): Output of build_spec
+
+    Returns:
+        dict: Number of diagrams and code files written
+    """
+    # Drop the previous build's generated files, which may no longer exist in the spec
+    for name in ('sequence', 'code'):
+        shutil.rmtree(target / name, ignore_errors=True)
+    for name in [f'{diagram}.mmd' for diagram in DIAGRAM_FILES] + ['errors.json']:
+        (target / name).unlink(missing_ok=True)
+
+    target.mkdir(parents=True, exist_ok=True)
+    (target / 'spec.json').write_text(json.dumps(result['parsed_spec'], indent=2), encoding='utf-8')
+
+    diagrams = result['diagrams']
+    written = 0
+    for name in DIAGRAM_FILES:
+        if diagrams.get(name):
+            (target / f'{name}.mmd').write_text(diagrams[name], encoding='utf-8')
+            written += 1
+
+    sequence_dir = target / 'sequence'
+    for use_case_id, mermaid_code in (diagrams.get('sequence') or {}).items():
+        sequence_dir.mkdir(exist_ok=True)
+        (sequence_dir / f"{UNSAFE_NAME_RE.sub('_', use_case_id)}.mmd").write_text(mermaid_code, encoding='utf-8')
+        written += 1
+
+    if diagrams.get('errors'):
+        (target / 'errors.json').write_text(json.dumps(diagrams['errors'], indent=2), encoding='utf-8')
+
+    code_dir = target / 'code'
+    for filename, content in result['code'].items():
+        path = _safe_path(code_dir, filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+
+    return {'diagrams': written, 'files': len(result['code'])}
+
+
+def _load_manifest(output_dir: Path) -> Dict[str, str]:
+    """Read the content hashes recorded by the previous build"""
+    try:
+        return json.loads((output_dir / MANIFEST_FILE).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _record(entry: Dict[str, Any], target: Path, result: Optional[Dict[str, Any]],
+            error: Optional[BaseException], started: float) -> None:
+    """Write a finished spec's outputs and fill in its report entry"""
+    if error is None:
+        try:
+            entry.update(write_outputs(target, result))
+        except Exception as e:
+            error = e
+    entry['seconds'] = round(time.perf_counter() - started, 3)
+    if error is None:
+        entry['status'] = 'built'
+    else:
+        entry['status'] = 'failed'
+        entry['error'] = str(error)
+        logger.error(f"Failed to build {entry['spec']}: {error}")
+
+
+def build_directory(input_dir: Path, output_dir: Path, jobs: Optional[int] = None, concurrency: int = 8,
+                    force: bool = False, pattern: str = '*.md') -> Dict[str, Any]:
+    """
+    Build every spec under input_dir into output_dir.
+
+    Args:
+        input_dir (Path): Directory searched recursively for specs
+        output_dir (Path): Directory the results and report are written to
+        jobs (int, optional): Worker processes for the basic pipeline (CPU count when None)
+        concurrency (int): Specs built at once when an AI model is available
+        force (bool): Rebuild specs even if their content hash is unchanged
+        pattern (str): Glob selecting spec files
+
+    Returns:
+        dict: The summary report, also written to output_dir/build-report.json
+    """
+    started = time.time()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    fingerprint = build_fingerprint()
+    use_model = fingerprint != 'basic'
+
+    entries = []
+    pending = []
+    for path in find_specs(input_dir, pattern):
+        relative = path.relative_to(input_dir).as_posix()
+        target = output_dir / path.relative_to(input_dir).with_suffix('')
+        markdown = path.read_text(encoding='utf-8')
+        digest = content_hash(markdown, fingerprint)
+        entry = {'spec': relative, 'hash': digest}
+        entries.append(entry)
+        if not force and manifest.get(relative) == digest and target.is_dir():
+            entry['status'] = 'skipped'
+        else:
+            pending.append((entry, target, markdown))
+
+    logger.info(f"Building {len(pending)} of {len(entries)} specs ({'model' if use_model else 'basic'} pipeline)")
+
+    try:
+        if use_model:
+            asyncio.run(_build_with_model(pending, concurrency))
+        else:
+            _build_with_processes(pending, jobs)
+    finally:
+        # Record whatever finished, so an interrupted run resumes where it stopped
+        for entry in entries:
+            if entry.get('status') in ('built', 'skipped'):
+                manifest[entry['spec']] = entry['hash']
+            elif entry.get('status') == 'failed':
+                manifest.pop(entry['spec'], None)
+        (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+
+    statuses = [entry.get('status') for entry in entries]
+    report = {
+        'input': str(input_dir),
+        'output': str(output_dir),
+        'pipeline': 'model' if use_model else 'basic',
+        'elapsed_seconds': round(time.time() - started, 3),
+        'total': len(entries),
+        'built': statuses.count('built'),
+        'skipped': statuses.count('skipped'),
+        'failed': statuses.count('failed'),
+        'specs': entries,
+    }
+    (output_dir / REPORT_FILE).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    return report
+
+
+def _build_with_processes(pending: List[tuple], jobs: Optional[int]) -> None:
+    """Build specs with the basic pipeline across worker processes"""
+    if not pending:
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(build_spec, markdown): (entry, target, time.perf_counter())
+                   for entry, target, markdown in pending}
+        for future in as_completed(futures):
+            entry, target, started = futures[future]
+            error = future.exception()
+            _record(entry, target, None if error else future.result(), error, started)
+
+
+async def _build_with_model(pending: List[tuple], concurrency: int) -> None:
+    """Build specs concurrently on one event loop, at most `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(entry: Dict[str, Any], target: Path, markdown: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result, error = await build_spec_async(markdown), None
+            except Exception as e:
+                result, error = None, e
+            _record(entry, target, result, error, started)
+
+    await asyncio.gather(*(run(*item) for item in pending))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    build = subcommands.add_parser('build', help='Convert a directory of specs to diagrams and code')
+    build.add_argument('input', type=Path, help='Directory searched recursively for specs')
+    build.add_argument('-o', '--output', type=Path, required=True, help='Directory to write results to')
+    build.add_argument('-j', '--jobs', type=int, default=None,
+                       help='Worker processes without an AI model (default: CPU count)')
+    build.add_argument('-c', '--concurrency', type=int, default=8,
+                       help='Specs built at once with an AI model (default: 8)')
+    build.add_argument('--pattern', default='*.md', help='Glob selecting spec files (default: *.md)')
+    build.add_argument('--force', action='store_true', help='Rebuild specs even if unchanged')
+    build.add_argument('-v', '--verbose', action='store_true', help='Log every generation step')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if not args.input.is_dir():
+        parser.error(f"{args.input} is not a directory")
+
+    report = build_directory(args.input, args.output, jobs=args.jobs, concurrency=args.concurrency,
+                             force=args.force, pattern=args.pattern)
+    print(f"{report['total']} specs: {report['built']} built, {report['skipped']} skipped, "
+          f"{report['failed']} failed in {report['elapsed_seconds']:.1f}s "
+          f"(report: {args.output / REPORT_FILE})")
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,34 +1,23 @@
 #!/usr/bin/env python3
 import logging
-import os
 import re
 import json
-from typing import Dict, Any, List
+import asyncio
+from typing import Dict, Any, List, Tuple, AsyncIterator, Callable, Optional, Union
 
-from src.ai_model import generate_content
-from src.prompt_loader import load_prompt
-from config import GEMINI_API_KEY
+from src.ai_model import generate_content, generate_content_async, stream_content_async, is_model_available
+from src.prompt_loader import get_prompt_template
+from src.llm_cache import get_cache, make_cache_key
+from src.async_utils import run_sync
+from src.metrics import timed, record_fallback, record_parse_failure
+from src.prompt_compaction import to_compact_json, compact_class, code_generation_payload
+from models.spec import Spec, Class
+from config import CODE_GENERATION_MODE, CODE_GENERATION_CONCURRENCY, CODE_JOB_RETRIES
 
 logger = logging.getLogger(__name__)
 
-# Check if Google Gemini API is available
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-use_gemini = False
-
-if GEMINI_API_KEY:
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=GEMINI_API_KEY)
-        use_gemini = True
-        logger.info("Google Gemini API configured successfully for code generation")
-    except ImportError:
-        logger.warning("Google Generative AI package not installed. Using basic code generation.")
-    except Exception as e:
-        logger.warning(f"Failed to configure Gemini API: {e}")
-else:
-    logger.info("Gemini API key not found. Using basic code generation.")
-
 
+@timed('code_generation')
 def generate_code(spec: Dict[str, Any], diagrams: Dict[str, Any]) -> Dict[str, str]:
     """
     Generate Python code scaffolding from the parsed specification and diagrams
@@ -42,23 +31,277 @@ def generate_code(spec: Dict[str, Any], diagrams: Dict[str, Any]) -> Dict[str, s
     """
     logger.info("Generating code from specification")
     
-    if GEMINI_API_KEY:
+    if is_model_available():
         try:
+            if CODE_GENERATION_MODE == 'per_file':
+                return run_sync(generate_code_per_file_async(spec, diagrams))
             return generate_code_with_gemini(spec, diagrams)
         except Exception as e:
             logger.error(f"Error generating code with Gemini: {e}", exc_info=True)
             # Fall back to basic implementation if Gemini fails
+            record_fallback('code_generation')
+    
+    return generate_basic_code(spec)
+
+
+@timed('code_generation')
+async def generate_code_async(spec: Dict[str, Any], diagrams: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Async variant of generate_code for use from request handlers
+    
+    Args:
+        spec (dict): Parsed specification structure
+        diagrams (dict): Generated diagrams
+        
+    Returns:
+        dict: Dictionary with filenames as keys and generated code as values
+    """
+    logger.info("Generating code from specification")
+    
+    if is_model_available():
+        try:
+            if CODE_GENERATION_MODE == 'per_file':
+                return await generate_code_per_file_async(spec, diagrams)
+            return await generate_code_with_gemini_async(spec, diagrams)
+        except Exception as e:
+            logger.error(f"Error generating code with Gemini: {e}", exc_info=True)
+            # Fall back to basic implementation if Gemini fails
+            record_fallback('code_generation')
+    
+    return generate_basic_code(spec)
+
+
+@timed('code_generation')
+async def generate_code_stream_async(spec: Dict[str, Any], diagrams: Dict[str, Any]) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Generate code scaffolding, yielding each file as soon as it is complete
+    
+    With Gemini configured the response is streamed and every
+    "filename": "content" pair is emitted the moment its closing quote arrives.
+    If the stream fails, the basic generator fills in only the files that were
+    not already sent.
+    
+    Args:
+        spec (dict): Parsed specification structure
+        diagrams (dict): Generated diagrams
+        
+    Yields:
+        tuple: (filename, file content)
+    """
+    logger.info("Streaming code generation from specification")
+    
+    sent = {}
+    
+    if is_model_available() and CODE_GENERATION_MODE == 'per_file':
+        # Every job already falls back on its own, so files arrive as they finish
+        jobs = plan_code_jobs(spec, diagrams)
+        semaphore = asyncio.Semaphore(CODE_GENERATION_CONCURRENCY)
+        tasks = [asyncio.ensure_future(_run_code_job(job, semaphore)) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client went away or the consumer stopped early
+            for task in tasks:
+                task.cancel()
+        return
+    
+    if is_model_available():
+        code_input = code_generation_payload(spec, diagrams)
+        cache_key = make_cache_key('code_generator', 'generate_code', code_input)
+        cached = await get_cache().get_async(cache_key)
+        if cached is not None:
+            for filename, content in cached.items():
+                yield filename, content
+            return
+        
+        try:
+            prompt = _build_code_prompt(code_input)
+            parser = CodeFileStreamParser()
+            async for text in stream_content_async(prompt, template='code_generator/generate_code'):
+                for filename, content in parser.feed(text):
+                    sent[filename] = content
+                    yield filename, content
+            parser.close()
+            
+            if sent:
+                await get_cache().set_async(cache_key, sent)
+                return
+            logger.error("Gemini stream did not contain any files")
+        except Exception as e:
+            logger.error(f"Error streaming code with Gemini: {e}", exc_info=True)
+            # Fall back to basic implementation for whatever is missing
+        record_fallback('code_generation')
+    
+    for filename, content in generate_basic_code(spec).items():
+        if filename not in sent:
+            yield filename, content
+
+
+async def generate_code_per_file_async(spec: Dict[str, Any], diagrams: Dict[str, Any],
+                                       concurrency: int = CODE_GENERATION_CONCURRENCY) -> Dict[str, str]:
+    """
+    Generate code with one LLM job per file instead of a single large prompt
+    
+    Each class gets its own job with only its slice of the specification, and
+    main.py, README.md and requirements.txt get a job each with a compact
+    project summary. Jobs run concurrently on a bounded pool, so latency follows
+    the slowest file instead of the whole project, and a bad response only
+    re-runs (and, if needed, falls back) for that one file.
+    
+    Args:
+        spec (dict): Parsed specification structure
+        diagrams (dict): Generated diagrams
+        concurrency (int): Maximum number of jobs running at once
+        
+    Returns:
+        dict: Dictionary with filenames as keys and generated code as values,
+            classes first in specification order, then the project files
+    """
+    logger.info("Generating code with one Gemini job per file")
+    
+    jobs = plan_code_jobs(spec, diagrams)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(_run_code_job(job, semaphore) for job in jobs))
+    
+    return dict(results)
+
+
+def plan_code_jobs(spec: Dict[str, Any], diagrams: Dict[str, Any]) -> List[Tuple[str, str, Dict[str, str], Callable[[], str]]]:
+    """
+    Split code generation into independent per-file jobs
+    
+    Args:
+        spec (dict): Parsed specification structure
+        diagrams (dict): Generated diagrams
+        
+    Returns:
+        list: (filename, prompt name, template fields, basic fallback) tuples in output order
+    """
+    classes = [cls for cls in spec.get('classes', []) if cls.get('name')]
+    class_names = [cls['name'] for cls in classes]
+    class_diagram_lines = (diagrams.get('class') or '').splitlines()
+    
+    jobs = []
+    for cls in classes:
+        class_name = cls['name']
+        other_classes = [name for name in class_names if name != class_name]
+        related_lines = [line.strip() for line in class_diagram_lines if class_name in line]
+        jobs.append((
+            f"{class_name.lower()}.py",
+            'generate_class_code',
+            {
+                'class_name': class_name,
+                'class_spec': to_compact_json(compact_class(cls)),
+                'other_classes': ', '.join(other_classes) or 'None',
+                'class_diagram': '\n'.join(related_lines) or 'None',
+            },
+            lambda cls=cls: generate_class_code(cls),
+        ))
+    
+    project_summary = summarize_project(spec)
+    jobs.append(('main.py', 'generate_main_file', {'project_summary': project_summary},
+                 lambda: generate_main_file(spec)))
+    jobs.append(('README.md', 'generate_readme', {'project_summary': project_summary},
+                 lambda: generate_readme(spec)))
+    jobs.append(('requirements.txt', 'generate_requirements', {'project_summary': project_summary},
+                 lambda: generate_requirements(spec)))
+    
+    return jobs
+
+
+def summarize_project(spec: Dict[str, Any]) -> str:
+    """Build the compact project summary used by the project-level file prompts"""
+    lines = [
+        f"Title: {spec.get('title', '')}",
+        f"Description: {spec.get('description', '')}",
+        'Classes:'
+    ]
     
-    # Basic implementation without LLM
+    for cls in spec.get('classes', []):
+        attributes = ', '.join(f"{a.get('name', '')}: {a.get('type', 'Any')}" for a in cls.get('attributes', []))
+        methods = ', '.join(f"{m.get('name', '')}() -> {m.get('return_type', 'None')}" for m in cls.get('methods', []))
+        lines.append(f"- {cls.get('name', '')}({attributes}) methods: {methods or 'none'}")
+    
+    lines.append('Architecture components:')
+    for component in spec.get('architecture', {}).get('components', []):
+        lines.append(f"- {component.get('name', '')}: {component.get('description', '')}")
+    
+    lines.append('Use cases:')
+    for use_case in spec.get('use_cases', []):
+        lines.append(f"- {use_case.get('id', '')}: {use_case.get('name', '')}")
+    
+    return '\n'.join(lines)
+
+
+async def _run_code_job(job: Tuple[str, str, Dict[str, str], Callable[[], str]],
+                        semaphore: asyncio.Semaphore) -> Tuple[str, str]:
+    """
+    Run one per-file job, retrying a bad response and falling back to the
+    basic generator for that file only
+    
+    Returns:
+        tuple: (filename, file content)
+    """
+    filename, prompt_name, fields, fallback = job
+    
+    cache_key = make_cache_key('code_generator', prompt_name, fields)
+    cached = await get_cache().get_async(cache_key)
+    if cached is not None:
+        return filename, cached
+    
+    prompt_template = get_prompt_template('code_generator', prompt_name)
+    if not prompt_template:
+        logger.error(f"Failed to load {prompt_name} prompt")
+        record_fallback('code_generation')
+        return filename, fallback()
+    prompt = prompt_template.render(**fields)
+    
+    for attempt in range(1 + CODE_JOB_RETRIES):
+        async with semaphore:
+            response = await generate_content_async(prompt, template=f'code_generator/{prompt_name}')
+        content = _file_content_from_response(response)
+        if content:
+            await get_cache().set_async(cache_key, content)
+            return filename, content
+        logger.warning(f"Attempt {attempt + 1} to generate {filename} returned no usable content")
+    
+    logger.error(f"Falling back to basic generation for {filename}")
+    record_fallback('code_generation')
+    return filename, fallback()
+
+
+def _file_content_from_response(response) -> Optional[str]:
+    """Extract a single file's content from a Gemini response, or None if it is empty"""
+    if not response:
+        return None
+    
+    try:
+        response_text = response.text
+    except Exception as e:
+        logger.error(f"Could not read Gemini response text: {e}")
+        return None
+    
+    # Take the first fenced block if there is one
+    matches = re.search(r'```[\w.+-]*\n(.*?)```', response_text, re.DOTALL)
+    content = matches.group(1) if matches else response_text
+    content = content.strip('\n')
+    
+    return content if content.strip() else None
+
+
+def generate_basic_code(spec: Union[Dict[str, Any], Spec]) -> Dict[str, str]:
+    """Generate code scaffolding directly from the specification, without the LLM"""
+    # Validated once and shared by every file below
+    spec = Spec.coerce(spec)
     code_files = {}
     
     # Generate code for each class
-    for cls in spec.get('classes', []):
-        class_name = cls.get('name', '')
-        if not class_name:
+    for cls in spec.classes:
+        if not cls.name:
             continue
             
-        file_name = f"{class_name.lower()}.py"
+        file_name = f"{cls.name.lower()}.py"
         
         code = generate_class_code(cls)
         code_files[file_name] = code
@@ -78,11 +321,10 @@ def generate_code(spec: Dict[str, Any], diagrams: Dict[str, Any]) -> Dict[str, s
     return code_files
 
 
-def generate_class_code(cls: Dict[str, Any]) -> str:
+def generate_class_code(cls: Union[Dict[str, Any], Class]) -> str:
     """Generate Python code for a single class"""
-    class_name = cls.get('name', '')
-    attributes = cls.get('attributes', [])
-    methods = cls.get('methods', [])
+    cls = Class.coerce(cls)
+    class_name = cls.name
     
     code = [
         '#!/usr/bin/env python3',
@@ -99,44 +341,36 @@ def generate_class_code(cls: Dict[str, Any]) -> str:
     init_params = []
     init_body = ['']
     
-    for attr in attributes:
-        attr_name = attr.get('name', '')
-        attr_type = attr.get('type', 'str')
-        default = attr.get('default', None)
-        
-        if default is not None:
-            init_params.append(f"{attr_name}: {attr_type} = {default}")
+    for attr in cls.attributes:
+        if attr.default is not None:
+            init_params.append(f"{attr.name}: {attr.type} = {attr.default}")
         else:
-            init_params.append(f"{attr_name}: {attr_type} = None")
+            init_params.append(f"{attr.name}: {attr.type} = None")
         
-        init_body.append(f"        self.{attr_name} = {attr_name}")
+        init_body.append(f"        self.{attr.name} = {attr.name}")
     
     code.append(', ' + ', '.join(init_params) + '):')
     code.extend(init_body)
     
     # Add methods
-    for method in methods:
-        method_name = method.get('name', '')
-        params = method.get('parameters', [])
-        return_type = method.get('return_type', 'None')
-        comment = method.get('comment', '')
+    for method in cls.methods:
+        method_name = method.name
+        return_type = method.return_type
         
         # Add an empty line between methods
         code.append('')
         
         # Method parameters (always include self)
         method_params = ['self']
-        for param in params:
-            param_name = param.get('name', '')
-            param_type = param.get('type', 'Any')
-            method_params.append(f"{param_name}: {param_type}")
+        for param in method.parameters:
+            method_params.append(f"{param.name}: {param.type}")
         
         # Method signature
         code.append(f'    def {method_name}({", ".join(method_params)}) -> {return_type}:')
         
         # Method docstring
-        if comment:
-            code.append(f'        """{comment}"""')
+        if method.comment:
+            code.append(f'        """{method.comment}"""')
         else:
             code.append(f'        """{method_name} method"""')
         
@@ -149,10 +383,11 @@ def generate_class_code(cls: Dict[str, Any]) -> str:
     return '\n'.join(code)
 
 
-def generate_main_file(spec: Dict[str, Any]) -> str:
+def generate_main_file(spec: Union[Dict[str, Any], Spec]) -> str:
     """Generate the main application file"""
-    app_name = spec.get('title', 'MyApplication')
-    classes = [cls.get('name', '') for cls in spec.get('classes', [])]
+    spec = Spec.coerce(spec)
+    app_name = spec.title or 'MyApplication'
+    classes = [cls.name for cls in spec.classes]
     
     code = [
         '#!/usr/bin/env python3',
@@ -193,10 +428,11 @@ def generate_main_file(spec: Dict[str, Any]) -> str:
     return '\n'.join(code)
 
 
-def generate_readme(spec: Dict[str, Any]) -> str:
+def generate_readme(spec: Union[Dict[str, Any], Spec]) -> str:
     """Generate a README file for the project"""
-    title = spec.get('title', 'My Application')
-    description = spec.get('description', 'A Python application')
+    spec = Spec.coerce(spec)
+    title = spec.title or 'My Application'
+    description = spec.description or 'A Python application'
     
     readme = [
         f'# {title}',
@@ -220,10 +456,9 @@ def generate_readme(spec: Dict[str, Any]) -> str:
     ]
     
     # Add classes as features
-    for cls in spec.get('classes', []):
-        class_name = cls.get('name', '')
-        if class_name:
-            readme.append(f'- {class_name}')
+    for cls in spec.classes:
+        if cls.name:
+            readme.append(f'- {cls.name}')
     
     # Add architecture components
     readme.extend([
@@ -232,15 +467,14 @@ def generate_readme(spec: Dict[str, Any]) -> str:
         ''
     ])
     
-    for component in spec.get('architecture', {}).get('components', []):
-        component_name = component.get('name', '')
-        if component_name:
-            readme.append(f'- {component_name}')
+    for component in spec.components:
+        if component.name:
+            readme.append(f'- {component.name}')
     
     return '\n'.join(readme)
 
 
-def generate_requirements(spec: Dict[str, Any]) -> str:
+def generate_requirements(spec: Union[Dict[str, Any], Spec]) -> str:
     """Generate a requirements.txt file"""
     # Basic requirements
     requirements = [
@@ -258,21 +492,56 @@ def generate_code_with_gemini(spec: Dict[str, Any], diagrams: Dict[str, Any]) ->
     """Generate code using the Gemini API"""
     logger.info("Generating code with Gemini API")
     
+    code_input = code_generation_payload(spec, diagrams)
+    cache_key = make_cache_key('code_generator', 'generate_code', code_input)
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        return cached
+    
+    prompt = _build_code_prompt(code_input)
+    
+    # Call Gemini API using centralized model
+    response = generate_content(prompt, template='code_generator/generate_code')
+    code_files = _code_files_from_response(response)
+    get_cache().set(cache_key, code_files)
+    return code_files
+
+
+async def generate_code_with_gemini_async(spec: Dict[str, Any], diagrams: Dict[str, Any]) -> Dict[str, str]:
+    """Async variant of generate_code_with_gemini"""
+    logger.info("Generating code with Gemini API")
+    
+    code_input = code_generation_payload(spec, diagrams)
+    cache_key = make_cache_key('code_generator', 'generate_code', code_input)
+    cached = await get_cache().get_async(cache_key)
+    if cached is not None:
+        return cached
+    
+    prompt = _build_code_prompt(code_input)
+    response = await generate_content_async(prompt, template='code_generator/generate_code')
+    code_files = _code_files_from_response(response)
+    await get_cache().set_async(cache_key, code_files)
+    return code_files
+
+
+def _build_code_prompt(code_input: Dict[str, Any]) -> str:
+    """Fill the code generator prompt template"""
     # Cargar el prompt desde archivo
-    prompt_template = load_prompt('code_generator', 'generate_code')
+    prompt_template = get_prompt_template('code_generator', 'generate_code')
     if not prompt_template:
         logger.error("Failed to load code generator prompt")
         raise ValueError("Failed to load code generator prompt")
     
     # Rellenar el template con los datos
-    prompt = prompt_template.format(
-        spec=spec,
-        diagrams=diagrams
+    return prompt_template.render(
+        spec=to_compact_json(code_input['spec']),
+        diagrams=to_compact_json(code_input['diagrams'])
     )
-    
-    # Call Gemini API using centralized model
-    response = generate_content(prompt)
-    
+
+
+@timed('json_extraction')
+def _code_files_from_response(response) -> Dict[str, str]:
+    """Extract the {filename: content} mapping from a Gemini response"""
     if not response:
         logger.error("Failed to get a response from Gemini API")
         raise ValueError("No response from Gemini API")
@@ -298,9 +567,100 @@ def generate_code_with_gemini(spec: Dict[str, Any], diagrams: Dict[str, Any]) ->
         return code_files
     except json.JSONDecodeError:
         logger.error("Failed to parse Gemini API response as JSON", exc_info=True)
+        record_parse_failure('code_generator/generate_code')
         raise ValueError("Gemini API response was not valid JSON")
 
 
+class CodeFileStreamParser:
+    """
+    Incrementally extracts "filename": "content" pairs from a JSON object that
+    arrives in arbitrary chunks, e.g. a streamed LLM response.
+    
+    Anything before the opening brace (such as a ```json fence) is ignored.
+    """
+    
+    def __init__(self):
+        self._buffer = ''
+        self._pos = None  # Index right after the last complete pair
+        self._closed = False
+        self._decoder = json.JSONDecoder()
+    
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Add a chunk of the response.
+        
+        Args:
+            text (str): Next chunk of the streamed response
+            
+        Returns:
+            list: (filename, content) pairs completed by this chunk
+        """
+        self._buffer += text
+        files = []
+        
+        if self._pos is None:
+            start = self._buffer.find('{')
+            if start < 0:
+                return files
+            self._pos = start + 1
+        
+        while not self._closed:
+            pair = self._next_pair()
+            if pair is None:
+                break
+            files.append(pair)
+        
+        return files
+    
+    def close(self) -> None:
+        """
+        Check that the object was complete once the stream has ended.
+        
+        Raises:
+            ValueError: If the response was cut off or was not a JSON object
+        """
+        if not self._closed:
+            raise ValueError("Streamed response ended before the JSON object was complete")
+    
+    def _skip(self, index: int, separators: str) -> int:
+        """Skip whitespace and the given separator characters"""
+        while index < len(self._buffer) and (self._buffer[index].isspace() or self._buffer[index] in separators):
+            index += 1
+        return index
+    
+    def _next_pair(self):
+        """Decode the next complete pair, or return None if more input is needed"""
+        index = self._skip(self._pos, ',')
+        if index >= len(self._buffer):
+            return None
+        if self._buffer[index] == '}':
+            self._closed = True
+            return None
+        
+        try:
+            filename, index = self._decoder.raw_decode(self._buffer, index)
+        except json.JSONDecodeError:
+            return None
+        
+        index = self._skip(index, '')
+        if index >= len(self._buffer):
+            return None
+        if self._buffer[index] != ':':
+            raise ValueError(f"Expected ':' after {filename!r} in streamed JSON")
+        
+        index = self._skip(index + 1, '')
+        if index >= len(self._buffer):
+            return None
+        
+        try:
+            content, index = self._decoder.raw_decode(self._buffer, index)
+        except json.JSONDecodeError:
+            return None
+        
+        self._pos = index
+        return str(filename), content if isinstance(content, str) else json.dumps(content)
+
+
 if __name__ == "__main__":
     # For testing
     sample_spec = {
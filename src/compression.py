@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Response compression negotiated from Accept-Encoding.
+
+Diagram and code responses for large specs are several MB of JSON, which
+compresses roughly tenfold. Brotli is preferred when the client accepts it and
+the brotli package is installed, gzip otherwise. Complete bodies below
+COMPRESSION_MIN_SIZE are sent as they are. Streamed responses (NDJSON, SSE,
+large static files) are compressed chunk by chunk with a sync flush after each
+one, so every event still reaches the client as soon as it is produced.
+"""
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.tracing import span
+from config import COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip only
+    brotli = None
+
+# Content types worth compressing; images, archives and the like already are
+COMPRESSIBLE_TYPES = (b'text/', b'application/json', b'application/x-ndjson', b'application/javascript',
+                      b'image/svg+xml')
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Encodings this server can produce, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the response encoding for an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The header value, e.g. "gzip, deflate, br;q=0.9"
+
+    Returns:
+        str: 'br' or 'gzip', or None to send the body uncompressed
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in supported_encodings():
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class StreamCompressor:
+    """Incremental gzip or brotli compressor."""
+
+    def __init__(self, encoding: str, gzip_level: int = COMPRESSION_GZIP_LEVEL,
+                 brotli_quality: int = COMPRESSION_BROTLI_QUALITY):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        """
+        Compress the next chunk.
+
+        Args:
+            data (bytes): Next part of the body
+            final (bool): Whether this is the last chunk
+
+        Returns:
+            bytes: Compressed output that can be sent now
+        """
+        if self.encoding == 'br':
+            output = self._compressor.process(data) if data else b''
+            return output + (self._compressor.finish() if final else self._compressor.flush())
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a complete body"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _vary_on_encoding(headers: List[Tuple[bytes, bytes]],
+                      drop: Tuple[bytes, ...] = ()) -> List[Tuple[bytes, bytes]]:
+    """Add Accept-Encoding to the Vary header, leaving out the headers named in drop"""
+    vary = _header(headers, b'vary')
+    headers = [(key, value) for key, value in headers if key.lower() not in drop + (b'vary',)]
+    headers.append((b'vary', vary + b', Accept-Encoding' if vary else b'Accept-Encoding'))
+    return headers
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses the client accepts compressed.
+
+    Only successful responses with a compressible content type and no existing
+    Content-Encoding are touched; every response gets Vary: Accept-Encoding so
+    caches keep the variants apart.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = _header(scope.get('headers', []), b'accept-encoding')
+        encoding = negotiate_encoding(accept_encoding.decode('latin-1')) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+class _CompressingSend:
+    """The send callable for one response, holding its start until the first body chunk"""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Dict[str, Any]] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Dict[str, Any]) -> None:
+        if self.passthrough or message['type'] not in ('http.response.start', 'http.response.body'):
+            await self.send(message)
+        elif message['type'] == 'http.response.start':
+            self.start = message
+        elif self.compressor is not None:
+            await self._send_chunk(message)
+        else:
+            await self._first_body(message)
+
+    def _compressible(self, body: bytes, more_body: bool) -> bool:
+        headers = self.start.get('headers', [])
+        content_type = (_header(headers, b'content-type') or b'').lower()
+        return (self.start['status'] == 200
+                and _header(headers, b'content-encoding') is None
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+                and (more_body or len(body) >= self.minimum_size))
+
+    def _headers(self, content_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        """The start headers with the new encoding and length"""
+        headers = _vary_on_encoding(self.start.get('headers', []), drop=(b'content-length', b'etag'))
+        headers.append((b'content-encoding', self.encoding.encode()))
+        etag = _header(self.start.get('headers', []), b'etag')
+        if etag is not None:
+            # The encoded bytes differ from what a strong tag promises; a weak one still revalidates
+            headers.append((b'etag', etag if etag.startswith(b'W/') else b'W/' + etag))
+        if content_length is not None:
+            headers.append((b'content-length', str(content_length).encode()))
+        return headers
+
+    async def _first_body(self, message: Dict[str, Any]) -> None:
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if not self._compressible(body, more_body):
+            self.passthrough = True
+            if self.start['status'] == 200:
+                # Vary even when uncompressed, so a shared cache does not serve this copy to gzip clients
+                self.start = {**self.start, 'headers': _vary_on_encoding(self.start.get('headers', []))}
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        if not more_body:
+            with span('compression', encoding=self.encoding, bytes=len(body)):
+                compressed = compress(body, self.encoding)
+            await self.send({**self.start, 'headers': self._headers(len(compressed))})
+            await self.send({'type': 'http.response.body', 'body': compressed})
+            return
+
+        self.compressor = StreamCompressor(self.encoding)
+        await self.send({**self.start, 'headers': self._headers(None)})
+        await self._send_chunk(message)
+
+    async def _send_chunk(self, message: Dict[str, Any]) -> None:
+        more_body = message.get('more_body', False)
+        with span('compression', encoding=self.encoding):
+            body = self.compressor.compress(message.get('body', b''), final=not more_body)
+        await self.send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
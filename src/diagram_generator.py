@@ -3,42 +3,209 @@ Module for generating diagrams from the parsed markdown specification.
 """
 import os
 import re
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple, AsyncIterator, Union
 
-from src.ai_model import generate_content
-from src.prompt_loader import load_prompt
-from config import GEMINI_API_KEY
+from src.ai_model import generate_content, generate_content_async, is_model_available
+from src.prompt_loader import get_prompt_template
+from src.llm_cache import get_cache, make_cache_key
+from src.async_utils import run_sync
+from src.metrics import timed, record_fallback
+from src.prompt_compaction import (to_compact_json, class_diagram_payload, architecture_diagram_payload,
+                                   sequence_diagram_payload)
+from models.spec import Spec, UseCase
+from config import DIAGRAM_CONCURRENCY, DIAGRAM_JOB_TIMEOUT_SECONDS
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def generate_diagrams(parsed_spec: Dict[str, Any]) -> Dict[str, str]:
+def generate_diagrams(parsed_spec: Dict[str, Any], include_sequence: bool = False) -> Dict[str, Any]:
     """
     Generate various diagrams from the parsed specification
     
+    Runs the concurrent implementation on a private event loop (on a worker
+    thread when the caller already has one running; prefer
+    generate_diagrams_async there).
+    
     Args:
         parsed_spec (dict): Parsed specification structure
+        include_sequence (bool): Also generate a sequence diagram per use case
         
     Returns:
         dict: Dictionary with diagram types and their Mermaid code
     """
-    logger.info("Generating diagrams from specification")
+    return run_sync(generate_diagrams_async(parsed_spec, include_sequence=include_sequence))
+
+async def generate_diagrams_async(parsed_spec: Dict[str, Any], include_sequence: bool = False,
+                                  concurrency: int = DIAGRAM_CONCURRENCY,
+                                  timeout: float = DIAGRAM_JOB_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Generate the independent diagrams concurrently
     
-    diagrams = {}
+    Each diagram is a separate job bounded by a shared semaphore and a per-job
+    timeout. A job that fails or times out falls back to its basic generator,
+    and the reason is reported under the 'errors' key so the remaining diagrams
+    are still returned.
+    
+    Args:
+        parsed_spec (dict): Parsed specification structure
+        include_sequence (bool): Also generate a sequence diagram per use case,
+            returned as a {use_case_id: mermaid} mapping under 'sequence'
+        concurrency (int): Maximum number of diagram jobs running at once
+        timeout (float): Seconds each job may take before falling back
+        
+    Returns:
+        dict: Dictionary with diagram types and their Mermaid code
+    """
+    logger.info("Generating diagrams from specification")
     
-    # Generate class diagram
-    diagrams['class'] = generate_class_diagram(parsed_spec)
+    semaphore = asyncio.Semaphore(concurrency)
+    # Without a model every job runs a basic generator, so they share one
+    # validated and indexed copy of the spec; model prompts use the dict
+    spec = parsed_spec if is_model_available() else Spec.coerce(parsed_spec)
+    
+    # (result path, job coroutine factory, basic fallback)
+    jobs = [
+        (('class',), lambda: generate_class_diagram_async(spec),
+         lambda: generate_basic_class_diagram(spec)),
+        (('architecture',), lambda: generate_architecture_diagram_async(spec),
+         lambda: generate_basic_architecture_diagram(spec)),
+        (('use_case',), lambda: asyncio.to_thread(generate_use_case_diagram, spec),
+         lambda: generate_use_case_diagram(spec)),
+    ]
+    
+    if include_sequence:
+        for i, use_case in enumerate(parsed_spec.get('use_cases', [])):
+            use_case_id = use_case.get('id', f"UC{i+1}")
+            jobs.append((
+                ('sequence', use_case_id),
+                lambda uc_id=use_case_id, uc=use_case: generate_sequence_diagram_for_use_case_async(uc_id, uc, spec),
+                lambda uc=use_case: generate_basic_sequence_diagram(uc, spec),
+            ))
+    
+    results = await asyncio.gather(*(
+        _run_diagram_job('/'.join(path), job, fallback, semaphore, timeout)
+        for path, job, fallback in jobs
+    ))
     
-    # Generate architecture diagram
-    diagrams['architecture'] = generate_architecture_diagram(parsed_spec)
+    diagrams = {}
+    sequence_diagrams = {}
+    errors = {}
+    
+    for (path, _, _), (mermaid_code, error) in zip(jobs, results):
+        if error:
+            errors['/'.join(path)] = error
+        if mermaid_code is None:
+            continue
+        if path[0] == 'sequence':
+            sequence_diagrams[path[1]] = mermaid_code
+        else:
+            diagrams[path[0]] = mermaid_code
     
-    # Generate use case diagrams (list of all use cases)
-    diagrams['use_case'] = generate_use_case_diagram(parsed_spec)
+    if include_sequence:
+        diagrams['sequence'] = sequence_diagrams
+    if errors:
+        diagrams['errors'] = errors
     
     # Return all generated diagrams
     return diagrams
 
+def select_use_cases(spec: Dict[str, Any], use_case_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up use cases by ID
+    
+    Args:
+        spec (dict): Complete parsed specification
+        use_case_ids (list, optional): IDs to select; all use cases when None
+        
+    Returns:
+        dict: Use case data by ID, in the requested order without duplicates
+        
+    Raises:
+        ValueError: If any requested ID is not in the specification
+    """
+    use_cases = {}
+    for i, use_case in enumerate(spec.get('use_cases', [])):
+        use_cases[use_case.get('id', f"UC{i+1}")] = use_case
+    
+    if use_case_ids is None:
+        return use_cases
+    
+    unknown = [use_case_id for use_case_id in use_case_ids if use_case_id not in use_cases]
+    if unknown:
+        raise ValueError(f"Unknown use case IDs: {', '.join(unknown)}")
+    
+    return {use_case_id: use_cases[use_case_id] for use_case_id in use_case_ids}
+
+async def generate_sequence_diagrams_async(spec: Dict[str, Any], use_case_ids: Optional[List[str]] = None,
+                                           concurrency: int = DIAGRAM_CONCURRENCY,
+                                           timeout: float = DIAGRAM_JOB_TIMEOUT_SECONDS
+                                           ) -> AsyncIterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Generate sequence diagrams for several use cases concurrently
+    
+    Diagrams are yielded in completion order, so callers can stream each one
+    as soon as it is ready instead of waiting for the slowest.
+    
+    Args:
+        spec (dict): Complete parsed specification
+        use_case_ids (list, optional): IDs to render; all use cases when None
+        concurrency (int): Maximum number of diagram jobs running at once
+        timeout (float): Seconds each job may take before falling back
+        
+    Yields:
+        tuple: (use case ID, mermaid code or None, error message or None)
+    """
+    use_cases = select_use_cases(spec, use_case_ids)
+    logger.info(f"Generating {len(use_cases)} sequence diagrams")
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run(use_case_id: str):
+        use_case = use_cases[use_case_id]
+        mermaid_code, error = await _run_diagram_job(
+            f"sequence/{use_case_id}",
+            lambda: generate_sequence_diagram_for_use_case_async(use_case_id, use_case, spec),
+            lambda: generate_basic_sequence_diagram(use_case, spec),
+            semaphore, timeout)
+        return use_case_id, mermaid_code, error
+    
+    tasks = [asyncio.ensure_future(run(use_case_id)) for use_case_id in use_cases]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client went away or the consumer stopped early
+        for task in tasks:
+            task.cancel()
+
+async def _run_diagram_job(name: str, job: Callable[[], Awaitable[str]], fallback: Callable[[], str],
+                           semaphore: asyncio.Semaphore, timeout: float) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Run one diagram job under the semaphore and timeout
+    
+    Returns:
+        tuple: (mermaid code or None, error message or None)
+    """
+    async with semaphore:
+        try:
+            return await asyncio.wait_for(job(), timeout), None
+        except asyncio.TimeoutError:
+            logger.warning(f"Diagram job {name} timed out after {timeout}s, using basic generator")
+            error = f"timed out after {timeout}s"
+        except Exception as e:
+            logger.error(f"Diagram job {name} failed: {e}", exc_info=True)
+            error = str(e)
+    
+    record_fallback(f"{name.split('/')[0]}_diagram")
+    try:
+        return fallback(), error
+    except Exception as e:
+        logger.error(f"Basic generator for diagram {name} failed: {e}", exc_info=True)
+        return None, f"{error}; basic generator failed: {e}"
+
+@timed('class_diagram')
 def generate_class_diagram(parsed_spec: Dict[str, Any]) -> str:
     """
     Generate a Mermaid class diagram from the domain model in the parsed specification.
@@ -52,44 +219,49 @@ def generate_class_diagram(parsed_spec: Dict[str, Any]) -> str:
     Returns:
         Mermaid code for the class diagram
     """
-    if GEMINI_API_KEY:
+    if is_model_available():
         try:
             return generate_class_diagram_with_gemini(parsed_spec)
         except Exception as e:
             logger.error(f"Error generating class diagram with Gemini: {e}", exc_info=True)
             # Fall back to basic implementation if Gemini fails
+            record_fallback('class_diagram')
+    
+    return generate_basic_class_diagram(parsed_spec)
+
+@timed('class_diagram')
+async def generate_class_diagram_async(parsed_spec: Union[Dict[str, Any], Spec]) -> str:
+    """Async variant of generate_class_diagram"""
+    if is_model_available():
+        try:
+            return await generate_class_diagram_with_gemini_async(parsed_spec)
+        except Exception as e:
+            logger.error(f"Error generating class diagram with Gemini: {e}", exc_info=True)
+            # Fall back to basic implementation if Gemini fails
+            record_fallback('class_diagram')
     
+    return generate_basic_class_diagram(parsed_spec)
+
+def generate_basic_class_diagram(parsed_spec: Union[Dict[str, Any], Spec]) -> str:
+    """Generate a Mermaid class diagram directly from the parsed classes, without the LLM"""
     logger.info("Generating class diagram using basic implementation")
     
+    spec = Spec.coerce(parsed_spec)
     mermaid_code = ["classDiagram"]
     
     # Process classes
-    for cls in parsed_spec.get('classes', []):
-        class_name = cls.get('name', '')
-        
+    for cls in spec.classes:
         # Add class definition
-        mermaid_code.append(f"    class {class_name} {{")
+        mermaid_code.append(f"    class {cls.name} {{")
         
         # Add attributes
-        for attr in cls.get('attributes', []):
-            attr_name = attr.get('name', '')
-            attr_type = attr.get('type', '')
-            mermaid_code.append(f"        +{attr_name}: {attr_type}")
+        for attr in cls.attributes:
+            mermaid_code.append(f"        +{attr.name}: {attr.type}")
         
         # Add methods
-        for method in cls.get('methods', []):
-            method_name = method.get('name', '')
-            return_type = method.get('return_type', '')
-            
-            # Format parameters
-            params = []
-            for param in method.get('parameters', []):
-                param_name = param.get('name', '')
-                param_type = param.get('type', '')
-                params.append(f"{param_name}: {param_type}")
-            
-            param_str = ", ".join(params)
-            mermaid_code.append(f"        +{method_name}({param_str}): {return_type}")
+        for method in cls.methods:
+            param_str = ", ".join(f"{param.name}: {param.type}" for param in method.parameters)
+            mermaid_code.append(f"        +{method.name}({param_str}): {method.return_type}")
         
         mermaid_code.append("    }")
     
@@ -99,6 +271,7 @@ def generate_class_diagram(parsed_spec: Dict[str, Any]) -> str:
     # Return the complete diagram
     return "\n".join(mermaid_code)
 
+@timed('architecture_diagram')
 def generate_architecture_diagram(parsed_spec: Dict[str, Any]) -> str:
     """
     Generate Mermaid architecture diagram code from the specification
@@ -109,86 +282,90 @@ def generate_architecture_diagram(parsed_spec: Dict[str, Any]) -> str:
     Returns:
         str: Mermaid architecture diagram code
     """
-    if GEMINI_API_KEY:
+    if is_model_available():
         try:
             return generate_architecture_diagram_with_gemini(parsed_spec)
         except Exception as e:
             logger.error(f"Error generating architecture diagram with Gemini: {e}", exc_info=True)
             # Fall back to basic implementation if Gemini fails
+            record_fallback('architecture_diagram')
+    
+    return generate_basic_architecture_diagram(parsed_spec)
+
+@timed('architecture_diagram')
+async def generate_architecture_diagram_async(parsed_spec: Union[Dict[str, Any], Spec]) -> str:
+    """Async variant of generate_architecture_diagram"""
+    if is_model_available():
+        try:
+            return await generate_architecture_diagram_with_gemini_async(parsed_spec)
+        except Exception as e:
+            logger.error(f"Error generating architecture diagram with Gemini: {e}", exc_info=True)
+            # Fall back to basic implementation if Gemini fails
+            record_fallback('architecture_diagram')
     
+    return generate_basic_architecture_diagram(parsed_spec)
+
+def generate_basic_architecture_diagram(parsed_spec: Union[Dict[str, Any], Spec]) -> str:
+    """Generate a Mermaid flowchart directly from the parsed architecture, without the LLM"""
     logger.info("Generating architecture diagram using basic implementation")
     
+    spec = Spec.coerce(parsed_spec)
     mermaid_code = ["flowchart TD"]
     
     # Process components
-    for component in parsed_spec.get('architecture', {}).get('components', []):
-        component_name = component.get('name', '')
-        component_id = component_name.replace(' ', '_')
-        
+    for component, component_id in zip(spec.components, spec.participant_ids):
         # Add component definition
-        mermaid_code.append(f"    {component_id}[\"{component_name}\"]")
+        mermaid_code.append(f"    {component_id}[\"{component.name}\"]")
     
     # Process connections
-    for connection in parsed_spec.get('architecture', {}).get('connections', []):
-        source = connection.get('source', '').replace(' ', '_')
-        target = connection.get('target', '').replace(' ', '_')
-        description = connection.get('description', '')
+    for connection in spec.connections:
+        source = connection.source.replace(' ', '_')
+        target = connection.target.replace(' ', '_')
         
         # Add connection with description if available
-        if description:
-            mermaid_code.append(f"    {source} -->|{description}| {target}")
+        if connection.description:
+            mermaid_code.append(f"    {source} -->|{connection.description}| {target}")
         else:
             mermaid_code.append(f"    {source} --> {target}")
     
     # Return the complete diagram
     return "\n".join(mermaid_code)
 
-def generate_use_case_diagram(parsed_spec: Dict[str, Any]) -> str:
+@timed('use_case_diagram')
+def generate_use_case_diagram(parsed_spec: Union[Dict[str, Any], Spec]) -> str:
     """
     Generate Mermaid use case diagram code from the specification
     
     Args:
-        parsed_spec (dict): Parsed specification structure
+        parsed_spec (dict or Spec): Parsed specification structure
         
     Returns:
         str: Mermaid use case diagram code
     """
     logger.info("Generating use case diagram")
     
+    spec = Spec.coerce(parsed_spec)
     mermaid_code = ["flowchart LR"]
     
-    # Collect unique actors
-    actors = set()
-    for use_case in parsed_spec.get('use_cases', []):
-        for actor in use_case.get('actors', []):
-            actors.add(actor)
+    # Number the distinct actors in order of first appearance
+    actor_ids = {actor: f"actor{i+1}" for i, actor in enumerate(spec.actors)}
     
     # Add actors
-    for i, actor in enumerate(actors):
-        actor_id = f"actor{i+1}"
+    for actor, actor_id in actor_ids.items():
         mermaid_code.append(f"    {actor_id}((\"{actor}\"))")
     
     # Add use cases
-    for i, use_case in enumerate(parsed_spec.get('use_cases', [])):
-        use_case_id = use_case.get('id', f"UC{i+1}")
-        use_case_name = use_case.get('name', '')
-        mermaid_code.append(f"    {use_case_id}[\"{use_case_name}\"]")
+    for use_case in spec.use_cases:
+        mermaid_code.append(f"    {use_case.id}[\"{use_case.name}\"]")
         
         # Connect actors to use cases
-        for actor in use_case.get('actors', []):
-            # Find actor id
-            actor_id = None
-            for j, a in enumerate(actors):
-                if a == actor:
-                    actor_id = f"actor{j+1}"
-                    break
-            
-            if actor_id:
-                mermaid_code.append(f"    {actor_id} --- {use_case_id}")
+        for actor in use_case.actors:
+            mermaid_code.append(f"    {actor_ids[actor]} --- {use_case.id}")
     
     # Return the complete diagram
     return "\n".join(mermaid_code)
 
+@timed('sequence_diagram')
 def generate_sequence_diagram_for_use_case(use_case_id: str, use_case_data: Dict[str, Any], 
                                           spec: Optional[Dict[str, Any]] = None) -> str:
     """
@@ -204,141 +381,306 @@ def generate_sequence_diagram_for_use_case(use_case_id: str, use_case_data: Dict
     """
     logger.info(f"Generating sequence diagram for use case: {use_case_id}")
     
-    if GEMINI_API_KEY and spec:
+    if is_model_available() and spec:
         try:
             return generate_sequence_diagram_with_gemini(use_case_id, use_case_data, spec)
         except Exception as e:
             logger.error(f"Error generating sequence diagram with Gemini: {e}", exc_info=True)
             # Fall back to basic implementation if Gemini fails
+            record_fallback('sequence_diagram')
+    
+    return generate_basic_sequence_diagram(use_case_data, spec)
+
+@timed('sequence_diagram')
+async def generate_sequence_diagram_for_use_case_async(use_case_id: str, use_case_data: Dict[str, Any], 
+                                                      spec: Optional[Union[Dict[str, Any], Spec]] = None) -> str:
+    """Async variant of generate_sequence_diagram_for_use_case"""
+    logger.info(f"Generating sequence diagram for use case: {use_case_id}")
+    
+    if is_model_available() and spec:
+        try:
+            return await generate_sequence_diagram_with_gemini_async(use_case_id, use_case_data, spec)
+        except Exception as e:
+            logger.error(f"Error generating sequence diagram with Gemini: {e}", exc_info=True)
+            # Fall back to basic implementation if Gemini fails
+            record_fallback('sequence_diagram')
     
-    # Basic sequence diagram generation
+    return generate_basic_sequence_diagram(use_case_data, spec)
+
+def generate_basic_sequence_diagram(use_case_data: Union[Dict[str, Any], UseCase],
+                                    spec: Optional[Union[Dict[str, Any], Spec]] = None) -> str:
+    """Generate a Mermaid sequence diagram directly from the use case flow, without the LLM"""
+    use_case = UseCase.coerce(use_case_data)
     mermaid_code = ["sequenceDiagram"]
     
     # Add title
-    use_case_name = use_case_data.get('name', '')
-    mermaid_code.append(f"    title {use_case_name}")
+    mermaid_code.append(f"    title {use_case.name}")
     
     # Add participants (actors)
-    actors = use_case_data.get('actors', [])
-    for actor in actors:
+    for actor in use_case.actors:
         mermaid_code.append(f"    participant {actor}")
     
     # Add system components/participants
     # Add components that might be involved (from architecture)
-    if spec:
-        components = spec.get('architecture', {}).get('components', [])
-        for component in components:
-            component_name = component.get('name', '')
-            mermaid_code.append(f"    participant {component_name.replace(' ', '_')}")
+    if isinstance(spec, Spec):
+        component_ids = spec.participant_ids
+    elif spec:
+        component_ids = [component.get('name', '').replace(' ', '_')
+                         for component in spec.get('architecture', {}).get('components', [])]
+    else:
+        component_ids = []
+    mermaid_code.extend(f"    participant {component_id}" for component_id in component_ids)
     
     # Add flow as messages
-    for step in use_case_data.get('flow', []):
-        source = step.get('actor', '').replace(' ', '_')
-        target = step.get('action', '').replace(' ', '_')
-        message = step.get('message', '')
+    for step in use_case.flow:
+        source = step.actor.replace(' ', '_')
+        target = step.action.replace(' ', '_')
         
         if source and target:
-            if message:
-                mermaid_code.append(f"    {source}->>+{target}: {message}")
+            if step.message:
+                mermaid_code.append(f"    {source}->>+{target}: {step.message}")
             else:
-                mermaid_code.append(f"    {source}->>+{target}: step {step.get('step', '')}")
+                mermaid_code.append(f"    {source}->>+{target}: step {step.step}")
         
         # Add return messages where appropriate
-        if target and source and step.get('step', 0) % 2 == 0:
+        if target and source and step.step % 2 == 0:
             mermaid_code.append(f"    {target}-->>-{source}: response")
     
     # Return the complete diagram
     return "\n".join(mermaid_code)
 
 # Gemini API-based diagram generation
+SEQUENCE_DIAGRAM_FALLBACK = "sequenceDiagram\n    title Failed to generate sequence diagram with AI"
+
 def generate_class_diagram_with_gemini(parsed_spec: Dict[str, Any]) -> str:
     """Generate a class diagram using Gemini AI assistance"""
     logger.info("Generating class diagram with Gemini API")
     
-    # Cargar el prompt desde archivo
-    prompt_template = load_prompt('diagram_generator', 'class_diagram')
-    if not prompt_template:
-        logger.error("Failed to load class diagram prompt")
-        return generate_class_diagram(parsed_spec)  # Fallback to basic implementation
+    diagram_input = _class_diagram_input(parsed_spec)
+    cache_key = make_cache_key('diagram_generator', 'class_diagram', diagram_input)
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        return cached
     
-    # Rellenar el template con los datos
-    prompt = prompt_template.format(spec=parsed_spec)
+    prompt = _build_class_diagram_prompt(diagram_input)
+    if not prompt:
+        record_fallback('class_diagram')
+        return generate_basic_class_diagram(parsed_spec)  # Fallback to basic implementation
     
     # Call Gemini API using centralized model
-    response = generate_content(prompt)
+    response = generate_content(prompt, template='diagram_generator/class_diagram')
     
     if response:
         # Process and clean the response
         mermaid_code = clean_mermaid_response(response.text, 'classDiagram')
+        get_cache().set(cache_key, mermaid_code)
         return mermaid_code
-    else:
-        # Fallback to basic implementation if API call fails
-        return generate_class_diagram(parsed_spec)
+    
+    # Fallback to basic implementation if API call fails
+    record_fallback('class_diagram')
+    return generate_basic_class_diagram(parsed_spec)
+
+async def generate_class_diagram_with_gemini_async(parsed_spec: Dict[str, Any]) -> str:
+    """Async variant of generate_class_diagram_with_gemini"""
+    logger.info("Generating class diagram with Gemini API")
+    
+    diagram_input = _class_diagram_input(parsed_spec)
+    cache_key = make_cache_key('diagram_generator', 'class_diagram', diagram_input)
+    cached = await get_cache().get_async(cache_key)
+    if cached is not None:
+        return cached
+    
+    prompt = _build_class_diagram_prompt(diagram_input)
+    if not prompt:
+        record_fallback('class_diagram')
+        return generate_basic_class_diagram(parsed_spec)
+    
+    response = await generate_content_async(prompt, template='diagram_generator/class_diagram')
+    
+    if response:
+        mermaid_code = clean_mermaid_response(response.text, 'classDiagram')
+        await get_cache().set_async(cache_key, mermaid_code)
+        return mermaid_code
+    
+    record_fallback('class_diagram')
+    return generate_basic_class_diagram(parsed_spec)
 
 def generate_architecture_diagram_with_gemini(parsed_spec: Dict[str, Any]) -> str:
     """Generate an architecture diagram using Gemini AI assistance"""
     logger.info("Generating architecture diagram with Gemini API")
     
-    # Cargar el prompt desde archivo
-    prompt_template = load_prompt('diagram_generator', 'architecture_diagram')
-    if not prompt_template:
-        logger.error("Failed to load architecture diagram prompt")
-        return generate_architecture_diagram(parsed_spec)  # Fallback to basic implementation
+    diagram_input = _architecture_diagram_input(parsed_spec)
+    cache_key = make_cache_key('diagram_generator', 'architecture_diagram', diagram_input)
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        return cached
     
-    # Rellenar el template con los datos
-    prompt = prompt_template.format(spec=parsed_spec)
+    prompt = _build_architecture_diagram_prompt(diagram_input)
+    if not prompt:
+        record_fallback('architecture_diagram')
+        return generate_basic_architecture_diagram(parsed_spec)  # Fallback to basic implementation
     
     # Call Gemini API using centralized model
-    response = generate_content(prompt)
+    response = generate_content(prompt, template='diagram_generator/architecture_diagram')
     
     if response:
         # Process and clean the response
         mermaid_code = clean_mermaid_response(response.text, 'flowchart TD')
+        get_cache().set(cache_key, mermaid_code)
         return mermaid_code
-    else:
-        # Fallback if API call fails
-        return generate_architecture_diagram(parsed_spec)
+    
+    # Fallback if API call fails
+    record_fallback('architecture_diagram')
+    return generate_basic_architecture_diagram(parsed_spec)
+
+async def generate_architecture_diagram_with_gemini_async(parsed_spec: Dict[str, Any]) -> str:
+    """Async variant of generate_architecture_diagram_with_gemini"""
+    logger.info("Generating architecture diagram with Gemini API")
+    
+    diagram_input = _architecture_diagram_input(parsed_spec)
+    cache_key = make_cache_key('diagram_generator', 'architecture_diagram', diagram_input)
+    cached = await get_cache().get_async(cache_key)
+    if cached is not None:
+        return cached
+    
+    prompt = _build_architecture_diagram_prompt(diagram_input)
+    if not prompt:
+        record_fallback('architecture_diagram')
+        return generate_basic_architecture_diagram(parsed_spec)
+    
+    response = await generate_content_async(prompt, template='diagram_generator/architecture_diagram')
+    
+    if response:
+        mermaid_code = clean_mermaid_response(response.text, 'flowchart TD')
+        await get_cache().set_async(cache_key, mermaid_code)
+        return mermaid_code
+    
+    record_fallback('architecture_diagram')
+    return generate_basic_architecture_diagram(parsed_spec)
 
 def generate_sequence_diagram_with_gemini(use_case_id: str, use_case_data: Dict[str, Any], 
                                          spec: Dict[str, Any]) -> str:
     """Generate a sequence diagram for a use case using Gemini AI assistance"""
     logger.info(f"Generating sequence diagram for use case {use_case_id} with Gemini API")
     
+    diagram_input = _sequence_diagram_input(use_case_data, spec)
+    cache_key = make_cache_key('diagram_generator', 'sequence_diagram', diagram_input)
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        return cached
+    
+    prompt = _build_sequence_diagram_prompt(diagram_input)
+    if not prompt:
+        record_fallback('sequence_diagram')
+        return SEQUENCE_DIAGRAM_FALLBACK  # Basic fallback
+    
+    # Call Gemini API using centralized model
+    response = generate_content(prompt, template='diagram_generator/sequence_diagram')
+    
+    if response:
+        # Process and clean the response
+        mermaid_code = clean_mermaid_response(response.text, 'sequenceDiagram')
+        get_cache().set(cache_key, mermaid_code)
+        return mermaid_code
+    
+    # Create a simple sequence diagram if API call fails
+    record_fallback('sequence_diagram')
+    return SEQUENCE_DIAGRAM_FALLBACK
+
+async def generate_sequence_diagram_with_gemini_async(use_case_id: str, use_case_data: Dict[str, Any], 
+                                                     spec: Dict[str, Any]) -> str:
+    """Async variant of generate_sequence_diagram_with_gemini"""
+    logger.info(f"Generating sequence diagram for use case {use_case_id} with Gemini API")
+    
+    diagram_input = _sequence_diagram_input(use_case_data, spec)
+    cache_key = make_cache_key('diagram_generator', 'sequence_diagram', diagram_input)
+    cached = await get_cache().get_async(cache_key)
+    if cached is not None:
+        return cached
+    
+    prompt = _build_sequence_diagram_prompt(diagram_input)
+    if not prompt:
+        record_fallback('sequence_diagram')
+        return SEQUENCE_DIAGRAM_FALLBACK
+    
+    response = await generate_content_async(prompt, template='diagram_generator/sequence_diagram')
+    
+    if response:
+        mermaid_code = clean_mermaid_response(response.text, 'sequenceDiagram')
+        await get_cache().set_async(cache_key, mermaid_code)
+        return mermaid_code
+    
+    record_fallback('sequence_diagram')
+    return SEQUENCE_DIAGRAM_FALLBACK
+
+def _build_class_diagram_prompt(diagram_input: Dict[str, Any]) -> Optional[str]:
+    """Fill the class diagram prompt template, or return None if it can't be loaded"""
+    # Cargar el prompt desde archivo
+    prompt_template = get_prompt_template('diagram_generator', 'class_diagram')
+    if not prompt_template:
+        logger.error("Failed to load class diagram prompt")
+        return None
+    
+    # Rellenar el template con los datos
+    return prompt_template.render(spec=to_compact_json(diagram_input))
+
+def _build_architecture_diagram_prompt(diagram_input: Dict[str, Any]) -> Optional[str]:
+    """Fill the architecture diagram prompt template, or return None if it can't be loaded"""
+    # Cargar el prompt desde archivo
+    prompt_template = get_prompt_template('diagram_generator', 'architecture_diagram')
+    if not prompt_template:
+        logger.error("Failed to load architecture diagram prompt")
+        return None
+    
+    # Rellenar el template con los datos
+    return prompt_template.render(spec=to_compact_json(diagram_input))
+
+def _build_sequence_diagram_prompt(diagram_input: Dict[str, Any]) -> Optional[str]:
+    """Fill the sequence diagram prompt template, or return None if it can't be loaded"""
     # Cargar el prompt desde archivo
-    prompt_template = load_prompt('diagram_generator', 'sequence_diagram')
+    prompt_template = get_prompt_template('diagram_generator', 'sequence_diagram')
     if not prompt_template:
         logger.error("Failed to load sequence diagram prompt")
-        return "sequenceDiagram\n    title Failed to generate sequence diagram with AI"  # Basic fallback
+        return None
     
     # Preparar los datos para el template
-    use_case_name = use_case_data.get('name', '')
-    use_case_description = use_case_data.get('description', '')
-    actors = ', '.join(use_case_data.get('actors', []))
-    flow = str(use_case_data.get('flow', []))
-    classes = str(spec.get('classes', []))
-    architecture_components = str(spec.get('architecture', {}).get('components', []))
+    use_case = diagram_input.get('use_case', {})
+    classes = _describe_relevant(diagram_input.get('classes'), diagram_input.get('other_classes'))
+    architecture_components = _describe_relevant(diagram_input.get('components'),
+                                                 diagram_input.get('other_components'))
     
     # Rellenar el template con los datos
-    prompt = prompt_template.format(
-        use_case_name=use_case_name,
-        use_case_description=use_case_description,
-        actors=actors,
-        flow=flow,
+    return prompt_template.render(
+        use_case_name=use_case.get('name', ''),
+        use_case_description=use_case.get('description', ''),
+        actors=', '.join(use_case.get('actors', [])),
+        flow='\n'.join(use_case.get('flow', [])),
         classes=classes,
         architecture_components=architecture_components
     )
-    
-    # Call Gemini API using centralized model
-    response = generate_content(prompt)
-    
-    if response:
-        # Process and clean the response
-        mermaid_code = clean_mermaid_response(response.text, 'sequenceDiagram')
-        return mermaid_code
-    else:
-        # Create a simple sequence diagram if API call fails
-        return "sequenceDiagram\n    title Failed to generate sequence diagram with AI"
 
+def _describe_relevant(items: Optional[List[Dict[str, Any]]], others: Optional[List[str]]) -> str:
+    """Render the entries a use case mentions, followed by the names of the rest"""
+    text = to_compact_json(items) if items else 'None mentioned by this use case'
+    if others:
+        text += f" (also in the spec: {', '.join(others)})"
+    return text
+
+# Each prompt only sees a compact, budgeted slice of the spec, which is also its
+# cache key, so editing an unrelated section keeps its cached result valid
+def _class_diagram_input(parsed_spec: Dict[str, Any]) -> Dict[str, Any]:
+    """The slice of the spec used by the class diagram prompt"""
+    return class_diagram_payload(parsed_spec)
+
+def _architecture_diagram_input(parsed_spec: Dict[str, Any]) -> Dict[str, Any]:
+    """The slice of the spec used by the architecture diagram prompt"""
+    return architecture_diagram_payload(parsed_spec)
+
+def _sequence_diagram_input(use_case_data: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    """The use case plus only the classes and components it mentions"""
+    return sequence_diagram_payload(use_case_data, spec)
+
+@timed('mermaid_extraction')
 def clean_mermaid_response(response: str, diagram_type: str) -> str:
     """Clean and format the Mermaid code from the LLM response"""
     # Extract just the Mermaid code
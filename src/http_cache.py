@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+ETags and in-memory static files.
+
+Generated results are tied to build_fingerprint(), which changes with the
+model and the prompts.
+
+The index page and everything under static/ are read once into an
+AssetRegistry, each with a strong ETag derived from its content, and re-read
+only when a file's modification time changes. Links from the index page to
+local assets carry ?v=<version>, so those URLs can be cached by the browser for
+STATIC_MAX_AGE_SECONDS while the page itself is revalidated on every load and
+answered with 304 Not Modified when it has not changed.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import mimetypes
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import LLM_MODEL_ID, STATIC_RELOAD_INTERVAL_SECONDS
+from src.ai_model import is_model_available
+from src.prompt_loader import get_prompt_registry
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATIC_DIR = ROOT_DIR / 'static'
+INDEX_PATH = ROOT_DIR / 'templates' / 'index.html'
+
+# Local asset references in the index page, e.g. src="/static/js/main.js"
+_STATIC_LINK_RE = re.compile(r'''(["'])/static/([^"'?#]+)\1''')
+
+
+def make_etag(*parts: str) -> str:
+    """
+    Build a strong ETag from the values that determine a response.
+
+    Returns:
+        str: A quoted entity tag, e.g. "3f2a9c..."
+    """
+    digest = hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def build_fingerprint() -> str:
+    """
+    Describe what produces the output besides the spec itself.
+
+    Changing the model or editing a prompt changes the fingerprint, so results
+    cached under the old one (ETags, the CLI's build manifest) are regenerated
+    rather than reused.
+    """
+    if not is_model_available():
+        return 'basic'
+    return json.dumps({'model': LLM_MODEL_ID, 'prompts': get_prompt_registry().versions()}, sort_keys=True)
+
+
+def content_hash(markdown: str, fingerprint: str) -> str:
+    """Hash a spec together with the build fingerprint"""
+    return hashlib.sha256(f"{fingerprint}\0{markdown}".encode('utf-8')).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+
+    Uses the weak comparison If-None-Match calls for, so a tag the compression
+    middleware marked weak (W/) still matches.
+
+    Args:
+        if_none_match (str): The header value, possibly a list of tags or "*"
+        etag (str): The current ETag of the resource
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    current = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == current:
+            return True
+    return False
+
+
+class Asset:
+    """A file held in memory."""
+
+    __slots__ = ('body', 'media_type', 'etag', 'version', 'mtime')
+
+    def __init__(self, body: bytes, media_type: str, mtime: Optional[int] = None):
+        self.body = body
+        self.media_type = media_type
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+        self.mtime = mtime
+
+
+class AssetRegistry:
+    """In-memory copy of the static files and the index page."""
+
+    def __init__(self, static_dir: Path = STATIC_DIR, index_path: Path = INDEX_PATH,
+                 reload_interval: float = STATIC_RELOAD_INTERVAL_SECONDS):
+        self.static_dir = Path(static_dir)
+        self.index_path = Path(index_path)
+        self.reload_interval = reload_interval
+        self._assets: Dict[str, Asset] = {}
+        self._index: Optional[Asset] = None
+        self._index_mtime = None
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        with self._lock:
+            self._refresh()
+
+    def get(self, path: str) -> Optional[Asset]:
+        """
+        Look up a static file.
+
+        Args:
+            path (str): Path relative to the static directory, e.g. "js/main.js"
+
+        Returns:
+            Asset: The file, or None if there is no such file
+        """
+        self._maybe_refresh()
+        return self._assets.get(path)
+
+    def index(self) -> Optional[Asset]:
+        """The index page with versioned asset links, or None if it could not be read"""
+        self._maybe_refresh()
+        return self._index
+
+    def _maybe_refresh(self) -> None:
+        if self.reload_interval > 0 and time.monotonic() - self._last_check >= self.reload_interval:
+            with self._lock:
+                if time.monotonic() - self._last_check >= self.reload_interval:
+                    self._refresh()
+
+    def _refresh(self) -> None:
+        """Load new or modified files and forget deleted ones (with the lock held)"""
+        assets = {}
+        changed = False
+        for path in self.static_dir.rglob('*'):
+            relative = path.relative_to(self.static_dir)
+            if (not path.is_file() or relative.parts[0] == '__pycache__' or path.suffix == '.py'
+                    or any(part.startswith('.') for part in relative.parts)):
+                continue
+            key = relative.as_posix()
+            try:
+                mtime = path.stat().st_mtime_ns
+                current = self._assets.get(key)
+                if current is not None and current.mtime == mtime:
+                    assets[key] = current
+                    continue
+                media_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+                if media_type.startswith('text/') or media_type in ('application/javascript', 'image/svg+xml'):
+                    media_type += '; charset=utf-8'
+                assets[key] = Asset(path.read_bytes(), media_type, mtime)
+            except OSError as e:
+                logger.error(f"Error loading static file {key}: {e}")
+                continue
+            changed = True
+            if current is not None:
+                logger.info(f"Reloaded static file: {key} ({current.version} -> {assets[key].version})")
+        changed = changed or assets.keys() != self._assets.keys()
+        self._assets = assets
+
+        try:
+            index_mtime = self.index_path.stat().st_mtime_ns
+            if changed or self._index is None or index_mtime != self._index_mtime:
+                self._index = Asset(self._render_index(self.index_path.read_text(encoding='utf-8')),
+                                    'text/html; charset=utf-8', index_mtime)
+                self._index_mtime = index_mtime
+        except OSError as e:
+            logger.error(f"Error loading index page {self.index_path}: {e}")
+
+        self._last_check = time.monotonic()
+
+    def _render_index(self, html: str) -> bytes:
+        """Add ?v=<version> to every link to a known static file"""
+        def versioned(match):
+            asset = self._assets.get(match.group(2))
+            if asset is None:
+                return match.group(0)
+            return f"{match.group(1)}/static/{match.group(2)}?v={asset.version}{match.group(1)}"
+        return _STATIC_LINK_RE.sub(versioned, html).encode('utf-8')
+
+
+# Asset registry singleton
+_registry_instance = None
+_registry_lock = threading.Lock()
+
+
+def get_asset_registry() -> AssetRegistry:
+    """
+    Get the shared asset registry, loading it the first time.
+
+    Returns:
+        AssetRegistry: The process-wide registry
+    """
+    global _registry_instance
+
+    if _registry_instance is None:
+        with _registry_lock:
+            if _registry_instance is None:
+                _registry_instance = AssetRegistry()
+    return _registry_instance
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for LLM results.
+
+Results are keyed on a hash of (prompt template name, template version, model
+name, normalized input), so an identical spec sent twice never pays for a
+second LLM round-trip, while editing a prompt or switching models invalidates
+old entries automatically. A small in-memory LRU sits in front of a SQLite
+store that survives restarts, applies TTL and size-based eviction, and is
+shared by every server worker on the machine. Async callers use get_async and
+set_async, which only leave the event loop for the SQLite store.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.prompt_loader import get_prompt_version
+from config import (LLM_MODEL_ID, LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS,
+                    LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MEMORY_ENTRIES)
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_input(payload: Any) -> str:
+    """
+    Normalize a prompt input so that insignificant differences share a cache key.
+
+    Strings get unified line endings and trailing whitespace removed; everything
+    else is serialized as canonical JSON (sorted keys, no extra whitespace).
+
+    Args:
+        payload: Markdown text or any JSON-serializable structure
+
+    Returns:
+        str: Canonical text representation of the payload
+    """
+    if isinstance(payload, str):
+        lines = payload.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        return '\n'.join(line.rstrip() for line in lines).strip()
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def make_cache_key(category: str, prompt_name: str, payload: Any, model_name: str = LLM_MODEL_ID) -> str:
+    """
+    Build the cache key for one LLM call.
+
+    Args:
+        category (str): Prompt category (markdown_parser, diagram_generator, ...)
+        prompt_name (str): Prompt template name without extension
+        payload: The input the template is filled with
+        model_name (str): Model that will serve the request
+
+    Returns:
+        str: Hex SHA-256 digest identifying the request
+    """
+    digest = hashlib.sha256()
+    for part in (f"{category}/{prompt_name}", get_prompt_version(category, prompt_name) or '',
+                 model_name, normalize_input(payload)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """Two-level (memory LRU + SQLite) cache of JSON-serializable LLM results."""
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, memory_entries: int,
+                 enabled: bool = True):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.enabled = enabled
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                       'sets': 0, 'expired': 0, 'evictions': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite store on first use, and again in a forked worker"""
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # WAL lets every server worker read while one of them writes
+            self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._conn.commit()
+            logger.info(f"Opened LLM cache at {self.path}")
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached result.
+
+        Args:
+            key (str): Key built with make_cache_key
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            value = self._from_memory(key, now)
+            if value is not None:
+                return json.loads(value)
+
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    conn.commit()
+                    self._stats['expired'] += 1
+                    row = None
+                if row is None:
+                    self._stats['misses'] += 1
+                    return None
+
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error reading from LLM cache: {e}")
+                self._stats['misses'] += 1
+                return None
+
+            value, created = row
+            self._remember(key, created, value)
+            self._stats['hits'] += 1
+            self._stats['disk_hits'] += 1
+            return json.loads(value)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        """Async variant of get; a miss in memory is looked up on disk in a worker thread"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            value = self._from_memory(key, time.time())
+        if value is not None:
+            return json.loads(value)
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a result in both cache levels, evicting the least recently used
+        disk entries once the store grows beyond max_entries.
+
+        Args:
+            key (str): Key built with make_cache_key
+            value: JSON-serializable result
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        serialized = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, now, serialized)
+            self._stats['sets'] += 1
+            try:
+                conn = self._connect()
+                conn.execute("INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                             (key, serialized, now, now))
+                excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    conn.execute("DELETE FROM entries WHERE key IN "
+                                 "(SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)", (excess,))
+                    self._stats['evictions'] += excess
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing to LLM cache: {e}")
+
+    async def set_async(self, key: str, value: Any) -> None:
+        """Async variant of set; the disk write runs in a worker thread"""
+        if self.enabled:
+            await asyncio.to_thread(self.set, key, value)
+
+    def _from_memory(self, key: str, now: float) -> Optional[str]:
+        """Serialized value from the in-memory LRU, counting the hit (with the lock held)"""
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if now - created > self.ttl_seconds:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        self._stats['hits'] += 1
+        self._stats['memory_hits'] += 1
+        return value
+
+    def _remember(self, key: str, created: float, serialized: str) -> None:
+        """Insert into the in-memory LRU, dropping the oldest entry when full"""
+        self._memory[key] = (created, serialized)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every cached entry"""
+        with self._lock:
+            self._memory.clear()
+            if self.enabled:
+                conn = self._connect()
+                conn.execute("DELETE FROM entries")
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['enabled'] = self.enabled
+            stats['memory_entries'] = len(self._memory)
+            return stats
+
+
+# Cache singleton
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    """
+    Get the shared LLM cache instance.
+
+    Returns:
+        LLMCache: The process-wide cache, configured from config.py
+    """
+    global _cache_instance
+
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                _cache_instance = LLMCache(
+                    LLM_CACHE_PATH,
+                    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                    max_entries=LLM_CACHE_MAX_ENTRIES,
+                    memory_entries=LLM_CACHE_MEMORY_ENTRIES,
+                    enabled=LLM_CACHE_ENABLED,
+                )
+    return _cache_instance
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Resilient client around the model singleton.
+
+Every call goes through a circuit breaker, a token-bucket rate limiter matched
+to the API quota and a per-call deadline, and transient failures (429, 5xx,
+timeouts, dropped connections) are retried with exponential backoff and full
+jitter. While the circuit is open calls fail fast, so callers drop straight to
+the regex/basic generators instead of waiting on an unhealthy API.
+
+A timed-out call cannot be stopped from here, so the backends also put the
+deadline on the request itself, and a retry is only sent once the previous
+attempt's thread has returned: a hung call holds at most one worker thread.
+
+The client only needs a callable returning a model object with a
+generate_content(prompt, stream=False) method, so it can be exercised against
+a local fake model.
+"""
+import time
+import random
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor, Future, TimeoutError as FutureTimeoutError, wait as wait_futures
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is refused because the circuit breaker is open."""
+
+
+class LLMCallTimeout(TimeoutError):
+    """Raised when a model call exceeds its deadline."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Decide whether a failed call is worth retrying.
+
+    google.api_core exceptions carry the HTTP status in `code`; timeouts and
+    connection errors are always considered transient.
+
+    Args:
+        error (Exception): The error raised by the model call
+
+    Returns:
+        bool: True for rate limiting, server errors, timeouts and connection errors
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None)
+    if callable(code):
+        # gRPC style errors expose code() returning a StatusCode
+        return False
+    return code in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """Thread-safe token bucket that reserves capacity ahead of time."""
+
+    def __init__(self, rate_per_second: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take one token, going into debt if the bucket is empty.
+
+        Returns:
+            float: Seconds the caller must wait before sending its request
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls pass through. After failure_threshold consecutive failures it
+    opens and refuses calls for reset_seconds, then lets a single trial call
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the reset time has passed"""
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may be made now"""
+        state = self.state
+        with self._lock:
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call"""
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("LLM circuit breaker closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """Free the half-open trial slot of a call that ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the circuit when the threshold is reached"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"LLM circuit breaker opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class LLMClient:
+    """Model caller with deadlines, retries, rate limiting and a circuit breaker."""
+
+    def __init__(self, get_model: Callable[[], Any], executor: Executor, timeout: float, max_retries: int,
+                 base_delay: float, max_delay: float, rate_limiter: Optional[TokenBucket] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.get_model = get_model
+        self.executor = executor
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker
+        self._stats = {'calls': 0, 'attempts': 0, 'successes': 0, 'failures': 0, 'retries': 0,
+                       'timeouts': 0, 'rejected': 0, 'rate_limited_seconds': 0.0}
+        self._stats_lock = threading.Lock()
+
+    def generate(self, prompt: str) -> Any:
+        """
+        Call the model, retrying transient failures.
+
+        Args:
+            prompt (str): The prompt to send to the model
+
+        Returns:
+            The model response
+
+        Raises:
+            CircuitOpenError: If the circuit breaker refuses the call
+            RuntimeError: If the model is not initialized
+            Exception: The last error once retries are exhausted, or any non-retryable error
+        """
+        model = self._begin()
+        try:
+            for attempt in range(self.max_retries + 1):
+                time.sleep(self._rate_limit_wait())
+                self._count('attempts')
+                future = self.executor.submit(model.generate_content, prompt)
+                try:
+                    response = future.result(timeout=self.timeout)
+                except FutureTimeoutError:
+                    error = self._timed_out()
+                    if not self._finished(future):
+                        # Its thread is still busy; don't take another one for a retry
+                        self._failed(error, self.max_retries)
+                except Exception as e:
+                    error = e
+                else:
+                    return self._succeeded(response)
+
+                delay = self._failed(error, attempt)
+                time.sleep(delay)
+        finally:
+            if self.breaker:
+                self.breaker.release()
+
+    async def generate_async(self, prompt: str) -> Any:
+        """Async variant of generate; the blocking SDK call runs on the executor"""
+        model = self._begin()
+        try:
+            for attempt in range(self.max_retries + 1):
+                # A shared limiter may hit SQLite or Redis, so reserve off the event loop
+                await asyncio.sleep(await asyncio.to_thread(self._rate_limit_wait))
+                self._count('attempts')
+                future = self.executor.submit(model.generate_content, prompt)
+                try:
+                    response = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+                except asyncio.TimeoutError:
+                    error = self._timed_out()
+                    if not await self._finished_async(future):
+                        self._failed(error, self.max_retries)
+                except Exception as e:
+                    error = e
+                else:
+                    return self._succeeded(response)
+
+                delay = self._failed(error, attempt)
+                await asyncio.sleep(delay)
+        finally:
+            # A cancelled call records neither success nor failure, but must
+            # not keep the half-open trial slot
+            if self.breaker:
+                self.breaker.release()
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Stream text chunks from the model.
+
+        A stream cannot be replayed once chunks have been handed out, so it is
+        not retried, but it is rate limited and feeds the circuit breaker. The
+        backend's request timeout bounds the wait for each chunk.
+
+        Yields:
+            str: Text chunks in the order the model produces them
+        """
+        model = self._begin()
+        try:
+            time.sleep(self._rate_limit_wait())
+            self._count('attempts')
+            for chunk in model.generate_content(prompt, stream=True):
+                yield chunk.text
+        except GeneratorExit:
+            # The consumer stopped early; the API itself was answering
+            self._succeeded(None)
+            raise
+        except Exception as e:
+            self._failed(e, self.max_retries)
+        else:
+            self._succeeded(None)
+        finally:
+            if self.breaker:
+                self.breaker.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call counters and the circuit breaker state"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['circuit'] = self.breaker.state if self.breaker else None
+        return stats
+
+    def _begin(self) -> Any:
+        """Check the circuit breaker and fetch the model before a call"""
+        model = self.get_model()
+        if model is None:
+            raise RuntimeError("Model not initialized")
+
+        if self.breaker and not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError("LLM circuit breaker is open; skipping model call")
+        self._count('calls')
+        return model
+
+    def _rate_limit_wait(self) -> float:
+        """Seconds to wait for the rate limiter before the next attempt"""
+        if not self.rate_limiter:
+            return 0.0
+        wait = self.rate_limiter.reserve()
+        if wait:
+            with self._stats_lock:
+                self._stats['rate_limited_seconds'] += wait
+        return wait
+
+    def _finished(self, future: Future) -> bool:
+        """
+        Give a timed-out attempt up to another deadline to return its thread.
+
+        Returns:
+            bool: True once the attempt no longer occupies a worker thread
+        """
+        if not future.cancel():
+            wait_futures([future], timeout=self.timeout)
+        return future.done()
+
+    async def _finished_async(self, future: Future) -> bool:
+        """Async variant of _finished"""
+        if not future.cancel():
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except Exception:
+                # Its outcome no longer matters, only whether the thread is free
+                pass
+        return future.done()
+
+    def _timed_out(self) -> LLMCallTimeout:
+        """Build the error for a call that missed its deadline"""
+        self._count('timeouts')
+        return LLMCallTimeout(f"Model call exceeded {self.timeout}s deadline")
+
+    def _succeeded(self, response: Any) -> Any:
+        """Record a successful call and pass its response through"""
+        self._count('successes')
+        if self.breaker:
+            self.breaker.record_success()
+        return response
+
+    def _failed(self, error: Exception, attempt: int) -> float:
+        """
+        Record a failed attempt and return the backoff before the next one.
+
+        Raises:
+            Exception: error itself when it is not retryable or retries are exhausted
+        """
+        retryable = is_retryable(error)
+        if not retryable or attempt >= self.max_retries:
+            self._count('failures')
+            # Only transient errors count against the API; anything else
+            # (a rejected prompt, say) means it answered
+            if self.breaker:
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+            raise error
+
+        self._count('retries')
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        logger.warning(f"Retryable model error ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        return delay
+
+    def _count(self, name: str) -> None:
+        """Increment one of the stats counters"""
+        with self._stats_lock:
+            self._stats[name] += 1
@@ -1,53 +1,25 @@
 #!/usr/bin/env python3
 import re
+import copy
 import json
+import codecs
+import asyncio
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 
-from src.ai_model import generate_content
-from src.prompt_loader import load_prompt
-from config import GEMINI_API_KEY
+from src.ai_model import generate_content, generate_content_async, is_model_available
+from src.prompt_loader import get_prompt_template
+from src.llm_cache import get_cache, make_cache_key, normalize_input
+from src.metrics import timed, record_fallback, record_parse_failure
+from models.spec import Spec, loads
+from config import LLM_MODEL_ID, INCREMENTAL_PARSING, INCREMENTAL_SECTION_CACHE_SIZE
 
 logger = logging.getLogger(__name__)
 
-def parse_markdown_spec(markdown):
-    """
-    Parse markdown specification into structured data
-    
-    Args:
-        markdown (str): Markdown formatted specification text
-    
-    Returns:
-        dict: Structured specification data
-    """
-    logger.debug("Parsing markdown specification")
-    
-    # Try to use Gemini first if available
-    if GEMINI_API_KEY:
-        try:
-            spec = parse_with_gemini(markdown)
-            if spec:
-                return spec
-        except Exception as e:
-            logger.error(f"Error using Gemini to parse markdown: {e}", exc_info=True)
-            logger.info("Falling back to regex-based parsing")
-    
-    # Fallback to regex parsing
-    return parse_with_regex(markdown)
-
-def parse_with_gemini(markdown):
-    """
-    Use Gemini to interpret the markdown and generate structured data
-    
-    Args:
-        markdown (str): Markdown formatted specification text
-    
-    Returns:
-        dict: Structured specification data or None if parsing failed
-    """
-    logger.info("Using Gemini to parse markdown")
-    
-    # Define the JSON schema separately to avoid nested f-string issues
-    json_schema = '''{
+# JSON schema the LLM is asked to follow (kept apart to avoid nested f-string issues)
+SPEC_JSON_SCHEMA = '''{
   "title": "string",
   "description": "string",
   "classes": [
@@ -111,22 +83,368 @@ def parse_with_gemini(markdown):
     }
   ]
 }'''
+
+@timed('parse')
+def parse_markdown_spec(markdown, incremental=None):
+    """
+    Parse markdown specification into structured data
+    
+    Args:
+        markdown (str): Markdown formatted specification text
+        incremental (bool, optional): Parse section by section, reusing results
+            for unchanged sections. Defaults to INCREMENTAL_PARSING.
+    
+    Returns:
+        dict: Structured specification data
+    """
+    if incremental is None:
+        incremental = INCREMENTAL_PARSING
+    if incremental:
+        return parse_markdown_spec_incremental(markdown)
+    
+    logger.debug("Parsing markdown specification")
+    
+    # Try to use Gemini first if available
+    if is_model_available():
+        try:
+            spec = parse_with_gemini(markdown)
+            if spec:
+                return spec
+        except Exception as e:
+            logger.error(f"Error using Gemini to parse markdown: {e}", exc_info=True)
+            logger.info("Falling back to regex-based parsing")
+        record_fallback('parse')
+    
+    # Fallback to regex parsing
+    return parse_with_regex(markdown)
+
+@timed('parse')
+async def parse_markdown_spec_async(markdown, incremental=None):
+    """
+    Async variant of parse_markdown_spec for use from request handlers
+    
+    Args:
+        markdown (str): Markdown formatted specification text
+        incremental (bool, optional): Parse section by section, reusing results
+            for unchanged sections. Defaults to INCREMENTAL_PARSING.
+    
+    Returns:
+        dict: Structured specification data
+    """
+    if incremental is None:
+        incremental = INCREMENTAL_PARSING
+    if incremental:
+        return await parse_markdown_spec_incremental_async(markdown)
+    
+    logger.debug("Parsing markdown specification")
+    
+    # Try to use Gemini first if available
+    if is_model_available():
+        try:
+            spec = await parse_with_gemini_async(markdown)
+            if spec:
+                return spec
+        except Exception as e:
+            logger.error(f"Error using Gemini to parse markdown: {e}", exc_info=True)
+            logger.info("Falling back to regex-based parsing")
+        record_fallback('parse')
+    
+    # Fallback to regex parsing, off the loop since large documents take a while
+    return await asyncio.to_thread(parse_with_regex, markdown)
+
+# Parsed fragments by section hash and parser, so unchanged sections are never parsed twice
+_section_results = OrderedDict()
+_section_results_lock = threading.Lock()
+
+def split_markdown_sections(markdown):
+    """
+    Split the markdown into independently parseable sections
+    
+    The preamble (title) and every H2 section form one section each, except
+    that H2 sections containing H3 blocks are split further: each H3 block
+    becomes its own section, prefixed with its H2 heading so it still parses
+    in context. Headings inside fenced code blocks are ignored.
+    
+    Args:
+        markdown (str): Markdown formatted specification text
+    
+    Returns:
+        list: Dicts with 'h2', 'h3', 'text' and 'hash' keys, in document order
+    """
+    sections = []
+    h2_line = None
+    current = {'h2': None, 'h3': None, 'lines': []}
+    in_fence = False
+    
+    def flush():
+        lines = current['lines']
+        # A bare H2 heading (e.g. directly followed by its first H3) carries no content
+        content = lines[1:] if current['h2'] is not None and current['h3'] is None else lines
+        if not ''.join(content).strip():
+            return
+        text = ''.join(lines) if current['h3'] is None else h2_line + '\n' + ''.join(lines)
+        sections.append({
+            'h2': current['h2'],
+            'h3': current['h3'],
+            'text': text,
+            'hash': hashlib.sha256(normalize_input(text).encode('utf-8')).hexdigest(),
+        })
+    
+    for line in markdown.splitlines(keepends=True):
+        stripped = line.lstrip()
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            in_fence = not in_fence
+        elif not in_fence:
+            h2_match = re.match(r'##\s+(.+?)\s*$', line)
+            h3_match = re.match(r'###\s+(.+?)\s*$', line)
+            if h2_match:
+                flush()
+                h2_line = line
+                current = {'h2': h2_match.group(1), 'h3': None, 'lines': [line]}
+                continue
+            if h3_match and h2_line is not None:
+                flush()
+                current = {'h2': current['h2'], 'h3': h3_match.group(1), 'lines': [line]}
+                continue
+        current['lines'].append(line)
+    
+    flush()
+    return sections
+
+def parse_markdown_spec_incremental(markdown):
+    """
+    Parse markdown specification section by section, only parsing sections
+    whose content changed since they were last seen
+    
+    Each changed section is a separate (cached) parse, so the first parse of a
+    document costs one call per section; later edits only pay for the
+    sections that were touched.
+    
+    Args:
+        markdown (str): Markdown formatted specification text
+    
+    Returns:
+        dict: Structured specification data
+    """
+    sections = split_markdown_sections(markdown)
+    keys = [_section_key(section) for section in sections]
+    fragments = [_get_section_result(key) for key in keys]
+    missing = [i for i, fragment in enumerate(fragments) if fragment is None]
+    logger.info(f"Incremental parse: {len(missing)} of {len(sections)} sections changed")
+    
+    for i in missing:
+        fragments[i] = _parse_section(sections[i], keys[i])
+    
+    return merge_section_specs(sections, fragments)
+
+async def parse_markdown_spec_incremental_async(markdown):
+    """
+    Async variant of parse_markdown_spec_incremental that parses changed
+    sections concurrently
+    
+    Args:
+        markdown (str): Markdown formatted specification text
+    
+    Returns:
+        dict: Structured specification data
+    """
+    sections = split_markdown_sections(markdown)
+    keys = [_section_key(section) for section in sections]
+    fragments = [_get_section_result(key) for key in keys]
+    missing = [i for i, fragment in enumerate(fragments) if fragment is None]
+    logger.info(f"Incremental parse: {len(missing)} of {len(sections)} sections changed")
+    
+    parsed = await asyncio.gather(*(_parse_section_async(sections[i], keys[i]) for i in missing))
+    for i, fragment in zip(missing, parsed):
+        fragments[i] = fragment
+    
+    return merge_section_specs(sections, fragments)
+
+def merge_section_specs(sections, fragments):
+    """
+    Merge per-section parse results into a single specification
+    
+    Title and description are only taken from preamble and whole-H2 sections,
+    so an H3 block can't override them. Use case IDs that are missing or
+    collide across sections are renumbered by position (UC3, then UC3_2, ...),
+    keeping them valid Mermaid node IDs.
+    
+    Args:
+        sections (list): Sections from split_markdown_sections
+        fragments (list): Parsed spec for each section, in the same order
+    
+    Returns:
+        dict: Structured specification data
+    """
+    spec = {}
+    ensure_spec_structure(spec)
+    
+    for section, fragment in zip(sections, fragments):
+        fragment = copy.deepcopy(fragment)
+        if section['h3'] is None:
+            if not spec['title'] and fragment.get('title'):
+                spec['title'] = fragment['title']
+            if not spec['description'] and fragment.get('description'):
+                spec['description'] = fragment['description']
+        
+        spec['classes'].extend(fragment.get('classes', []))
+        spec['entities'].extend(fragment.get('entities', []))
+        architecture = fragment.get('architecture') or {}
+        spec['architecture']['components'].extend(architecture.get('components', []))
+        spec['architecture']['connections'].extend(architecture.get('connections', []))
+        spec['use_cases'].extend(fragment.get('use_cases', []))
+    
+    seen_ids = set()
+    for i, use_case in enumerate(spec['use_cases']):
+        use_case_id = use_case.get('id')
+        if not use_case_id or use_case_id in seen_ids:
+            base_id = use_case_id = f"UC{i+1}"
+            suffix = 1
+            while use_case_id in seen_ids:
+                suffix += 1
+                use_case_id = f"{base_id}_{suffix}"
+            use_case['id'] = use_case_id
+        seen_ids.add(use_case_id)
+    
+    return spec
+
+def _section_key(section):
+    """
+    Key of a section's parse result
+    
+    Like the LLM cache, it covers the model and the parse prompt's version as
+    well as the content, so switching backends or editing the prompt re-parses
+    every section. Without a model the regex parser is the one keyed on.
+    """
+    model_name = LLM_MODEL_ID if is_model_available() else 'regex'
+    return make_cache_key('markdown_parser', 'parse_markdown', section['hash'], model_name=model_name)
+
+def _get_section_result(key):
+    """Look up the parsed fragment for a section key"""
+    with _section_results_lock:
+        fragment = _section_results.get(key)
+        if fragment is not None:
+            _section_results.move_to_end(key)
+        return fragment
+
+def _store_section_result(key, fragment):
+    """Remember the parsed fragment for a section key, evicting the oldest"""
+    with _section_results_lock:
+        _section_results[key] = fragment
+        _section_results.move_to_end(key)
+        while len(_section_results) > INCREMENTAL_SECTION_CACHE_SIZE:
+            _section_results.popitem(last=False)
+
+def _parse_section(section, key):
+    """Parse one section, remembering the result unless it was a fallback"""
+    if is_model_available():
+        try:
+            fragment = parse_with_gemini(section['text'])
+            if fragment:
+                _store_section_result(key, fragment)
+                return fragment
+        except Exception as e:
+            logger.error(f"Error using Gemini to parse section: {e}", exc_info=True)
+        record_fallback('parse')
+        # Regex results are not remembered here so Gemini is retried next time
+        return parse_with_regex(section['text'])
+    
+    fragment = parse_with_regex(section['text'])
+    _store_section_result(key, fragment)
+    return fragment
+
+async def _parse_section_async(section, key):
+    """Async variant of _parse_section"""
+    if is_model_available():
+        try:
+            fragment = await parse_with_gemini_async(section['text'])
+            if fragment:
+                _store_section_result(key, fragment)
+                return fragment
+        except Exception as e:
+            logger.error(f"Error using Gemini to parse section: {e}", exc_info=True)
+        record_fallback('parse')
+        return await asyncio.to_thread(parse_with_regex, section['text'])
+    
+    fragment = await asyncio.to_thread(parse_with_regex, section['text'])
+    _store_section_result(key, fragment)
+    return fragment
+
+def parse_with_gemini(markdown):
+    """
+    Use Gemini to interpret the markdown and generate structured data
+    
+    Args:
+        markdown (str): Markdown formatted specification text
     
+    Returns:
+        dict: Structured specification data or None if parsing failed
+    """
+    logger.info("Using Gemini to parse markdown")
+    
+    cache_key = make_cache_key('markdown_parser', 'parse_markdown', markdown)
+    spec = get_cache().get(cache_key)
+    if spec is not None:
+        logger.info("Using cached Gemini parse of the specification")
+        return spec
+    
+    prompt = _build_parse_prompt(markdown)
+    if not prompt:
+        return None
+    
+    # Get response from Gemini
+    response = generate_content(prompt, template='markdown_parser/parse_markdown')
+    spec = _spec_from_response(response)
+    if spec:
+        get_cache().set(cache_key, spec)
+    return spec
+
+async def parse_with_gemini_async(markdown):
+    """
+    Async variant of parse_with_gemini that awaits the model off the event loop
+    
+    Args:
+        markdown (str): Markdown formatted specification text
+    
+    Returns:
+        dict: Structured specification data or None if parsing failed
+    """
+    logger.info("Using Gemini to parse markdown")
+    
+    cache_key = make_cache_key('markdown_parser', 'parse_markdown', markdown)
+    spec = await get_cache().get_async(cache_key)
+    if spec is not None:
+        logger.info("Using cached Gemini parse of the specification")
+        return spec
+    
+    prompt = _build_parse_prompt(markdown)
+    if not prompt:
+        return None
+    
+    # Get response from Gemini
+    response = await generate_content_async(prompt, template='markdown_parser/parse_markdown')
+    spec = _spec_from_response(response)
+    if spec:
+        await get_cache().set_async(cache_key, spec)
+    return spec
+
+def _build_parse_prompt(markdown):
+    """Fill the markdown parser prompt template, or return None if it can't be loaded"""
     # Cargar el prompt desde el archivo
-    prompt_template = load_prompt('markdown_parser', 'parse_markdown')
+    prompt_template = get_prompt_template('markdown_parser', 'parse_markdown')
     if not prompt_template:
         logger.error("Failed to load markdown parser prompt")
         return None
     
     # Rellenar el template con los datos
-    prompt = prompt_template.format(
+    return prompt_template.render(
         markdown=markdown,
-        json_schema=json_schema
+        json_schema=SPEC_JSON_SCHEMA
     )
-    
-    # Get response from Gemini
-    response = generate_content(prompt)
-    
+
+@timed('json_extraction')
+def _spec_from_response(response):
+    """Extract and validate the structured specification from a Gemini response"""
     if not response:
         logger.warning("No response from Gemini")
         return None
@@ -152,11 +470,9 @@ def parse_with_gemini(markdown):
             # Just use the whole response
             json_str = response_text.strip()
         
-        # Parse the JSON
-        spec = json.loads(json_str)
-        
-        # Ensure the spec has the expected structure
-        ensure_spec_structure(spec)
+        # Parse the JSON, then validate it against the spec model, which fills
+        # in missing fields and drops malformed entries
+        spec = Spec.from_dict(loads(json_str)).to_dict()
         
         logger.info(f"Successfully parsed specification with Gemini: {spec['title']} with " 
                   f"{len(spec.get('classes', []))} classes, "
@@ -166,6 +482,7 @@ def parse_with_gemini(markdown):
         return spec
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse Gemini response as JSON: {e}", exc_info=True)
+        record_parse_failure('markdown_parser/parse_markdown')
         return None
     except Exception as e:
         logger.error(f"Error in Gemini parsing: {e}", exc_info=True)
@@ -207,19 +524,197 @@ def ensure_spec_structure(spec):
         if 'id' not in use_case:
             use_case['id'] = f"UC{i+1}"
 
-def parse_with_regex(markdown):
+# Line patterns used by the single-pass parser
+_HEADING_RE = re.compile(r'(#{1,6})\s+(.+?)\s*$')
+_ATTRIBUTE_RE = re.compile(r'-\s+(.+?)(?:\s*:\s*(.+?))?(?:\s+=\s+(.+?))?(?:\s+//\s*(.+?))?$')
+_METHOD_RE = re.compile(r'-\s+(.+?)(?:\((.*?)\))?(?:\s*->\s*(.+?))?(?:\s+//\s*(.+?))?$')
+_LIST_ITEM_RE = re.compile(r'-\s+(.+)$')
+_INTERACTION_RE = re.compile(r'-\s+(.+?)\s*->\s*(.+?)(?:\s*:\s*(.+?))?$')
+_FLOW_STEP_RE = re.compile(r'(\d+)\.\s+(.+?)\s*(?:->\s*(.+?))?(?:\s*:\s*(.+?))?$')
+
+# H2 sections whose H3 headings start a block (class, component, use case)
+BLOCK_SECTIONS = ('Classes', 'Architecture', 'Use Cases')
+
+class SpecStreamParser:
+    """
+    Incremental, line-oriented parser for markdown specifications
+    
+    Lines are fed one at a time and every class, component, connection and use
+    case is returned as soon as its block is complete, so memory is bounded by
+    the largest single block rather than the whole document. Only the first
+    occurrence of each H2 section, and of each H4 subsection within a block,
+    is used. Headings inside fenced code blocks are plain text.
+    
+    Items are returned as (kind, item) tuples where kind is one of 'title',
+    'description', 'class', 'component', 'connection' or 'use_case'.
     """
-    Parse markdown specification into structured data using regex
+    
+    def __init__(self):
+        self._title_seen = False
+        self._seen_sections = set()
+        self._section = None
+        self._description = None
+        self._block = None
+        self._target = None  # List receiving plain text lines, or None to drop them
+        self._in_fence = False
+        self._use_case_count = 0
+    
+    def feed(self, line):
+        """
+        Consume one line of markdown.
+        
+        Args:
+            line (str): A line, with or without its line ending
+            
+        Returns:
+            list: (kind, item) tuples completed by this line
+        """
+        line = line.rstrip('\r\n')
+        items = []
+        
+        stripped = line.lstrip()
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            self._in_fence = not self._in_fence
+        elif not self._in_fence and line.startswith('#'):
+            match = _HEADING_RE.match(line)
+            if match and self._heading(len(match.group(1)), match.group(2), items):
+                return items
+        
+        if self._target is not None:
+            self._target.append(line)
+        return items
+    
+    def close(self):
+        """
+        Finish parsing at the end of the document.
+        
+        Returns:
+            list: (kind, item) tuples for the blocks still open
+        """
+        items = []
+        self._end_section(items)
+        return items
+    
+    def _heading(self, level, name, items):
+        """Handle a heading line, returning False if it should be treated as text"""
+        if level == 1:
+            if not self._title_seen:
+                self._title_seen = True
+                items.append(('title', name))
+            return True
+        
+        if level == 2:
+            self._end_section(items)
+            if name not in self._seen_sections:
+                self._seen_sections.add(name)
+                self._section = name
+                if name == 'Description':
+                    self._description = self._target = []
+            return True
+        
+        if level == 3 and self._section in BLOCK_SECTIONS:
+            self._end_block(items)
+            self._block = {'name': name, 'lines': [], 'subsections': {}}
+            self._target = self._block['lines']
+            return True
+        
+        if level == 4 and self._block is not None:
+            if name in self._block['subsections']:
+                self._target = None
+            else:
+                self._target = self._block['subsections'][name] = []
+            return True
+        
+        return False
+    
+    def _end_block(self, items):
+        """Turn the open ### block into spec items"""
+        block = self._block
+        if block is None:
+            return
+        self._block = None
+        self._target = None
+        
+        if self._section == 'Classes':
+            items.append(('class', _parse_class_block(block)))
+        elif self._section == 'Architecture':
+            component, connections = _parse_component_block(block)
+            items.append(('component', component))
+            items.extend(('connection', connection) for connection in connections)
+        elif self._section == 'Use Cases':
+            self._use_case_count += 1
+            items.append(('use_case', _parse_use_case_block(block, f"UC{self._use_case_count}")))
+    
+    def _end_section(self, items):
+        """Close the open ## section and its last block"""
+        self._end_block(items)
+        if self._description is not None:
+            items.append(('description', _join_text(self._description)))
+            self._description = None
+        self._section = None
+        self._target = None
+
+def iter_spec_items(lines):
+    """
+    Parse a specification from any iterable of lines, such as an open file
     
     Args:
-        markdown (str): Markdown formatted specification text
+        lines: Iterable of str lines
+        
+    Yields:
+        tuple: (kind, item) as each part of the spec is completed
+    """
+    parser = SpecStreamParser()
+    for line in lines:
+        yield from parser.feed(line)
+    yield from parser.close()
+
+async def aiter_spec_items(chunks, encoding='utf-8'):
+    """
+    Parse a specification from an async stream of text or byte chunks, such
+    as an HTTP request body
+    
+    Chunks may split lines (and multi-byte characters) anywhere; only the
+    current partial line is buffered.
+    
+    Args:
+        chunks: Async iterable of bytes or str
+        encoding (str): Encoding used to decode byte chunks
+        
+    Yields:
+        tuple: (kind, item) as each part of the spec is completed
+    """
+    parser = SpecStreamParser()
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    
+    async for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        pending += chunk
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            for item in parser.feed(line):
+                yield item
+    
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        for item in parser.feed(pending):
+            yield item
+    for item in parser.close():
+        yield item
+
+def collect_spec_items(items):
+    """
+    Assemble (kind, item) tuples from the streaming parser into a spec dict
     
+    Args:
+        items: Iterable of (kind, item) tuples
+        
     Returns:
         dict: Structured specification data
     """
-    logger.info("Using regex to parse markdown")
-    
-    # Initialize the structured specification
     spec = {
         'title': '',
         'description': '',
@@ -232,189 +727,136 @@ def parse_with_regex(markdown):
         'use_cases': []
     }
     
-    # Extract title (first H1)
-    title_match = re.search(r'^#\s+(.+)$', markdown, re.MULTILINE)
-    if title_match:
-        spec['title'] = title_match.group(1).strip()
-    
-    # Extract general description
-    desc_match = re.search(r'^##\s+Description\s*\n+(.*?)(?=^##|\Z)', markdown, re.MULTILINE | re.DOTALL)
-    if desc_match:
-        spec['description'] = desc_match.group(1).strip()
-    
-    # Extract classes
-    classes_section = extract_section(markdown, 'Classes')
-    if classes_section:
-        class_blocks = re.findall(r'###\s+(.+?)\s*\n+(.*?)(?=###|\Z)', classes_section, re.DOTALL)
-        for class_name, class_content in class_blocks:
-            cls = {
-                'name': class_name.strip(),
-                'attributes': [],
-                'methods': []
-            }
-            
-            # Extract attributes
-            attr_section = extract_subsection(class_content, 'Attributes')
-            if attr_section:
-                attrs = re.findall(r'-\s+(.+?)(?:\s*:\s*(.+?))?(?:\s+=\s+(.+?))?(?:\s+//\s*(.+?))?$', attr_section, re.MULTILINE)
-                for attr in attrs:
-                    name = attr[0].strip()
-                    attr_type = attr[1].strip() if len(attr) > 1 and attr[1] else 'str'
-                    default = attr[2].strip() if len(attr) > 2 and attr[2] else None
-                    comment = attr[3].strip() if len(attr) > 3 and attr[3] else None
-                    
-                    cls['attributes'].append({
-                        'name': name,
-                        'type': attr_type,
-                        'default': default,
-                        'comment': comment
-                    })
-            
-            # Extract methods
-            method_section = extract_subsection(class_content, 'Methods')
-            if method_section:
-                methods = re.findall(r'-\s+(.+?)(?:\((.*?)\))?(?:\s*->\s*(.+?))?(?:\s+//\s*(.+?))?$', method_section, re.MULTILINE)
-                for method in methods:
-                    name = method[0].strip()
-                    params = method[1].strip() if len(method) > 1 and method[1] else ''
-                    return_type = method[2].strip() if len(method) > 2 and method[2] else 'None'
-                    comment = method[3].strip() if len(method) > 3 and method[3] else None
-                    
-                    parsed_params = []
-                    if params:
-                        param_list = params.split(',')
-                        for param in param_list:
-                            param = param.strip()
-                            param_parts = param.split(':')
-                            param_name = param_parts[0].strip()
-                            param_type = param_parts[1].strip() if len(param_parts) > 1 else 'Any'
-                            parsed_params.append({
-                                'name': param_name,
-                                'type': param_type
-                            })
-                    
-                    cls['methods'].append({
-                        'name': name,
-                        'parameters': parsed_params,
-                        'return_type': return_type,
-                        'comment': comment
-                    })
-            
-            spec['classes'].append(cls)
-    
-    # Extract architecture components
-    arch_section = extract_section(markdown, 'Architecture')
-    if arch_section:
-        component_blocks = re.findall(r'###\s+(.+?)\s*\n+(.*?)(?=###|\Z)', arch_section, re.DOTALL)
-        for component_name, component_content in component_blocks:
-            comp = {
-                'name': component_name.strip(),
-                'description': '',
-                'responsibilities': []
-            }
-            
-            # Extract description
-            desc_match = re.search(r'^(.*?)(?=####|\Z)', component_content, re.DOTALL)
-            if desc_match:
-                comp['description'] = desc_match.group(1).strip()
-            
-            # Extract responsibilities
-            resp_section = extract_subsection(component_content, 'Responsibilities')
-            if resp_section:
-                responsibilities = re.findall(r'-\s+(.+)$', resp_section, re.MULTILINE)
-                comp['responsibilities'] = [r.strip() for r in responsibilities]
-            
-            # Extract interactions (connections)
-            interact_section = extract_subsection(component_content, 'Interactions')
-            if interact_section:
-                interactions = re.findall(r'-\s+(.+?)\s*->\s*(.+?)(?:\s*:\s*(.+?))?$', interact_section, re.MULTILINE)
-                for interaction in interactions:
-                    source = component_name.strip()
-                    target = interaction[0].strip()
-                    description = interaction[2].strip() if len(interaction) > 2 and interaction[2] else ''
-                    
-                    spec['architecture']['connections'].append({
-                        'source': source,
-                        'target': target,
-                        'description': description
-                    })
-            
-            spec['architecture']['components'].append(comp)
-    
-    # Extract use cases
-    use_cases_section = extract_section(markdown, 'Use Cases')
-    if use_cases_section:
-        use_case_blocks = re.findall(r'###\s+(.+?)\s*\n+(.*?)(?=###|\Z)', use_cases_section, re.DOTALL)
-        for i, (use_case_name, use_case_content) in enumerate(use_case_blocks):
-            use_case = {
-                'id': f"UC{i+1}",
-                'name': use_case_name.strip(),
-                'description': '',
-                'actors': [],
-                'preconditions': [],
-                'flow': [],
-                'postconditions': []
-            }
-            
-            # Extract description
-            desc_match = re.search(r'^(.*?)(?=####|\Z)', use_case_content, re.DOTALL)
-            if desc_match:
-                use_case['description'] = desc_match.group(1).strip()
-            
-            # Extract actors
-            actors_section = extract_subsection(use_case_content, 'Actors')
-            if actors_section:
-                actors = re.findall(r'-\s+(.+)$', actors_section, re.MULTILINE)
-                use_case['actors'] = [a.strip() for a in actors]
-            
-            # Extract preconditions
-            pre_section = extract_subsection(use_case_content, 'Preconditions')
-            if pre_section:
-                preconditions = re.findall(r'-\s+(.+)$', pre_section, re.MULTILINE)
-                use_case['preconditions'] = [p.strip() for p in preconditions]
-            
-            # Extract flow
-            flow_section = extract_subsection(use_case_content, 'Flow')
-            if flow_section:
-                flow_steps = re.findall(r'(\d+)\.\s+(.+?)\s*(?:->\s*(.+?))?(?:\s*:\s*(.+?))?$', flow_section, re.MULTILINE)
-                for step in flow_steps:
-                    step_num = int(step[0])
-                    actor = step[1].strip()
-                    action = step[2].strip() if len(step) > 2 and step[2] else ''
-                    message = step[3].strip() if len(step) > 3 and step[3] else ''
-                    
-                    use_case['flow'].append({
-                        'step': step_num,
-                        'actor': actor,
-                        'action': action,
-                        'message': message
-                    })
-            
-            # Extract postconditions
-            post_section = extract_subsection(use_case_content, 'Postconditions')
-            if post_section:
-                postconditions = re.findall(r'-\s+(.+)$', post_section, re.MULTILINE)
-                use_case['postconditions'] = [p.strip() for p in postconditions]
-            
-            spec['use_cases'].append(use_case)
+    for kind, item in items:
+        if kind == 'title':
+            spec['title'] = item
+        elif kind == 'description':
+            spec['description'] = item
+        elif kind == 'class':
+            spec['classes'].append(item)
+        elif kind == 'component':
+            spec['architecture']['components'].append(item)
+        elif kind == 'connection':
+            spec['architecture']['connections'].append(item)
+        elif kind == 'use_case':
+            spec['use_cases'].append(item)
+    
+    return spec
+
+def parse_with_regex(markdown):
+    """
+    Parse markdown specification into structured data without the LLM
+    
+    The document goes through SpecStreamParser in a single pass and each list
+    item is matched with a per-line pattern, so the cost is linear in the size
+    of the document.
+    
+    Args:
+        markdown (str): Markdown formatted specification text
+    
+    Returns:
+        dict: Structured specification data
+    """
+    logger.info("Using regex to parse markdown")
+    
+    spec = collect_spec_items(iter_spec_items(markdown.splitlines()))
     
     logger.debug(f"Parsed specification: {spec['title']} with {len(spec['classes'])} classes, "
                 f"{len(spec['architecture']['components'])} components, and {len(spec['use_cases'])} use cases")
     
     return spec
 
-def extract_section(markdown, section_name):
-    """Extract a section from the markdown by its heading"""
-    pattern = rf'^##\s+{section_name}\s*\n+(.*?)(?=^##|\Z)'
-    match = re.search(pattern, markdown, re.MULTILINE | re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return ''
-
-def extract_subsection(content, subsection_name):
-    """Extract a subsection from content by its heading"""
-    pattern = rf'^####\s+{subsection_name}\s*\n+(.*?)(?=^####|\Z)'
-    match = re.search(pattern, content, re.MULTILINE | re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return '' 
\ No newline at end of file
+def _join_text(lines):
+    """Join text lines back into a stripped paragraph"""
+    return '\n'.join(lines).strip()
+
+def _match_items(lines, pattern):
+    """Match a line pattern against every non-blank line, skipping those that don't match"""
+    matches = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            match = pattern.match(line)
+            if match:
+                matches.append(match.groups())
+    return matches
+
+def _list_items(lines):
+    """Return the text of every '- item' line"""
+    return [item[0].strip() for item in _match_items(lines, _LIST_ITEM_RE)]
+
+def _parse_class_block(block):
+    """Build a class entry from a tokenized ### block"""
+    cls = {
+        'name': block['name'],
+        'attributes': [],
+        'methods': []
+    }
+    
+    for name, attr_type, default, comment in _match_items(block['subsections'].get('Attributes', []), _ATTRIBUTE_RE):
+        cls['attributes'].append({
+            'name': name.strip(),
+            'type': attr_type.strip() if attr_type else 'str',
+            'default': default.strip() if default else None,
+            'comment': comment.strip() if comment else None
+        })
+    
+    for name, params, return_type, comment in _match_items(block['subsections'].get('Methods', []), _METHOD_RE):
+        parsed_params = []
+        if params and params.strip():
+            for param in params.split(','):
+                param_parts = param.strip().split(':')
+                parsed_params.append({
+                    'name': param_parts[0].strip(),
+                    'type': param_parts[1].strip() if len(param_parts) > 1 else 'Any'
+                })
+        
+        cls['methods'].append({
+            'name': name.strip(),
+            'parameters': parsed_params,
+            'return_type': return_type.strip() if return_type else 'None',
+            'comment': comment.strip() if comment else None
+        })
+    
+    return cls
+
+def _parse_component_block(block):
+    """Build a component entry and its outgoing connections from a tokenized ### block"""
+    component = {
+        'name': block['name'],
+        'description': _join_text(block['lines']),
+        'responsibilities': _list_items(block['subsections'].get('Responsibilities', []))
+    }
+    
+    connections = []
+    for target, _, description in _match_items(block['subsections'].get('Interactions', []), _INTERACTION_RE):
+        connections.append({
+            'source': block['name'],
+            'target': target.strip(),
+            'description': description.strip() if description else ''
+        })
+    
+    return component, connections
+
+def _parse_use_case_block(block, use_case_id):
+    """Build a use case entry from a tokenized ### block"""
+    subsections = block['subsections']
+    use_case = {
+        'id': use_case_id,
+        'name': block['name'],
+        'description': _join_text(block['lines']),
+        'actors': _list_items(subsections.get('Actors', [])),
+        'preconditions': _list_items(subsections.get('Preconditions', [])),
+        'flow': [],
+        'postconditions': _list_items(subsections.get('Postconditions', []))
+    }
+    
+    for step_num, actor, action, message in _match_items(subsections.get('Flow', []), _FLOW_STEP_RE):
+        use_case['flow'].append({
+            'step': int(step_num),
+            'actor': actor.strip(),
+            'action': action.strip() if action else '',
+            'message': message.strip() if message else ''
+        })
+    
+    return use_case
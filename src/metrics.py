@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Dependency-free metrics in the Prometheus text exposition format.
+
+Stage latencies, fallbacks, JSON extraction failures and token usage are
+recorded where they happen; the LLM client, coalescing and cache counters that
+those modules already keep are collected when /metrics is scraped, so the hot
+paths pay nothing extra for them. Metrics are per process: with several
+workers, each scrape reports the worker that answered it.
+"""
+import time
+import inspect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.prompt_compaction import estimate_tokens
+from src.tracing import span
+
+PREFIX = 'spec_assistant'
+
+# Seconds; LLM calls dominate, so the buckets reach well past the call timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Render a label set, e.g. {stage="parse",le="0.5"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, counts in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+                lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {counts[-1]}')
+        return lines
+
+
+STAGE_SECONDS = Histogram(f'{PREFIX}_stage_seconds', 'Time spent in each generation stage', ['stage'])
+FALLBACKS = Counter(f'{PREFIX}_fallbacks_total',
+                    'Times a stage fell back from the model to its basic implementation', ['stage'])
+PARSE_FAILURES = Counter(f'{PREFIX}_response_parse_failures_total',
+                         'Model responses whose JSON could not be extracted', ['template'])
+LLM_TOKENS = Counter(f'{PREFIX}_llm_tokens_total',
+                     'Prompt and response tokens per prompt template (estimated when the backend '
+                     'does not report usage)', ['template', 'direction'])
+
+_METRICS = (STAGE_SECONDS, FALLBACKS, PARSE_FAILURES, LLM_TOKENS)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """Record the with block in the stage histogram, and as a span when the request is traced"""
+    with STAGE_SECONDS.time(stage=stage), span(stage):
+        yield
+
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator recording a function's duration under the given stage.
+
+    Works for plain and async functions, and for async generators, which are
+    timed from the first item requested until the last one is produced.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                with observe_stage(stage):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with observe_stage(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with observe_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Stages that fell back within the current watch_fallbacks block, if any
+_fallbacks_seen = contextvars.ContextVar('fallbacks_seen', default=None)
+
+
+def record_fallback(stage: str) -> None:
+    """Count a fallback from the model to a basic generator"""
+    FALLBACKS.inc(stage=stage)
+    seen = _fallbacks_seen.get()
+    if seen is not None:
+        seen.append(stage)
+
+
+@contextmanager
+def watch_fallbacks() -> Iterator[List[str]]:
+    """
+    Collect the fallbacks recorded inside the with block.
+
+    Tasks and asyncio.to_thread calls started in the block share the list, so
+    a request handler can tell whether any part of its result came from a
+    basic generator.
+
+    Yields:
+        list: Stage names, one per fallback, filled in as they happen
+    """
+    token = _fallbacks_seen.set([])
+    try:
+        yield _fallbacks_seen.get()
+    finally:
+        _fallbacks_seen.reset(token)
+
+
+def record_parse_failure(template: str) -> None:
+    """Count a model response that did not contain valid JSON"""
+    PARSE_FAILURES.inc(template=template)
+
+
+def record_tokens(template: Optional[str], prompt: str, response: Any = None, response_text: str = None) -> None:
+    """
+    Count the tokens of one model call.
+
+    Args:
+        template (str): Prompt template the prompt was rendered from ('category/name')
+        prompt (str): The prompt sent
+        response: The model response, whose usage metadata is used when present
+        response_text (str, optional): The generated text, for streamed calls
+    """
+    template = template or 'unknown'
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    output_tokens = getattr(usage, 'candidates_token_count', None)
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(prompt)
+    if output_tokens is None:
+        if response_text is None:
+            try:
+                response_text = getattr(response, 'text', '') or ''
+            except ValueError:
+                # The SDK raises for responses without text (blocked by safety filters)
+                response_text = ''
+        output_tokens = estimate_tokens(response_text)
+    LLM_TOKENS.inc(prompt_tokens, template=template, direction='input')
+    LLM_TOKENS.inc(output_tokens, template=template, direction='output')
+
+
+def _collected() -> List[str]:
+    """Counters kept by the LLM client, the coalescing layer and the cache"""
+    from src.ai_model import get_client, get_single_flight
+    from src.llm_cache import get_cache
+
+    client = get_client().stats()
+    flights = get_single_flight().stats()
+    cache = get_cache().stats()
+
+    def family(name: str, kind: str, documentation: str, samples: List[Tuple[str, float]]) -> List[str]:
+        lines = [f'# HELP {PREFIX}_{name} {documentation}', f'# TYPE {PREFIX}_{name} {kind}']
+        lines += [f'{PREFIX}_{name}{labels} {value}' for labels, value in samples]
+        return lines
+
+    return (
+        family('llm_calls_total', 'counter', 'Model calls by outcome',
+               [(f'{{outcome="{outcome}"}}', client[key]) for outcome, key in
+                (('success', 'successes'), ('failure', 'failures'), ('timeout', 'timeouts'),
+                 ('circuit_open', 'rejected'))])
+        + family('llm_attempts_total', 'counter', 'Model call attempts, including retries', [('', client['attempts'])])
+        + family('llm_retries_total', 'counter', 'Model call retries', [('', client['retries'])])
+        + family('llm_rate_limited_seconds_total', 'counter', 'Time spent waiting for the rate limiter',
+                 [('', client['rate_limited_seconds'])])
+        + family('llm_coalesced_total', 'counter', 'Model calls answered by an identical in-flight call',
+                 [('', flights['coalesced'])])
+        + family('llm_in_flight', 'gauge', 'Distinct model calls in flight', [('', flights['in_flight'])])
+        + family('llm_cache_requests_total', 'counter', 'Result cache lookups by result',
+                 [('{result="memory_hit"}', cache['memory_hits']), ('{result="disk_hit"}', cache['disk_hits']),
+                  ('{result="miss"}', cache['misses'])])
+        + family('llm_cache_evictions_total', 'counter', 'Result cache entries evicted or expired',
+                 [('{reason="lru"}', cache['evictions']), ('{reason="expired"}', cache['expired'])])
+    )
+
+
+def render_metrics() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Returns:
+        str: The body for a /metrics response
+    """
+    lines = []
+    for metric in _METRICS:
+        lines += metric.render()
+    lines += _collected()
+    return '\n'.join(lines) + '\n'
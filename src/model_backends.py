@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Pluggable model backends.
+
+Every backend exposes the same small surface as the Gemini SDK model that the
+rest of the application was written against: generate_content(prompt) returns
+an object with a `text` attribute, and generate_content(prompt, stream=True)
+returns an iterable of such chunks. The backend is selected with LLM_BACKEND:
+
+- gemini: google.generativeai (needs GEMINI_API_KEY)
+- http:   a local server speaking the Gemini REST generateContent protocol
+- stub:   a deterministic in-process model with configurable latency and
+          canned responses, for offline load testing
+"""
+import re
+import abc
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import (GEMINI_API_KEY, GEMINI_MODEL, LLM_BACKEND, LLM_CALL_TIMEOUT_SECONDS, LLM_HTTP_BASE_URL,
+                    LLM_HTTP_API_KEY, LLM_STUB_LATENCY_SECONDS, LLM_STUB_RESPONSES_PATH)
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('gemini', 'http', 'stub')
+
+
+class ModelResponse:
+    """Minimal response object with the `text` attribute callers read."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __repr__(self):
+        return f"ModelResponse({self.text[:40]!r})"
+
+
+class ModelBackend(abc.ABC):
+    """Interface implemented by every backend."""
+
+    name = 'base'
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abc.abstractmethod
+    def generate_content(self, prompt: str, stream: bool = False):
+        """
+        Generate a response for prompt.
+
+        Args:
+            prompt (str): The prompt to send to the model
+            stream (bool): Return an iterable of chunks instead of one response
+
+        Returns:
+            ModelResponse, or an iterable of ModelResponse chunks when streaming
+        """
+
+
+class GeminiBackend(ModelBackend):
+    """
+    google.generativeai, configured with GEMINI_API_KEY.
+
+    Every request carries the call deadline, so a hung call gives its worker
+    thread back instead of outliving the client's timeout.
+    """
+
+    name = 'gemini'
+
+    def __init__(self, model_name: str, api_key: str, timeout: float = LLM_CALL_TIMEOUT_SECONDS):
+        super().__init__(model_name)
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+        self.timeout = timeout
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        """Delegate to the SDK model"""
+        return self._model.generate_content(prompt, stream=stream, request_options={'timeout': self.timeout})
+
+
+class HTTPBackend(ModelBackend):
+    """
+    Client for a server speaking the Gemini REST protocol:
+    POST {base_url}/v1beta/models/{model}:generateContent and
+    :streamGenerateContent?alt=sse.
+
+    Pointed at a local stand-in (see benchmarks/stub_model_server.py) this
+    exercises the full network path without an API key. The Gemini key is
+    never sent to it; LLM_HTTP_API_KEY, if set, goes in x-goog-api-key. HTTP
+    errors are raised as urllib.error.HTTPError, whose `code` drives the
+    client's retry policy.
+    """
+
+    name = 'http'
+
+    def __init__(self, model_name: str, base_url: str, api_key: Optional[str] = None,
+                 timeout: float = LLM_CALL_TIMEOUT_SECONDS):
+        super().__init__(model_name)
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        """POST the prompt and return the response text, or its SSE chunks when streaming"""
+        method = 'streamGenerateContent?alt=sse' if stream else 'generateContent'
+        response = self._post(f"{self.base_url}/v1beta/models/{self.model_name}:{method}", {
+            'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]
+        })
+        if stream:
+            return self._read_events(response)
+        with response:
+            return ModelResponse(self._text_of(json.loads(response.read().decode('utf-8'))))
+
+    def _post(self, url: str, payload: Dict[str, Any]):
+        """Send a JSON POST, turning connection failures into ConnectionError"""
+        # Imported here so that startup doesn't pay for http.client and ssl
+        import urllib.error
+        import urllib.request
+
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['x-goog-api-key'] = self.api_key
+        request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), headers=headers)
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError:
+            raise
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"Could not reach model server at {url}: {e.reason}") from e
+
+    def _read_events(self, response) -> Iterator[ModelResponse]:
+        """Yield one chunk per `data:` line of an SSE response"""
+        with response:
+            for raw_line in response:
+                line = raw_line.decode('utf-8').strip()
+                if line.startswith('data:'):
+                    yield ModelResponse(self._text_of(json.loads(line[5:])))
+
+    @staticmethod
+    def _text_of(body: Dict[str, Any]) -> str:
+        """Concatenate the text parts of the first candidate"""
+        candidates = body.get('candidates') or [{}]
+        parts = (candidates[0].get('content') or {}).get('parts') or []
+        return ''.join(part.get('text', '') for part in parts)
+
+
+class StubBackend(ModelBackend):
+    """
+    Deterministic in-process model for load tests.
+
+    The same prompt always gets the same response after `latency` seconds.
+    Canned responses are matched by substring of the prompt, in order; prompts
+    nothing matches get a well-formed built-in response for the prompt type, so
+    the whole pipeline runs end to end (the parse prompt is answered by the
+    regex parser, the code prompt with one file per class).
+    """
+
+    name = 'stub'
+
+    def __init__(self, model_name: str, latency: float = 0.0, responses: Optional[Dict[str, str]] = None,
+                 chunk_size: int = 64):
+        super().__init__(model_name)
+        self.latency = latency
+        self.responses = responses or {}
+        self.chunk_size = max(1, chunk_size)
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        """Sleep for the configured latency and return the canned or built-in response"""
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.respond(prompt)
+        if stream:
+            return [ModelResponse(text[i:i + self.chunk_size]) for i in range(0, len(text), self.chunk_size)]
+        return ModelResponse(text)
+
+    def respond(self, prompt: str) -> str:
+        """Pick the response text for prompt"""
+        for match, text in self.responses.items():
+            if match in prompt:
+                return text
+
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+        if prompt.startswith('Please analyze the following software specification'):
+            return _stub_parsed_spec(prompt)
+        if prompt.startswith('Generate Python code for a project'):
+            return _stub_project_files(prompt, digest)
+        if prompt.startswith('Generate the '):
+            return f"```python\n# Generated by the stub backend ({digest})\n```"
+        if 'Mermaid class diagram' in prompt:
+            return f"```mermaid\nclassDiagram\n    class Stub_{digest}\n```"
+        if 'Mermaid architecture diagram' in prompt:
+            return f"```mermaid\nflowchart TD\n    Client --> Stub_{digest}\n```"
+        if 'Mermaid sequence diagram' in prompt:
+            return f"```mermaid\nsequenceDiagram\n    User->>Stub_{digest}: request\n```"
+        return f"Stub response {digest}"
+
+
+def _stub_parsed_spec(prompt: str) -> str:
+    """Answer the parse prompt with what the regex parser finds in the embedded markdown"""
+    from src.markdown_parser import parse_with_regex
+
+    match = re.search(r'Markdown Specification:\n```\n(.*)\n```\n\nExtract the following', prompt, re.DOTALL)
+    spec = parse_with_regex(match.group(1) if match else '')
+    return f"```json\n{json.dumps(spec)}\n```"
+
+
+def _stub_project_files(prompt: str, digest: str) -> str:
+    """Answer the code prompt with one placeholder module per class in the embedded spec"""
+    files = {'main.py': f"# Generated by the stub backend ({digest})\n"}
+    match = re.search(r'Specification:\n(.*?)\n\nDiagrams:', prompt, re.DOTALL)
+    try:
+        classes = json.loads(match.group(1)).get('classes', []) if match else []
+    except ValueError:
+        classes = []
+    for cls in classes:
+        name = cls.get('name', 'Stub')
+        files[f"{name.lower()}.py"] = f"class {name}:\n    pass\n"
+    return f"```json\n{json.dumps(files)}\n```"
+
+
+def _load_stub_responses(path: Optional[str]) -> Dict[str, str]:
+    """Read canned responses from a JSON object mapping prompt substrings to response text"""
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        responses = json.load(file)
+    if not isinstance(responses, dict):
+        raise ValueError(f"Stub responses file {path} must contain a JSON object")
+    return responses
+
+
+def create_backend(name: str = LLM_BACKEND) -> Optional[ModelBackend]:
+    """
+    Build the configured backend.
+
+    Args:
+        name (str): One of BACKENDS
+
+    Returns:
+        ModelBackend, or None when the Gemini backend has no API key
+
+    Raises:
+        ValueError: If name is not a known backend
+    """
+    if name == 'gemini':
+        if not GEMINI_API_KEY:
+            return None
+        return GeminiBackend(GEMINI_MODEL, GEMINI_API_KEY)
+    if name == 'http':
+        return HTTPBackend(GEMINI_MODEL, LLM_HTTP_BASE_URL, api_key=LLM_HTTP_API_KEY)
+    if name == 'stub':
+        return StubBackend(GEMINI_MODEL, latency=LLM_STUB_LATENCY_SECONDS,
+                           responses=_load_stub_responses(LLM_STUB_RESPONSES_PATH))
+    raise ValueError(f"Unknown LLM backend {name!r}; expected one of {', '.join(BACKENDS)}")
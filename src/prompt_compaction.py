@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Compact, token-budgeted serialization of spec data for LLM prompts.
+
+Each prompt only receives the fields it needs, rendered as minified JSON with
+attributes, methods, connections and flow steps collapsed into one-line
+signatures, and with null and empty values dropped. When the result would
+still exceed the token budget, descriptions and comments are dropped first and
+then the least relevant items are left out.
+"""
+import json
+import re
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import PROMPT_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio for English text and JSON
+CHARS_PER_TOKEN = 4
+
+_EMPTY = (None, '', [], {})
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text without calling the model"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def prune(value: Any) -> Any:
+    """
+    Recursively drop None, empty strings, empty lists and empty dicts.
+
+    Args:
+        value: Any JSON-serializable structure
+
+    Returns:
+        The same structure without empty values
+    """
+    if isinstance(value, dict):
+        pruned = {key: prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in _EMPTY}
+    if isinstance(value, list):
+        return [item for item in (prune(item) for item in value) if item not in _EMPTY]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def to_compact_json(value: Any) -> str:
+    """Serialize value as minified JSON after pruning empty values"""
+    return json.dumps(prune(value), separators=(',', ':'), ensure_ascii=False)
+
+
+def compact_class(cls: Dict[str, Any], detail: bool = True) -> Dict[str, Any]:
+    """
+    Collapse a class into name plus one-line attribute and method signatures.
+
+    Args:
+        cls (dict): Class entry from the parsed spec
+        detail (bool): Keep descriptions and // comments
+
+    Returns:
+        dict: Compact class entry
+    """
+    attributes = []
+    for attribute in cls.get('attributes', []):
+        if not isinstance(attribute, dict):
+            attributes.append(str(attribute))
+            continue
+        text = f"{attribute.get('name', '')}: {attribute.get('type') or 'Any'}"
+        if attribute.get('default') not in (None, ''):
+            text += f" = {attribute['default']}"
+        attributes.append(_with_comment(text, attribute.get('comment'), detail))
+
+    methods = []
+    for method in cls.get('methods', []):
+        if not isinstance(method, dict):
+            methods.append(str(method))
+            continue
+        params = ', '.join(
+            f"{param.get('name', '')}: {param.get('type') or 'Any'}" if isinstance(param, dict) else str(param)
+            for param in method.get('parameters', [])
+        )
+        text = f"{method.get('name', '')}({params}) -> {method.get('return_type') or 'None'}"
+        methods.append(_with_comment(text, method.get('comment'), detail))
+
+    return prune({
+        'name': cls.get('name', ''),
+        'description': cls.get('description') if detail else None,
+        'attributes': attributes,
+        'methods': methods,
+    })
+
+
+def compact_component(component: Dict[str, Any], detail: bool = True) -> Dict[str, Any]:
+    """Keep a component's name, plus description and responsibilities when detail is set"""
+    return prune({
+        'name': component.get('name', ''),
+        'description': component.get('description') if detail else None,
+        'responsibilities': component.get('responsibilities') if detail else None,
+    })
+
+
+def compact_connection(connection: Dict[str, Any]) -> str:
+    """Render a connection as 'Source -> Target: description'"""
+    text = f"{connection.get('source', '')} -> {connection.get('target', '')}"
+    return f"{text}: {connection['description']}" if connection.get('description') else text
+
+
+def compact_flow_step(step: Dict[str, Any]) -> str:
+    """Render a flow step as 'N. Actor -> Action: message', the markdown format it was parsed from"""
+    if not isinstance(step, dict):
+        return str(step)
+    text = f"{step.get('step', '')}. {step.get('actor', '')}"
+    if step.get('action'):
+        text += f" -> {step['action']}"
+    if step.get('message'):
+        text += f": {step['message']}"
+    return text
+
+
+def compact_use_case(use_case: Dict[str, Any], detail: bool = True) -> Dict[str, Any]:
+    """Collapse a use case, keeping only its ID and name when detail is off"""
+    if not detail:
+        return prune({'id': use_case.get('id', ''), 'name': use_case.get('name', '')})
+    return prune({
+        'id': use_case.get('id', ''),
+        'name': use_case.get('name', ''),
+        'description': use_case.get('description', ''),
+        'actors': use_case.get('actors', []),
+        'preconditions': use_case.get('preconditions', []),
+        'flow': [compact_flow_step(step) for step in use_case.get('flow', [])],
+        'postconditions': use_case.get('postconditions', []),
+    })
+
+
+def select_by_relevance(items: List[Any], scores: List[float], budget: int) -> Tuple[List[Any], int]:
+    """
+    Keep the highest-scoring items whose serialized size fits within budget.
+
+    Args:
+        items (list): Compact items
+        scores (list): Relevance score of each item, higher is kept first
+        budget (int): Token budget for all kept items together
+
+    Returns:
+        tuple: (kept items in their original order, number of items left out)
+    """
+    order = sorted(range(len(items)), key=lambda i: -scores[i])
+    kept = set()
+    used = 0
+    for i in order:
+        cost = estimate_tokens(to_compact_json(items[i])) + 1
+        if used + cost <= budget:
+            kept.add(i)
+            used += cost
+    return [items[i] for i in sorted(kept)], len(items) - len(kept)
+
+
+def class_diagram_payload(spec: Dict[str, Any], budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the class diagram prompt input.
+
+    Classes referenced by more of the other classes are kept first when trimming.
+
+    Args:
+        spec (dict): Parsed specification
+        budget (int): Token budget, defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        dict: {title, classes[, omitted_classes]}
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    classes = [cls for cls in spec.get('classes', []) if isinstance(cls, dict)]
+
+    for detail in (True, False):
+        payload = prune({'title': spec.get('title', ''),
+                         'classes': [compact_class(cls, detail) for cls in classes]})
+        if estimate_tokens(to_compact_json(payload)) <= budget:
+            return payload
+
+    items = payload.pop('classes', [])
+    return _trimmed(payload, 'classes', items, _reference_counts(items), budget)
+
+
+def architecture_diagram_payload(spec: Dict[str, Any], budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the architecture diagram prompt input.
+
+    Components with the most connections are kept first when trimming, and only
+    connections between kept components remain.
+
+    Args:
+        spec (dict): Parsed specification
+        budget (int): Token budget, defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        dict: {title, components, connections[, omitted_components]}
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    architecture = spec.get('architecture') or {}
+    components = [c for c in architecture.get('components', []) if isinstance(c, dict)]
+    connections = [c for c in architecture.get('connections', []) if isinstance(c, dict)]
+
+    for detail in (True, False):
+        payload = prune({'title': spec.get('title', ''),
+                         'components': [compact_component(c, detail) for c in components],
+                         'connections': [compact_connection(c) for c in connections]})
+        if estimate_tokens(to_compact_json(payload)) <= budget:
+            return payload
+
+    degree = {}
+    for connection in connections:
+        for end in (connection.get('source'), connection.get('target')):
+            degree[end] = degree.get(end, 0) + 1
+
+    # Connections are cheap, so give components roughly two thirds of the budget
+    items = payload.pop('components', [])
+    payload.pop('connections', None)
+    payload = _trimmed(payload, 'components', items, [degree.get(c.get('name'), 0) for c in items],
+                       budget * 2 // 3)
+    kept = {c.get('name') for c in payload.get('components', [])}
+    links = [compact_connection(c) for c in connections
+             if c.get('source') in kept and c.get('target') in kept]
+    remaining = budget - estimate_tokens(to_compact_json(payload))
+    payload['connections'], _ = select_by_relevance(links, [0] * len(links), max(remaining, 0))
+    return prune(payload)
+
+
+def sequence_diagram_payload(use_case: Dict[str, Any], spec: Dict[str, Any],
+                             budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the sequence diagram prompt input for one use case.
+
+    Only classes and components the use case mentions are sent in full, ranked
+    by how often they are mentioned; as many names of the others as fit are
+    listed so the model can still pick participants.
+
+    Args:
+        use_case (dict): The use case to diagram
+        spec (dict): Parsed specification
+        budget (int): Token budget, defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        dict: {use_case, classes, components[, other_classes, other_components]}
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    use_case_part = compact_use_case(use_case)
+    text = to_compact_json(use_case_part)
+
+    payload = {'use_case': use_case_part}
+    remaining = budget - estimate_tokens(text)
+    groups = (
+        ('classes', 'other_classes', compact_class, spec.get('classes', [])),
+        ('components', 'other_components', compact_component, (spec.get('architecture') or {}).get('components', [])),
+    )
+    for key, others_key, compact, entries in groups:
+        entries = [entry for entry in entries if isinstance(entry, dict) and entry.get('name')]
+        scores = [_mentions(entry['name'], text) for entry in entries]
+        relevant = [compact(entry) for entry, score in zip(entries, scores) if score]
+        kept, _ = select_by_relevance(relevant, [s for s in scores if s], max(remaining // 2, 0))
+        kept_names = {item['name'] for item in kept}
+        payload[key] = kept
+        remaining -= estimate_tokens(to_compact_json(kept))
+        others = [entry['name'] for entry in entries if entry['name'] not in kept_names]
+        payload[others_key], _ = select_by_relevance(others, [0] * len(others), max(remaining // 2, 0))
+        remaining -= estimate_tokens(to_compact_json(payload[others_key]))
+
+    return prune(payload)
+
+
+def code_generation_payload(spec: Dict[str, Any], diagrams: Dict[str, Any],
+                            budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the single-prompt code generation input.
+
+    Only the class and architecture diagrams are included. When trimming, use
+    cases shrink to ID and name before any class is left out, and classes used
+    by more of the others are kept first.
+
+    Args:
+        spec (dict): Parsed specification
+        diagrams (dict): Generated diagrams
+        budget (int): Token budget, defaults to PROMPT_TOKEN_BUDGET
+
+    Returns:
+        dict: {spec, diagrams}
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    diagrams = prune({'class': diagrams.get('class'), 'architecture': diagrams.get('architecture')})
+    budget -= estimate_tokens(to_compact_json(diagrams))
+
+    architecture = spec.get('architecture') or {}
+    for detail in (True, False):
+        compact_spec = prune({
+            'title': spec.get('title', ''),
+            'description': spec.get('description', ''),
+            'classes': [compact_class(c, detail) for c in spec.get('classes', []) if isinstance(c, dict)],
+            'components': [compact_component(c, detail) for c in architecture.get('components', [])
+                           if isinstance(c, dict)],
+            'connections': [compact_connection(c) for c in architecture.get('connections', [])
+                            if isinstance(c, dict)],
+            'use_cases': [compact_use_case(u, detail) for u in spec.get('use_cases', []) if isinstance(u, dict)],
+        })
+        if estimate_tokens(to_compact_json(compact_spec)) <= budget:
+            return {'spec': compact_spec, 'diagrams': diagrams}
+
+    # Fill what is left of the budget in priority order, classes first
+    title = {key: compact_spec[key] for key in ('title', 'description') if key in compact_spec}
+    remaining = budget - estimate_tokens(to_compact_json(title))
+    degree = {}
+    for connection in architecture.get('connections', []):
+        if isinstance(connection, dict):
+            for end in (connection.get('source'), connection.get('target')):
+                degree[end] = degree.get(end, 0) + 1
+
+    components = compact_spec.get('components', [])
+    sections = (
+        ('classes', _reference_counts(compact_spec.get('classes', [])), 0.6),
+        ('components', [degree.get(item.get('name'), 0) for item in components], 0.5),
+        ('connections', [0] * len(compact_spec.get('connections', [])), 0.5),
+        ('use_cases', [0] * len(compact_spec.get('use_cases', [])), 1.0),
+    )
+    trimmed = dict(title)
+    for key, scores, share in sections:
+        items = compact_spec.get(key, [])
+        kept, omitted = select_by_relevance(items, scores, int(max(remaining, 0) * share))
+        if omitted:
+            logger.info(f"Left {omitted} of {len(items)} {key} out of the prompt to fit a {budget}-token budget")
+            trimmed[f"omitted_{key}"] = omitted
+        trimmed[key] = kept
+        remaining -= estimate_tokens(to_compact_json(kept))
+    return {'spec': prune(trimmed), 'diagrams': diagrams}
+
+
+def _trimmed(payload: Dict[str, Any], key: str, items: List[Any], scores: List[float],
+             budget: int) -> Dict[str, Any]:
+    """Fit payload[key] into what is left of budget, recording how many items were left out"""
+    rest = {k: v for k, v in payload.items() if k != key}
+    kept, omitted = select_by_relevance(items, scores, max(budget - estimate_tokens(to_compact_json(rest)), 0))
+    if omitted:
+        logger.info(f"Left {omitted} of {len(items)} {key} out of the prompt to fit a {budget}-token budget")
+        rest[f"omitted_{key}"] = omitted
+    rest[key] = kept
+    return rest
+
+
+def _reference_counts(classes: List[Dict[str, Any]]) -> List[int]:
+    """
+    Count how often each class name appears as a word in the signatures of the
+    other classes, in a single pass over all of them
+    """
+    counts = Counter()
+    own = []
+    for cls in classes:
+        words = Counter(word.lower() for text in cls.get('attributes', []) + cls.get('methods', [])
+                        for word in _WORD_RE.findall(text))
+        counts.update(words)
+        own.append(words)
+    return [counts[cls.get('name', '').lower()] - words[cls.get('name', '').lower()] for cls, words in zip(classes, own)]
+
+
+def _with_comment(text: str, comment: Optional[str], detail: bool) -> str:
+    """Append a // comment to a signature when detail is on"""
+    return f"{text} // {comment}" if detail and comment else text
+
+
+def _mentions(name: str, text: str) -> int:
+    """Count whole-word, case-insensitive mentions of name in text"""
+    if not name:
+        return 0
+    return len(re.findall(rf'(?<!\w){re.escape(name)}(?!\w)', text, re.IGNORECASE))
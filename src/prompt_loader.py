@@ -4,16 +4,215 @@ Prompt Loader Module
 
 Este módulo se encarga de cargar los archivos de prompts desde la estructura
 de directorios y proporcionar una interfaz para acceder a ellos.
+
+Todas las plantillas se cargan una sola vez en memoria en un registro, se
+precompilan y se recargan automáticamente cuando cambia su fecha de
+modificación, sin reiniciar la aplicación.
 """
 import os
+import re
+import time
+import hashlib
 import logging
+import threading
 from pathlib import Path
 
+from config import PROMPTS_RELOAD_INTERVAL_SECONDS
+from src.tracing import span
+
 logger = logging.getLogger(__name__)
 
 # Ruta base para los prompts
 PROMPTS_DIR = Path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prompts'))
 
+# Solo {identificador} es un marcador de posición; cualquier otra llave es literal
+PLACEHOLDER_RE = re.compile(r'\{([A-Za-z_][A-Za-z0-9_]*)\}')
+
+# Campos con formato, atributos o índices que str.format aceptaba y el registro no
+_SUSPECT_RE = re.compile(r'\{\s*[A-Za-z_0-9][\w]*\s*(?:[!:.\[][^{}\n]*)?\}')
+
+
+class PromptTemplate:
+    """
+    Plantilla de prompt precompilada.
+    
+    El texto se divide una vez en fragmentos literales y marcadores, de modo que
+    renderizar solo une cadenas y las llaves de ejemplos JSON no necesitan escaparse.
+    """
+    
+    def __init__(self, category, name, text, mtime=None):
+        self.category = category
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        # Posiciones pares: texto literal; impares: nombres de marcadores
+        self.segments = PLACEHOLDER_RE.split(text)
+        self.placeholders = frozenset(self.segments[1::2])
+        self.version = hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+    
+    def render(self, **fields):
+        """
+        Rellena la plantilla con los valores dados.
+        
+        Args:
+            **fields: Valor de cada marcador de posición
+            
+        Returns:
+            str: Prompt final
+            
+        Raises:
+            ValueError: Si falta el valor de algún marcador
+        """
+        missing = self.placeholders - fields.keys()
+        if missing:
+            raise ValueError(f"Missing values for prompt {self.category}/{self.name}: {', '.join(sorted(missing))}")
+        
+        with span('prompt_format', prompt=f"{self.category}/{self.name}"):
+            parts = list(self.segments)
+            parts[1::2] = [str(fields[name]) for name in self.segments[1::2]]
+            return ''.join(parts)
+    
+    def validate(self):
+        """
+        Detecta marcadores mal formados que no serán reemplazados.
+        
+        Returns:
+            list: Fragmentos sospechosos, como {nombre!r} o {0}
+        """
+        return [match.group(0) for match in _SUSPECT_RE.finditer(self.text)
+                if not PLACEHOLDER_RE.fullmatch(match.group(0))]
+
+
+class PromptRegistry:
+    """Registro en memoria de todas las plantillas bajo un directorio de prompts."""
+    
+    def __init__(self, prompts_dir=PROMPTS_DIR, reload_interval=PROMPTS_RELOAD_INTERVAL_SECONDS):
+        self.prompts_dir = Path(prompts_dir)
+        self.reload_interval = reload_interval
+        self._templates = {}
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        with self._lock:
+            self._refresh()
+    
+    def get(self, category, prompt_name):
+        """
+        Obtiene una plantilla, recargándola antes si su archivo cambió.
+        
+        Args:
+            category (str): Categoría del prompt
+            prompt_name (str): Nombre del archivo de prompt sin extensión
+            
+        Returns:
+            PromptTemplate: La plantilla, o None si no existe
+        """
+        if self.reload_interval > 0 and time.monotonic() - self._last_check >= self.reload_interval:
+            with self._lock:
+                if time.monotonic() - self._last_check >= self.reload_interval:
+                    self._refresh()
+        return self._templates.get((category, prompt_name))
+    
+    def versions(self):
+        """
+        Devuelve la versión de cada plantilla cargada.
+        
+        Returns:
+            dict: {"categoria/nombre": hash}
+        """
+        return {f"{category}/{name}": template.version
+                for (category, name), template in sorted(self._templates.items())}
+    
+    def _refresh(self):
+        """Carga las plantillas nuevas o modificadas y olvida las eliminadas (con el lock tomado)"""
+        seen = set()
+        for path in self.prompts_dir.glob('*/*.txt'):
+            key = (path.parent.name, path.stem)
+            seen.add(key)
+            try:
+                mtime = path.stat().st_mtime_ns
+                current = self._templates.get(key)
+                if current is not None and current.mtime == mtime:
+                    continue
+                
+                with open(path, 'r', encoding='utf-8') as file:
+                    template = PromptTemplate(key[0], key[1], file.read(), mtime)
+            except OSError as e:
+                logger.error(f"Error loading prompt {key[0]}/{key[1]}: {e}")
+                continue
+            
+            for fragment in template.validate():
+                logger.warning(f"Prompt {key[0]}/{key[1]} has a malformed placeholder {fragment} that will not be filled")
+            
+            if current is None:
+                logger.debug(f"Loaded prompt: {key[0]}/{key[1]} ({template.version})")
+            else:
+                logger.info(f"Reloaded prompt: {key[0]}/{key[1]} ({current.version} -> {template.version})")
+            self._templates = {**self._templates, key: template}
+        
+        removed = self._templates.keys() - seen
+        if removed:
+            logger.info(f"Removed prompts: {', '.join('/'.join(key) for key in sorted(removed))}")
+            self._templates = {key: template for key, template in self._templates.items() if key in seen}
+        
+        self._last_check = time.monotonic()
+
+
+# Registro compartido
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_prompt_registry():
+    """
+    Obtiene el registro de prompts compartido, cargándolo la primera vez.
+    
+    Returns:
+        PromptRegistry: El registro del proceso
+    """
+    global _registry
+    
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PromptRegistry()
+    return _registry
+
+def get_prompt_template(category, prompt_name):
+    """
+    Obtiene la plantilla precompilada de un prompt.
+    
+    Args:
+        category (str): Categoría del prompt (markdown_parser, diagram_generator, etc.)
+        prompt_name (str): Nombre del archivo de prompt sin extensión
+        
+    Returns:
+        PromptTemplate: La plantilla, o None si no existe
+    """
+    with span('load_prompt', prompt=f"{category}/{prompt_name}"):
+        template = get_prompt_registry().get(category, prompt_name)
+    if template is None:
+        logger.error(f"Prompt file not found: {get_prompt_path(category, prompt_name)}")
+    return template
+
+def render_prompt(category, prompt_name, **fields):
+    """
+    Rellena un prompt con los datos dados.
+    
+    Args:
+        category (str): Categoría del prompt
+        prompt_name (str): Nombre del archivo de prompt sin extensión
+        **fields: Valor de cada marcador de posición
+        
+    Returns:
+        str: Prompt final, o None si el prompt no existe
+        
+    Raises:
+        ValueError: Si falta el valor de algún marcador
+    """
+    template = get_prompt_template(category, prompt_name)
+    if template is None:
+        return None
+    return template.render(**fields)
+
 def load_prompt(category, prompt_name):
     """
     Carga un prompt desde su archivo correspondiente.
@@ -25,21 +224,8 @@ def load_prompt(category, prompt_name):
     Returns:
         str: Contenido del archivo de prompt
     """
-    prompt_path = PROMPTS_DIR / category / f"{prompt_name}.txt"
-    
-    try:
-        if not prompt_path.exists():
-            logger.error(f"Prompt file not found: {prompt_path}")
-            return None
-            
-        with open(prompt_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            
-        logger.debug(f"Loaded prompt: {category}/{prompt_name}")
-        return content
-    except Exception as e:
-        logger.error(f"Error loading prompt {category}/{prompt_name}: {e}")
-        return None
+    template = get_prompt_template(category, prompt_name)
+    return template.text if template is not None else None
 
 def get_prompt_path(category, prompt_name):
     """
@@ -52,4 +238,21 @@ def get_prompt_path(category, prompt_name):
     Returns:
         Path: Ruta al archivo de prompt
     """
-    return PROMPTS_DIR / category / f"{prompt_name}.txt" 
\ No newline at end of file
+    return PROMPTS_DIR / category / f"{prompt_name}.txt" 
+
+def get_prompt_version(category, prompt_name):
+    """
+    Calcula una versión corta del prompt a partir del hash de su contenido.
+    
+    Cualquier edición del archivo cambia la versión, lo que invalida los
+    resultados cacheados generados con la versión anterior.
+    
+    Args:
+        category (str): Categoría del prompt
+        prompt_name (str): Nombre del archivo de prompt sin extensión
+        
+    Returns:
+        str: Hash hexadecimal del contenido, o None si no se pudo cargar
+    """
+    template = get_prompt_template(category, prompt_name)
+    return template.version if template is not None else None
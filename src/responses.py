@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Response classes for large payloads.
+
+Starlette's JSONResponse serializes with the standard library. FastJSONResponse
+uses orjson when it is installed, which encodes the multi-MB diagram and code
+responses several times faster, and produces the same compact JSON with the
+standard library otherwise.
+
+UploadStreamingResponse streams a response while the request body is still
+being read.
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from models.spec import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serialized with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves receive() to the handler.
+
+    Before ASGI 2.4 StreamingResponse listens for the client disconnecting by
+    calling receive() itself, which swallows any request body the handler has
+    not read yet. A handler that streams its answer to an upload reads the
+    body (and notices a disconnect) on its own, so only the sending half runs.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
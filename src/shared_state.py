@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+State shared between worker processes.
+
+With several server workers each process has its own model client, so the
+rate-limit budget has to live outside the process for all of them together to
+stay within the API quota. SHARED_STATE_BACKEND selects where:
+
+- memory: per-process (single worker)
+- sqlite: a WAL-mode SQLite file on local disk, shared by every worker on the box
+- redis:  a Redis server, e.g. a local stand-in (needs the optional `redis` package)
+
+All limiters offer the same reserve() method as TokenBucket.
+"""
+import os
+import time
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable
+
+from src.llm_client import TokenBucket
+from config import SHARED_STATE_BACKEND, SHARED_STATE_PATH, SHARED_STATE_REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteTokenBucket:
+    """Token bucket whose state lives in a SQLite file shared by several processes."""
+
+    def __init__(self, path: str, name: str, rate_per_second: float, burst: int,
+                 clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.name = name
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self._clock = clock
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the store, reopening it in a forked worker"""
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS buckets ("
+                               "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def reserve(self) -> float:
+        """
+        Take one token from the shared bucket, going into debt if it is empty.
+
+        Returns:
+            float: Seconds the caller must wait before sending its request
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            try:
+                conn = self._connect()
+                # BEGIN IMMEDIATE takes the write lock up front, so the
+                # read-modify-write is atomic across processes
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = self._clock()
+                    row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                    tokens, updated = row if row else (self.capacity, now)
+                    tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate) - 1
+                    conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                                 (self.name, tokens, now))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                # Never block model calls on the limiter's own storage
+                logger.error(f"Error updating shared rate limiter: {e}")
+                return 0.0
+
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+
+class RedisTokenBucket:
+    """Token bucket kept in Redis and updated atomically with a Lua script."""
+
+    SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+local updated = tonumber(redis.call('HGET', KEYS[1], 'updated'))
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+if tokens == nil then
+    tokens = capacity
+    updated = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(tokens)
+"""
+
+    def __init__(self, url: str, name: str, rate_per_second: float, burst: int,
+                 clock: Callable[[], float] = time.time):
+        import redis
+
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self.key = f"ai-swe:rate-limit:{name}"
+        self._clock = clock
+        self._script = redis.Redis.from_url(url).register_script(self.SCRIPT)
+
+    def reserve(self) -> float:
+        """
+        Take one token from the shared bucket, going into debt if it is empty.
+
+        Returns:
+            float: Seconds the caller must wait before sending its request
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        try:
+            tokens = float(self._script(keys=[self.key], args=[self._clock(), self.rate, self.capacity]))
+        except Exception as e:
+            logger.error(f"Error updating shared rate limiter: {e}")
+            return 0.0
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+
+def create_rate_limiter(rate_per_second: float, burst: int, name: str = 'llm',
+                        backend: str = SHARED_STATE_BACKEND):
+    """
+    Build the rate limiter for the configured shared-state backend.
+
+    Falls back to a per-process bucket if the redis package is not installed.
+
+    Args:
+        rate_per_second (float): Sustained request rate for all workers together
+        burst (int): Requests that may be sent back to back
+        name (str): Bucket name, so several limits can share a store
+        backend (str): 'memory', 'sqlite' or 'redis'
+
+    Returns:
+        An object with a reserve() method returning seconds to wait
+
+    Raises:
+        ValueError: If backend is not a known shared-state backend
+    """
+    if backend == 'memory':
+        return TokenBucket(rate_per_second, burst)
+    if backend == 'sqlite':
+        return SQLiteTokenBucket(SHARED_STATE_PATH, name, rate_per_second, burst)
+    if backend == 'redis':
+        try:
+            return RedisTokenBucket(SHARED_STATE_REDIS_URL, name, rate_per_second, burst)
+        except ImportError:
+            logger.warning("redis package not installed. Using a per-process rate limiter.")
+            return TokenBucket(rate_per_second, burst)
+    raise ValueError(f"Unknown shared state backend {backend!r}; expected 'memory', 'sqlite' or 'redis'")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing of identical in-flight calls.
+
+While a call for a key is running, further callers with the same key wait for
+it and receive the same result (or exception) instead of starting their own.
+Once the call finishes the key is forgotten, so this only removes duplicate
+concurrent work; repeated work over time is the job of the LLM cache.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """A blocking call in flight, shared by every waiter on its key."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+
+    Blocking callers (threads) and coroutines are tracked separately, and
+    coroutines are only shared within the event loop that started them.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Any, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn unless a call with the same key is already running, in which
+        case wait for that call and return its result.
+
+        Args:
+            key: Identifies calls that are interchangeable
+            fn: The blocking call to make
+
+        Returns:
+            The result of fn, shared by every concurrent caller with the key
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['calls'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async variant of do.
+
+        The call runs as its own task, so a waiter that is cancelled (a client
+        disconnecting, a timeout) does not cancel it for the others.
+
+        Args:
+            key: Identifies calls that are interchangeable
+            fn: Coroutine function making the call
+
+        Returns:
+            The result of fn, shared by every concurrent caller with the key
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = loop.create_task(fn())
+                task.add_done_callback(lambda _: self._forget(task_key))
+                self._stats['calls'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, task_key: Any) -> None:
+        """Drop a finished task so the next call with its key runs again"""
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many calls ran and how many were served by another caller's call"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls) + len(self._tasks)
+            return stats
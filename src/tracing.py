@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-request tracing, disabled unless REQUEST_TRACING_ENABLED is set.
+
+While a request is traced, every span it opens (request decoding, parsing,
+each diagram, prompt loading and formatting, model calls, response extraction,
+serialization) is recorded on a Trace held in a context variable. Tasks and
+asyncio.to_thread calls started by the request inherit the context, so their
+spans land in the same trace; loop.run_in_executor does not copy it, so work
+submitted that way (the model calls themselves) is only visible through the
+span awaiting it. Finished traces are written as Chrome trace files (open them
+in chrome://tracing or https://ui.perfetto.dev), optionally with a cProfile
+and a tracemalloc summary, keeping the newest TRACE_MAX_FILES. When no trace
+is active, span() costs one context variable lookup.
+"""
+import io
+import json
+import time
+import uuid
+import pstats
+import asyncio
+import cProfile
+import logging
+import threading
+import contextvars
+import tracemalloc
+from pathlib import Path
+from urllib.parse import parse_qs
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from config import REQUEST_TRACING_ENABLED, TRACE_DIR, TRACE_MAX_FILES
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+# cProfile and tracemalloc are process-wide, so only one request may use each at a time
+_profiler_lock = threading.Lock()
+_tracemalloc_lock = threading.Lock()
+
+
+class Trace:
+    """Spans recorded for one request."""
+
+    def __init__(self, name: str, profile: bool = False, memory: bool = False, directory: str = TRACE_DIR):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.wall_started))
+        self.path = Path(directory) / f'{stamp}-{self.trace_id}.json'
+        self.spans: List[Dict[str, Any]] = []
+        self.notes: Dict[str, Any] = {}
+        self._lanes: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._memory = False
+
+        if profile:
+            if _profiler_lock.acquire(blocking=False):
+                # Profiles the whole event loop thread, including other requests in flight
+                self._profiler = cProfile.Profile()
+                try:
+                    self._profiler.enable()
+                except ValueError as e:
+                    # Another profiler (a debugger, say) is already attached
+                    self._profiler = None
+                    _profiler_lock.release()
+                    self.notes['profile'] = f'skipped: {e}'
+            else:
+                self.notes['profile'] = 'skipped: another request is being profiled'
+        if memory:
+            if not tracemalloc.is_tracing() and _tracemalloc_lock.acquire(blocking=False):
+                tracemalloc.start()
+                self._memory = True
+            else:
+                self.notes['memory'] = 'skipped: tracemalloc is already in use'
+
+    def _lane(self) -> int:
+        """A stable small number for the current task or thread, used as the trace's tid"""
+        try:
+            owner = asyncio.current_task()
+        except RuntimeError:
+            owner = None
+        if owner is None:
+            owner = threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(owner, len(self._lanes) + 1)
+
+    def add(self, name: str, start: float, end: float, args: Optional[Dict[str, Any]] = None) -> None:
+        """Record a finished span; start and end are time.perf_counter() values"""
+        span = {'name': name, 'start': start - self.started, 'duration': end - start, 'lane': self._lane()}
+        if args:
+            span['args'] = args
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self) -> None:
+        """Stop the profilers and keep their summaries"""
+        if self._profiler is not None:
+            self._profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(self._profiler, stream=output).sort_stats('cumulative').print_stats(40)
+            self.notes['profile'] = output.getvalue()
+            self._profiler = None
+            _profiler_lock.release()
+        if self._memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._memory = False
+            _tracemalloc_lock.release()
+            self.notes['memory'] = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top_allocations': [str(stat) for stat in snapshot.statistics('lineno')[:20]],
+            }
+
+    def totals(self) -> Dict[str, float]:
+        """Total seconds per span name, in first-seen order"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span['name']] = totals.get(span['name'], 0.0) + span['duration']
+        return totals
+
+    def server_timing(self) -> str:
+        """Summarize the spans as a Server-Timing header value (milliseconds)"""
+        return ', '.join(f"{name.replace(' ', '_')};dur={seconds * 1000:.1f}"
+                         for name, seconds in self.totals().items())
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Render the trace in the Chrome trace event format"""
+        events = [{'name': span['name'], 'ph': 'X', 'pid': 1, 'tid': span['lane'],
+                   'ts': round(span['start'] * 1e6, 1), 'dur': round(span['duration'] * 1e6, 1),
+                   'args': span.get('args', {})}
+                  for span in self.spans]
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'trace_id': self.trace_id, 'name': self.name, 'started': self.wall_started,
+                          **self.notes},
+        }
+
+    def write(self, max_files: int = TRACE_MAX_FILES) -> Path:
+        """Write the Chrome trace file, delete all but the newest max_files, and return its path"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.to_chrome_trace()), encoding='utf-8')
+        # File names start with a timestamp, so they sort oldest first
+        for old in sorted(self.path.parent.glob('*.json'))[:-max(1, max_files)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+        return self.path
+
+
+@contextmanager
+def trace_request(name: str, profile: bool = False, memory: bool = False) -> Iterator[Trace]:
+    """
+    Trace everything run inside the with block.
+
+    Args:
+        name (str): What is being traced, e.g. "POST /api/generate-diagrams"
+        profile (bool): Also run cProfile for the duration
+        memory (bool): Also record allocations with tracemalloc
+
+    Yields:
+        Trace: The trace, finished (profilers stopped) when the block exits
+    """
+    trace = Trace(name, profile=profile, memory=memory)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.add('request', start, time.perf_counter())
+        _current_trace.reset(token)
+        trace.finish()
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[None]:
+    """
+    Record the with block as a span of the current trace, if any.
+
+    Args:
+        name (str): Span name
+        **args: Extra details shown with the span in the trace viewer
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter(), args)
+
+
+def requested_trace_options(scope: Dict[str, Any]) -> Optional[Set[str]]:
+    """
+    Read the tracing options of an ASGI HTTP request.
+
+    Tracing is requested with an `X-Trace` header or a `trace` query parameter
+    holding a comma-separated list of options: any value other than 0/false/off
+    turns it on, `profile` adds cProfile and `memory` adds tracemalloc.
+
+    Returns:
+        set: The lower-cased options, or None if the request is not traced
+    """
+    value = None
+    for name, header_value in scope.get('headers', ()):
+        if name == b'x-trace':
+            value = header_value.decode('latin-1')
+            break
+    if value is None:
+        values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('trace')
+        value = values[0] if values else None
+    if not value or value.strip().lower() in ('0', 'false', 'off'):
+        return None
+    return {option.strip().lower() for option in value.split(',')}
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware tracing the requests that ask for it.
+
+    The response carries X-Trace-Id (the Chrome trace is written to TRACE_DIR
+    under that ID once the request completes) and a Server-Timing header with
+    the total per span name. For streamed responses, Server-Timing only covers
+    what ran before the first byte; the trace file has everything.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        options = requested_trace_options(scope) if scope['type'] == 'http' and REQUEST_TRACING_ENABLED else None
+        if options is None:
+            await self.app(scope, receive, send)
+            return
+
+        name = f"{scope.get('method', '')} {scope.get('path', '')}"
+        with trace_request(name, profile='profile' in options, memory='memory' in options) as trace:
+            async def send_with_trace_headers(message):
+                if message['type'] == 'http.response.start':
+                    headers = list(message.get('headers', []))
+                    headers += [(b'x-trace-id', trace.trace_id.encode()),
+                                (b'server-timing', trace.server_timing().encode())]
+                    message = {**message, 'headers': headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_headers)
+
+        try:
+            await asyncio.to_thread(trace.write)
+            logger.info(f"Wrote trace of {name} to {trace.path}")
+        except OSError as e:
+            logger.error(f"Could not write trace {trace.trace_id}: {e}")
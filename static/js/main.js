@@ -2,8 +2,11 @@
 let currentMarkdown = '';
 let parsedSpec = null;
 let diagrams = null;
+let specId = null; // Server-side ID of the processed spec, sent instead of the spec itself
 let selectedUseCaseId = null;
+let sequenceDiagramRequests = {}; // Use case ID -> Promise resolving to Mermaid code
 let editor = null; // Toast UI Editor instance
+let conditionalResponses = {}; // URL -> { body, etag, data } of the last response with an ETag
 
 // Sample template to help users get started with a software specification
 const TEMPLATE_MARKDOWN = `# My Software Project
@@ -342,24 +345,8 @@ async function processMarkdown() {
         if (errorMessage) errorMessage.style.display = 'none';
         
         // Send markdown to the server for processing
-        const response = await fetch('/api/generate-diagrams', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ markdown: currentMarkdown })
-        });
-        
-        if (!response.ok) {
-            throw new Error(`Server responded with status: ${response.status}`);
-        }
-        
-        // Parse the response
-        const data = await response.json();
-        
-        // Store the diagrams and parsed spec
-        diagrams = data;
-        parsedSpec = data.parsed_spec;
+        await uploadSpec();
+        sequenceDiagramRequests = {};
         
         // Update the preview with success message
         const previewElement = document.getElementById('markdown-preview');
@@ -462,6 +449,11 @@ function loadUseCases() {
         return;
     }
     
+    // Fetch every sequence diagram in one batch request the first time
+    if (Object.keys(sequenceDiagramRequests).length === 0) {
+        prefetchSequenceDiagrams();
+    }
+    
     // Populate the dropdown with use cases
     parsedSpec.use_cases.forEach(useCase => {
         const option = document.createElement('option');
@@ -532,35 +524,35 @@ async function displaySelectedUseCase() {
         // Show loading indicator
         useCaseDiagramContainer.innerHTML = '<div class="text-center"><div class="spinner-border" role="status"><span class="visually-hidden">Loading...</span></div></div>';
         
-        // Request sequence diagram for this use case
-        const response = await fetch('/api/generate-sequence-diagram', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                use_case_id: selectedUseCaseId,
-                use_case_data: useCase,
-                parsed_spec: parsedSpec,
-                markdown: currentMarkdown
-            })
-        });
+        const useCaseId = selectedUseCaseId;
+        let mermaidCode = null;
         
-        if (!response.ok) {
-            throw new Error(`Server responded with status: ${response.status}`);
+        // Prefer the diagram from the batch request, if it was part of it
+        if (sequenceDiagramRequests[useCaseId]) {
+            try {
+                mermaidCode = await sequenceDiagramRequests[useCaseId];
+            } catch (error) {
+                console.warn(`Batch sequence diagram for ${useCaseId} failed, requesting it alone:`, error);
+                delete sequenceDiagramRequests[useCaseId];
+            }
+        }
+        
+        if (!mermaidCode) {
+            mermaidCode = await fetchSequenceDiagram(useCase);
         }
         
-        const data = await response.json();
+        // The user may have picked another use case while we were waiting
+        if (selectedUseCaseId !== useCaseId) return;
         
-        if (data.mermaid) {
+        if (mermaidCode) {
             // Display the Mermaid code
             const codeElement = document.getElementById('sequence-diagram-code');
             if (codeElement) {
-                codeElement.textContent = data.mermaid;
+                codeElement.textContent = mermaidCode;
             }
             
             // Render the diagram
-            useCaseDiagramContainer.innerHTML = '<div class="mermaid">' + data.mermaid + '</div>';
+            useCaseDiagramContainer.innerHTML = '<div class="mermaid">' + mermaidCode + '</div>';
             mermaid.init(undefined, useCaseDiagramContainer.querySelectorAll('.mermaid'));
         } else {
             useCaseDiagramContainer.innerHTML = '<div class="alert alert-warning">Failed to generate sequence diagram.</div>';
@@ -572,6 +564,135 @@ async function displaySelectedUseCase() {
     }
 }
 
+// Request the sequence diagram for a single use case
+async function fetchSequenceDiagram(useCase) {
+    const data = await postJsonConditional('/api/generate-sequence-diagram', {
+        use_case_id: useCase.id,
+        spec_id: specId
+    });
+    return data.mermaid;
+}
+
+// Process the current markdown on the server and store the diagrams,
+// parsed spec and spec ID it returns
+async function uploadSpec() {
+    const data = await postJsonConditional('/api/generate-diagrams', { markdown: currentMarkdown });
+    diagrams = data;
+    parsedSpec = data.parsed_spec;
+    specId = data.spec_id;
+    return data;
+}
+
+// Send a request that refers to the stored spec by specId. If the server no
+// longer has it (expired, or stored by another worker) the markdown is
+// uploaded again and the request retried; the spec ID is the hash of the
+// markdown, so the request itself stays the same.
+async function fetchWithStoredSpec(url, options) {
+    let response = await fetch(url, options);
+    if (response.status === 404 && currentMarkdown) {
+        await uploadSpec();
+        response = await fetch(url, options);
+    }
+    return response;
+}
+
+// POST a JSON payload, reusing the previous result when the server answers
+// 304 Not Modified for an unchanged request
+async function postJsonConditional(url, payload) {
+    const body = JSON.stringify(payload);
+    const cached = conditionalResponses[url];
+    const headers = { 'Content-Type': 'application/json' };
+    if (cached && cached.body === body) {
+        headers['If-None-Match'] = cached.etag;
+    }
+    
+    const options = { method: 'POST', headers, body };
+    const response = payload.spec_id ? await fetchWithStoredSpec(url, options) : await fetch(url, options);
+    
+    if (response.status === 304 && cached) {
+        return cached.data;
+    }
+    if (!response.ok) {
+        throw new Error(`Server responded with status: ${response.status}`);
+    }
+    
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        conditionalResponses[url] = { body, etag, data };
+    } else {
+        delete conditionalResponses[url];
+    }
+    return data;
+}
+
+// Request all sequence diagrams in one batch, resolving each use case's
+// promise as soon as its diagram is streamed back
+function prefetchSequenceDiagrams() {
+    const resolvers = {};
+    
+    parsedSpec.use_cases.forEach(useCase => {
+        const request = new Promise((resolve, reject) => {
+            resolvers[useCase.id] = { resolve, reject };
+        });
+        // Avoid unhandled rejection warnings for use cases nobody looks at
+        request.catch(() => {});
+        sequenceDiagramRequests[useCase.id] = request;
+    });
+    
+    streamSequenceDiagrams(resolvers)
+        .then(() => {
+            // Anything the server did not send back counts as a failure
+            Object.values(resolvers).forEach(r => r.reject(new Error('No diagram returned')));
+        })
+        .catch(error => {
+            console.error('Error generating sequence diagrams:', error);
+            Object.values(resolvers).forEach(r => r.reject(error));
+        });
+}
+
+// Read the NDJSON stream from the batch endpoint
+async function streamSequenceDiagrams(resolvers) {
+    const response = await fetchWithStoredSpec('/api/generate-sequence-diagrams', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            use_case_ids: 'all',
+            spec_id: specId
+        })
+    });
+    
+    if (!response.ok) {
+        throw new Error(`Server responded with status: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline).trim();
+            buffer = buffer.slice(newline + 1);
+            if (!line) continue;
+            
+            const item = JSON.parse(line);
+            const resolver = resolvers[item.use_case_id];
+            if (resolver) {
+                resolver.resolve(item.mermaid);
+            }
+        }
+    }
+}
+
 // Generate code from the parsed specification
 async function generateCode() {
     const codeContainer = document.getElementById('code-container');
@@ -584,18 +705,18 @@ async function generateCode() {
     }
     
     try {
-        // Show loading indicator
-        codeContainer.innerHTML = '<div class="text-center"><div class="spinner-border" role="status"><span class="visually-hidden">Loading...</span></div></div>';
+        // Show loading indicator until the first file arrives
+        codeContainer.innerHTML = '<div class="code-files"></div><div class="text-center code-loading"><div class="spinner-border" role="status"><span class="visually-hidden">Loading...</span></div></div>';
+        const filesElement = codeContainer.querySelector('.code-files');
         
-        // Request code generation
-        const response = await fetch('/api/generate-code', {
+        // Request streamed code generation
+        const response = await fetchWithStoredSpec('/api/generate-code/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
-                parsed_spec: parsedSpec,
-                diagrams: diagrams
+                spec_id: specId
             })
         });
         
@@ -603,33 +724,74 @@ async function generateCode() {
             throw new Error(`Server responded with status: ${response.status}`);
         }
         
-        const data = await response.json();
+        // Display each generated file as soon as it is streamed back
+        await readServerSentEvents(response, (event, data) => {
+            if (event === 'file') {
+                appendCodeFile(filesElement, data.filename, data.content);
+            } else if (event === 'error') {
+                throw new Error(data.detail);
+            }
+        });
         
-        // Display the generated code
-        let codeHtml = '<div class="code-files">';
+        const loadingElement = codeContainer.querySelector('.code-loading');
+        if (loadingElement) loadingElement.remove();
         
-        Object.entries(data).forEach(([filename, content]) => {
-            codeHtml += `
-                <div class="code-file">
-                    <div class="code-filename">${filename}</div>
-                    <pre><code class="language-python">${escapeHtml(content)}</code></pre>
-                </div>
-            `;
+    } catch (error) {
+        console.error('Error generating code:', error);
+        codeContainer.innerHTML = `<div class="alert alert-danger">Error generating code: ${error.message}</div>`;
+    }
+}
+
+// Append one generated file to the code view
+function appendCodeFile(filesElement, filename, content) {
+    const fileElement = document.createElement('div');
+    fileElement.className = 'code-file';
+    fileElement.innerHTML = `
+        <div class="code-filename">${escapeHtml(filename)}</div>
+        <pre><code class="language-python">${escapeHtml(content)}</code></pre>
+    `;
+    filesElement.appendChild(fileElement);
+    
+    // Highlight code if highlightjs is available
+    if (typeof hljs !== 'undefined') {
+        fileElement.querySelectorAll('pre code').forEach((block) => {
+            hljs.highlightBlock(block);
         });
+    }
+}
+
+// Read a text/event-stream response, calling onEvent(event, data) for each
+// event with its JSON data already parsed
+async function readServerSentEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
         
-        codeHtml += '</div>';
-        codeContainer.innerHTML = codeHtml;
+        buffer += decoder.decode(value, { stream: true });
         
-        // Highlight code if highlightjs is available
-        if (typeof hljs !== 'undefined') {
-            document.querySelectorAll('pre code').forEach((block) => {
-                hljs.highlightBlock(block);
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
             });
+            
+            if (dataLines.length > 0) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
         }
-        
-    } catch (error) {
-        console.error('Error generating code:', error);
-        codeContainer.innerHTML = `<div class="alert alert-danger">Error generating code: ${error.message}</div>`;
     }
 }
 
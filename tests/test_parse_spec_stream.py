@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+/api/parse-spec/stream must read the upload itself: before ASGI 2.4,
+Starlette's StreamingResponse listens for disconnects with receive() and
+would swallow the request body.
+"""
+import os
+import json
+import tempfile
+
+# Offline backend and throwaway stores, set before config is imported
+_tmp = tempfile.mkdtemp()
+os.environ['LLM_BACKEND'] = 'stub'
+os.environ['LLM_CACHE_PATH'] = os.path.join(_tmp, 'llm_cache.sqlite3')
+os.environ['SPEC_STORE_PATH'] = os.path.join(_tmp, 'specs.sqlite3')
+os.environ['JOBS_DB_PATH'] = os.path.join(_tmp, 'jobs.sqlite3')
+
+from fastapi.testclient import TestClient
+
+from app import app
+
+SPEC = """# Shop
+
+## Classes
+
+### User
+A user.
+
+#### Attributes
+- id: int
+
+### Order
+An order.
+"""
+
+
+def _chunks(text, size=7):
+    for i in range(0, len(text), size):
+        yield text[i:i + size].encode('utf-8')
+
+
+def test_parse_spec_stream_reads_chunked_upload():
+    with TestClient(app) as client:
+        response = client.post('/api/parse-spec/stream', content=_chunks(SPEC), timeout=10)
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert lines[-1] == {'type': 'done', 'counts': {'title': 1, 'class': 2}}
+    assert [line['data']['name'] for line in lines if line['type'] == 'class'] == ['User', 'Order']